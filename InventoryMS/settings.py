@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it also counts the queries of the middleware below
+    'store.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,6 +88,19 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # SQLite ignores SELECT ... FOR UPDATE; instead every atomic block
+        # takes the write lock when it begins, and waits up to `timeout`
+        # seconds for it, so concurrent payments queue up instead of
+        # failing with "database is locked"
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # A file rather than the shared in-memory database, whose table locks
+        # fail at once instead of waiting; the concurrency tests need that
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
     }
 }
 
@@ -133,6 +148,32 @@ STATICFILES_DIRS = []
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Shared by all worker processes (cached pages, the parts catalog, request
+# metrics). Entries may be culled at any time, so the version counters that
+# invalidate them are kept in the database instead (store.models.CacheVersion)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'django'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+# Rendered barcodes served by the /barcode/<serial>.<png|svg> endpoint
+BARCODE_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'barcodes')
+BARCODE_CACHE_MAX_AGE = 60 * 60 * 24 * 30
+
+# Request metrics served at /metrics (see store/metrics.py)
+METRICS_ENABLED = True
+# Scrapers authenticate with "Authorization: Bearer <token>"; staff users
+# may open /metrics in the browser. Unset, only staff users get in
+METRICS_BEARER_TOKEN = os.environ.get('METRICS_BEARER_TOKEN', '')
+METRICS_SLOW_REQUEST_SECONDS = 1.0
+METRICS_SLOW_LOG_SAMPLE_RATE = 1.0
+METRICS_DUPLICATE_QUERY_THRESHOLD = 10
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
@@ -13,7 +13,20 @@ from django.contrib import admin
 from .models import Ssd, Item, Delivery, Hdd,Ram,Processor, catogaryitem
 
 
-from .models import ProductAuditTrail
+from .models import ProductAuditTrail, ImportJob, StockPool
+
+@admin.register(StockPool)
+class StockPoolAdmin(admin.ModelAdmin):
+    list_display = ['name', 'category', 'quantity', 'unit_price', 'generation', 'capacity_gb', 'updated_at']
+    list_filter = ['category']
+    search_fields = ['name', 'normalized_name']
+    readonly_fields = ['updated_at']
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'rows_done', 'rows_failed', 'total_rows', 'created_by', 'created_at']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
 
 @admin.register(ProductAuditTrail)
 class ProductAuditTrailAdmin(admin.ModelAdmin):
@@ -0,0 +1,259 @@
+"""
+Autocomplete utility for Solv-IT application.
+
+This module answers the search bar suggestions from a per-process,
+in-memory prefix index instead of querying the database on every
+keystroke. Each (model, column) pair keeps a sorted list of lowercase
+keys (the whole value plus every word in it, so "8gb" finds
+"Kingston 8GB") which is searched with bisect.
+
+Keeping it fresh:
+
+- Created, edited and deleted rows are applied incrementally by the
+  signals in ``store.signals``; each value is reference counted, and an
+  edited row's old values are the ones it was loaded with
+  (``TrackedFieldsMixin``), so the edit can drop them without a query.
+- The changes are applied when the transaction that made them commits,
+  and each committed transaction bumps a shared version number (a
+  CacheVersion row) once. A rolled back transaction changes neither.
+- A process that sees a version it did not produce itself (another worker
+  changed something, or rows were bulk written) rebuilds its index from
+  the database in a background thread, at most once every
+  ``REBUILD_INTERVAL`` seconds, and keeps answering from the old index
+  until the new one is swapped in.
+"""
+
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from functools import partial
+
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Count
+
+from .models import CacheVersion, Item, catogaryitem
+
+logger = logging.getLogger(__name__)
+
+
+SUGGESTION_LIMIT = 10
+# Rebuilding takes a few seconds at 300k distinct serials, so it runs in
+# the background at most this often; changes made by other processes show
+# up this late
+REBUILD_INTERVAL = 60
+VERSION_CACHE_KEY = 'store:autocomplete:version'
+
+# Fields offered as suggestions, in the order the endpoints try them
+AUTOCOMPLETE_FIELDS = {
+    Item: {'name': 'name', 'serial': 'serialno', 'model': 'make_and_models'},
+    catogaryitem: {'name': 'name', 'serial': 'serial_no', 'model': 'category'},
+}
+
+WORD_START = re.compile(r'(?<![0-9a-z])[0-9a-z]')
+
+
+def _keys(value):
+    """The lowercase value and each of its suffixes starting at a word."""
+    lowered = value.lower().strip()
+    keys = {lowered}
+    keys.update(lowered[match.start():] for match in WORD_START.finditer(lowered))
+    keys.discard('')
+    return keys
+
+
+class PrefixIndex:
+    """Sorted (key, value) pairs of one column with a count per value."""
+
+    def __init__(self, counts=None):
+        self.counts = {}
+        self.entries = []
+        for value, count in (counts or {}).items():
+            self.counts[value] = count
+            self.entries.extend((key, value) for key in _keys(value))
+        self.entries.sort()
+
+    def add(self, value):
+        if not value:
+            return
+        if value in self.counts:
+            self.counts[value] += 1
+            return
+        self.counts[value] = 1
+        for key in _keys(value):
+            insort(self.entries, (key, value))
+
+    def remove(self, value):
+        if value not in self.counts:
+            return
+        self.counts[value] -= 1
+        if self.counts[value] > 0:
+            return
+        del self.counts[value]
+        for key in _keys(value):
+            position = bisect_left(self.entries, (key, value))
+            if position < len(self.entries) and self.entries[position] == (key, value):
+                del self.entries[position]
+
+    def lookup(self, prefix, limit):
+        """Values with a word starting with ``prefix``; most common first."""
+        prefix = prefix.lower().strip()
+        if not prefix:
+            return []
+        found = {}
+        position = bisect_left(self.entries, (prefix,))
+        # Look a little past ``limit`` so the most common values win
+        while position < len(self.entries) and len(found) < limit * 20:
+            key, value = self.entries[position]
+            if not key.startswith(prefix):
+                break
+            found[value] = self.counts[value]
+            position += 1
+        return sorted(found, key=lambda value: (-found[value], value))[:limit]
+
+
+class Autocomplete:
+    """The prefix indexes of every model and column in this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.first_build = threading.Lock()
+        self.indexes = None
+        self.version = None
+        self.built_at = 0
+        self.rebuilding = False
+        # The changes of the transaction each thread is in
+        self.pending = threading.local()
+
+    def rebuild(self):
+        """Build the indexes from the database and swap them in."""
+        version = CacheVersion.objects.current(VERSION_CACHE_KEY)
+        indexes = {}
+        for model, fields in AUTOCOMPLETE_FIELDS.items():
+            for column, field in fields.items():
+                counts = dict(
+                    model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+                    .order_by().values_list(field).annotate(count=Count('pk'))
+                )
+                indexes[model, column] = PrefixIndex(counts)
+        with self.lock:
+            # Changes applied while building are in ``indexes`` already, or
+            # they bumped the version past ``version`` and rebuild again later
+            self.indexes, self.version, self.built_at = indexes, version, time.monotonic()
+        logger.info(f"🔤 Autocomplete index rebuilt (version {version})")
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception('Could not rebuild the autocomplete index')
+        finally:
+            with self.lock:
+                self.rebuilding = False
+            connections.close_all()
+
+    def _refresh_if_stale(self):
+        """Start a background rebuild if another process changed the data."""
+        with self.lock:
+            if self.rebuilding or time.monotonic() - self.built_at < REBUILD_INTERVAL:
+                return
+            self.rebuilding = True
+        if CacheVersion.objects.current(VERSION_CACHE_KEY) == self.version:
+            with self.lock:
+                self.rebuilding = False
+                self.built_at = time.monotonic()
+            return
+        threading.Thread(target=self._rebuild_in_background, name='autocomplete-rebuild', daemon=True).start()
+
+    def suggest(self, model, column, prefix, limit=SUGGESTION_LIMIT):
+        if self.indexes is None:
+            # Nothing to answer from yet: the first build runs in the request
+            with self.first_build:
+                if self.indexes is None:
+                    self.rebuild()
+        else:
+            self._refresh_if_stale()
+        with self.lock:
+            return self.indexes[model, column].lookup(prefix, limit)
+
+    def _queue(self, model, changes):
+        """
+        Apply (column, old value, new value) changes of one row once the
+        current transaction commits (at once outside a transaction).
+        ``model`` None only bumps the version, for changes not described.
+        """
+        batch = getattr(self.pending, 'batch', None)
+        if batch is None or batch['committed']:
+            # The first change of a transaction; one left by a rolled back
+            # transaction never committed and can be reused
+            batch = self.pending.batch = {'committed': False}
+        transaction.on_commit(partial(self._commit, batch, model, changes))
+
+    def _commit(self, batch, model, changes):
+        """Apply committed changes; the first of a transaction bumps the version."""
+        bumped = not batch['committed']
+        batch['committed'] = True
+        version = None
+        if bumped:
+            # A write, so outside ``self.lock``: it may wait for SQLite's lock
+            try:
+                version = CacheVersion.objects.bump(VERSION_CACHE_KEY)
+            except DatabaseError:
+                logger.exception('Could not bump the autocomplete version')
+        with self.lock:
+            if self.indexes is not None and model is not None:
+                for column, old, new in changes:
+                    self.indexes[model, column].remove(old)
+                    self.indexes[model, column].add(new)
+            if model is None or (bumped and (self.version is None or version != self.version + 1)):
+                # Someone else changed something too (or we cannot tell): rebuild
+                self.version = None
+            elif bumped:
+                self.version = version
+
+    @staticmethod
+    def _loaded(instance):
+        """The indexed values an instance holds, skipping deferred fields."""
+        fields = AUTOCOMPLETE_FIELDS[type(instance)]
+        return {column: instance.__dict__[field] for column, field in fields.items() if field in instance.__dict__}
+
+    def saved(self, instance, created):
+        fields = AUTOCOMPLETE_FIELDS[type(instance)]
+        after = self._loaded(instance)
+        if created:
+            changes = [(column, None, value) for column, value in after.items() if value]
+        else:
+            # The values it was loaded with, for the fields changed since
+            before = instance.changed_fields()
+            changes = [(column, before[fields[column]], value) for column, value in after.items() if fields[column] in before]
+        if changes:
+            self._queue(type(instance), changes)
+
+    def deleted(self, instance):
+        fields = AUTOCOMPLETE_FIELDS[type(instance)]
+        saved = instance.saved_values()
+        if any(field not in saved for field in fields.values()):
+            # Deleted with deferred fields: some values are unknown
+            self.changed()
+            return
+        self._queue(type(instance), [(column, saved[field], None) for column, field in fields.items()])
+
+    def changed(self):
+        """Rows changed without signals (e.g. bulk_create); rebuild soon."""
+        self._queue(None, [])
+
+
+autocomplete = Autocomplete()
+
+
+def suggest(model, query, columns=('name', 'serial', 'model'), limit=SUGGESTION_LIMIT):
+    """
+    Suggestions for the search bar: the first of ``columns`` that has
+    values with a word starting with ``query``.
+    """
+    for column in columns:
+        suggestions = autocomplete.suggest(model, column, query, limit)
+        if suggestions:
+            return suggestions
+    return []
@@ -5,10 +5,12 @@ This module provides functionality to generate barcodes
 for products and save them as PNG files.
 """
 
+import hashlib
 import os
 import sys
+from functools import lru_cache
 import barcode
-from barcode.writer import ImageWriter
+from barcode.writer import ImageWriter, SVGWriter
 from django.conf import settings
 from django.core.files.base import ContentFile
 from io import BytesIO
@@ -16,6 +18,19 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+BARCODE_FORMATS = {
+    'png': ('image/png', ImageWriter),
+    'svg': ('image/svg+xml', SVGWriter),
+}
+
+# Number of rendered barcodes kept in memory by each process
+BARCODE_MEMORY_CACHE_SIZE = 2048
+
+def barcode_filename_for(serial_number):
+    """Return the PNG filename used for a serial number (e.g. 'SERIAL123.png')."""
+    safe_serial = ''.join(c for c in str(serial_number).strip() if c.isalnum() or c in '-_.')
+    return f"{safe_serial or 'barcode'}.png"
+
 
 def generate_barcode_file(serial_number):
     """
@@ -59,11 +74,8 @@ def generate_barcode_file(serial_number):
             raise PermissionError(f"Barcodes directory is not writable: {barcode_dir}")
         
         # Sanitize serial number for filename
-        safe_serial = ''.join(c for c in serial_number if c.isalnum() or c in '-_.')
-        if not safe_serial:
-            safe_serial = "barcode"
-        
-        barcode_filename = f"{safe_serial}.png"
+        barcode_filename = barcode_filename_for(serial_number)
+        safe_serial = barcode_filename[:-len('.png')]
         barcode_file_path = os.path.join(barcode_dir, barcode_filename)
         
         logger.info(f"🏷️ Safe serial: {safe_serial}")
@@ -111,3 +123,98 @@ def get_barcode_static_url(barcode_filename):
         str: The static URL path for the barcode
     """
     return f"{settings.STATIC_URL}barcodes/{barcode_filename}"
+
+
+def render_barcode(serial_number, fmt='png'):
+    """Render the Code128 barcode of a serial number to PNG or SVG bytes in memory."""
+    _, writer_class = BARCODE_FORMATS[fmt]
+    barcode_instance = barcode.get_barcode_class('code128')
+    buffer = BytesIO()
+    barcode_instance(str(serial_number).strip(), writer=writer_class()).write(buffer)
+    return buffer.getvalue()
+
+
+def barcode_cache_path(serial_number, fmt):
+    """
+    Path of a rendered barcode in the on-disk cache.
+
+    Files are keyed by a hash of the serial, the format and the
+    python-barcode version, and sharded into two directory levels
+    (e.g. cache/barcodes/3f/a2/3fa2....png) so no single directory
+    grows to hundreds of thousands of entries.
+    """
+    key = hashlib.sha256(f"{barcode.version}:{fmt}:{serial_number}".encode()).hexdigest()
+    return os.path.join(settings.BARCODE_CACHE_DIR, key[:2], key[2:4], f"{key}.{fmt}")
+
+
+@lru_cache(maxsize=BARCODE_MEMORY_CACHE_SIZE)
+def get_barcode_image(serial_number, fmt='png'):
+    """
+    Return ``(content, etag)`` for the barcode of a serial number.
+
+    Looks in the in-process LRU first, then the sharded disk cache, and
+    only renders (and stores to disk) on a miss in both. The ETag is a
+    strong validator derived from the image bytes.
+
+    Args:
+        serial_number (str): The serial number to encode.
+        fmt (str): 'png' or 'svg'.
+    """
+    serial_number = str(serial_number).strip()
+    if not serial_number:
+        raise ValueError("Serial number cannot be empty")
+    if fmt not in BARCODE_FORMATS:
+        raise ValueError(f"Unsupported barcode format: {fmt}")
+
+    path = barcode_cache_path(serial_number, fmt)
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+    except FileNotFoundError:
+        content = render_barcode(serial_number, fmt)
+        try:
+            write_barcode_cache_file(path, content)
+        except OSError as e:
+            # The cache is an optimisation; still serve the rendered image
+            logger.warning(f"⚠️ Could not write barcode cache file {path}: {e}")
+
+    etag = '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+    return content, etag
+
+
+def write_barcode_cache_file(path, content):
+    """Write a cache file atomically, so readers never see half an image."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def warm_barcode_cache(serial_number, formats=('png',), force=False):
+    """
+    Render the barcodes of a serial number into the disk cache that
+    ``get_barcode_image`` (and so the barcode endpoint) reads. Safe to run
+    in a worker process: it only touches files, never the database.
+
+    Args:
+        serial_number (str): The serial number to encode.
+        formats (tuple): Any of 'png' and 'svg'.
+        force (bool): Re-render formats that are cached already.
+
+    Returns:
+        dict: ``serial`` and ``status``, which is 'cached' (every format
+        was on disk already) or 'written'.
+    """
+    serial_number = str(serial_number).strip()
+    if not serial_number:
+        raise ValueError("Serial number cannot be empty")
+
+    status = 'cached'
+    for fmt in formats:
+        path = barcode_cache_path(serial_number, fmt)
+        if not force and os.path.exists(path):
+            continue
+        write_barcode_cache_file(path, render_barcode(serial_number, fmt))
+        status = 'written'
+    return {'serial': serial_number, 'status': status}
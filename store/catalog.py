@@ -0,0 +1,82 @@
+"""
+Spare parts catalog utility for Solv-IT application.
+
+This module builds the Solv-IT pool stock as the operative part pickers
+show it: processors grouped by generation and RAM, HDDs and SSDs grouped
+by size, each option being "<name> X(<quantity>) - (<serial>)". The pool
+is read from StockPool, one row per part already carrying the parsed
+``generation`` and ``capacity_gb``, so the work is proportional to the
+number of distinct parts, and the result is cached until the pool changes.
+
+Freshness: the cache key carries a version number (a CacheVersion row)
+which ``invalidate_parts_catalog`` bumps once the writing transaction
+commits.
+Saved and deleted components and pool rows do this through
+``store.signals``; bulk writers (the Excel importer, the parts transfer
+service, callers of ``StockPool.objects.add``) call it themselves.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .component_parser import capacity_label, generation_label
+from .models import STOCK_POOL_SERIAL, CacheVersion, StockPool
+
+
+CATALOG_VERSION_KEY = 'store:parts_catalog:version'
+CATALOG_TIMEOUT = 60 * 60 * 24
+
+COMPONENT_CATEGORIES = ['processor', 'ram', 'hdd', 'ssd']
+
+MAX_GENERATION = 19
+GENERATION_LABELS = [generation_label(i) for i in range(1, MAX_GENERATION + 1)] + ['Unknown']
+
+
+def build_parts_catalog():
+    """Read the pool and group it for the part pickers."""
+    parts = (
+        StockPool.objects.filter(quantity__gt=0, category__in=COMPONENT_CATEGORIES)
+        .values('category', 'generation', 'capacity_gb', 'name', 'quantity')
+        .order_by('category', 'generation', 'capacity_gb', 'id')
+    )
+
+    catalog = {
+        'processor_by_generation': {label: [] for label in GENERATION_LABELS},
+        'rambysize': {},
+        'hddbysize': {},
+        'ssdbysize': {},
+        'options': {category: [] for category in COMPONENT_CATEGORIES},
+    }
+    sized = {category: [] for category in ('ram', 'hdd', 'ssd')}
+    for part in parts:
+        category, name, serial, quantity = part['category'], part['name'], STOCK_POOL_SERIAL, part['quantity']
+        option = f"{name} X({quantity}) - ({serial})"
+        if category == 'processor':
+            generation = part['generation']
+            label = generation_label(generation) if generation and generation <= MAX_GENERATION else 'Unknown'
+            catalog['processor_by_generation'][label].append(option)
+        else:
+            sized[category].append((part['capacity_gb'], option))
+        catalog['options'][category].append(f"{name} X({quantity}) --({serial})")
+
+    # Sizes smallest first, parts without a size last
+    for category, options in sized.items():
+        buckets = catalog[f'{category}bysize']
+        for capacity_gb, option in sorted(options, key=lambda entry: (entry[0] is None, entry[0] or 0)):
+            buckets.setdefault(capacity_label(capacity_gb), []).append(option)
+    return catalog
+
+
+def get_parts_catalog():
+    """The cached catalog of the current pool, building it if needed."""
+    key = f'store:parts_catalog:{CacheVersion.objects.current(CATALOG_VERSION_KEY)}'
+    catalog = cache.get(key)
+    if catalog is None:
+        catalog = build_parts_catalog()
+        cache.set(key, catalog, CATALOG_TIMEOUT)
+    return catalog
+
+
+def invalidate_parts_catalog():
+    """Drop the cached catalog once the current transaction commits."""
+    transaction.on_commit(lambda: CacheVersion.objects.bump(CATALOG_VERSION_KEY))
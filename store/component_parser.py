@@ -0,0 +1,104 @@
+"""
+Component name parser utility for Solv-IT application.
+
+Component names are free text ("Intel Core i5 8th Gen", "Kingston 8GB
+DDR4", "Seagate 1TB HDD"). This module extracts the attributes the part
+pickers group by, so they can be stored on catogaryitem when a row is
+written instead of being scanned for on every request:
+
+- ``generation``: processor generation, e.g. 8 for "8th Gen".
+- ``capacity_gb``: RAM, HDD and SSD size in GB (1TB = 1000GB).
+- ``normalized_name``: upper case with single spaces, for matching names
+  that only differ in case or spacing.
+
+catogaryitem.save() applies ``apply_parsed_attributes``; code writing with
+bulk_create must call it itself.
+"""
+
+import re
+from decimal import Decimal
+
+
+GENERATION_RE = re.compile(r'(\d{1,2})(?:st|nd|rd|th)?\s*(?:Gen|Generation)', re.IGNORECASE)
+CAPACITY_RE = re.compile(r'(?<![\d.])(\d+(?:\.\d+)?)\s*(GB|TB)', re.IGNORECASE)
+
+CAPACITY_CATEGORIES = ('ram', 'hdd', 'ssd')
+PARSED_FIELDS = ['generation', 'capacity_gb', 'normalized_name']
+
+
+def normalize_name(name):
+    return ' '.join((name or '').split()).upper()
+
+
+def parse_generation(name):
+    """8 for "Intel i5 8th Gen", None if the name has no generation."""
+    match = GENERATION_RE.search(name or '')
+    return int(match.group(1)) if match else None
+
+
+def parse_capacity_gb(name):
+    """1000 for "Seagate 1TB", 8 for "2x8GB DDR4", None without a size."""
+    match = CAPACITY_RE.search(name or '')
+    if not match:
+        return None
+    size = Decimal(match.group(1)) * (1000 if match.group(2).upper() == 'TB' else 1)
+    return int(size) or None
+
+
+def parse_component(category, name):
+    """The parsed attributes of a component, as a dict of field values."""
+    return {
+        'generation': parse_generation(name) if category == 'processor' else None,
+        'capacity_gb': parse_capacity_gb(name) if category in CAPACITY_CATEGORIES else None,
+        'normalized_name': normalize_name(name),
+    }
+
+
+def apply_parsed_attributes(component):
+    for field, value in parse_component(component.category, component.name).items():
+        setattr(component, field, value)
+
+
+def ordinal(n):
+    return f"{n}{'th' if 11 <= n <= 14 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')}"
+
+
+def generation_label(generation):
+    return f"{ordinal(generation)} Generation" if generation else 'Unknown'
+
+
+def capacity_label(capacity_gb):
+    """'500GB', '1TB', '1.5TB'; 'Unknown' without a size."""
+    if not capacity_gb:
+        return 'Unknown'
+    if capacity_gb >= 1000:
+        return f"{capacity_gb / 1000:g}TB"
+    return f"{capacity_gb}GB"
+
+
+def backfill_component_attributes(model, batch_size=2000, only_missing=False, on_progress=None):
+    """
+    Parse and store the attributes of existing rows, one primary key range
+    at a time. ``model`` may be a migration's historical model. Returns the
+    number of rows updated.
+    """
+    rows = model.objects.order_by('pk').only('pk', 'category', 'name', *PARSED_FIELDS)
+    if only_missing:
+        rows = rows.filter(normalized_name='')
+    updated, last_pk = 0, 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return updated
+        changed = []
+        for row in batch:
+            parsed = parse_component(row.category, row.name)
+            if any(getattr(row, field) != value for field, value in parsed.items()):
+                for field, value in parsed.items():
+                    setattr(row, field, value)
+                changed.append(row)
+        model.objects.bulk_update(changed, PARSED_FIELDS)
+        updated += len(changed)
+        last_pk = batch[-1].pk
+        if on_progress:
+            on_progress(last_pk, updated)
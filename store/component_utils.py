@@ -0,0 +1,77 @@
+"""
+Component lookup utility for Solv-IT application.
+
+This module loads the catogaryitem components of many serial numbers
+at once and groups them by serial and category, so tables and views
+can render component columns without one query per row.
+"""
+
+from collections import defaultdict
+
+from .models import Item, catogaryitem
+
+
+COMPONENT_CATEGORIES = ['processor', 'ram', 'hdd', 'ssd']
+
+
+class ComponentLoader:
+    """
+    Fetch the components for a set of serial numbers in one query.
+
+    Args:
+        serials: A list of serial numbers, or a queryset of serial numbers
+            (e.g. ``Item.objects.values('serialno')``) which is used as a
+            subquery so large exports stay a single statement.
+    """
+
+    def __init__(self, serials):
+        self.serials = serials
+        self._components = None
+        self._purchased_codes = None
+
+    def _load_components(self):
+        grouped = defaultdict(lambda: defaultdict(list))
+        components = catogaryitem.objects.filter(
+            serial_no__in=self.serials
+        ).only('serial_no', 'category', 'name', 'quantity', 'unit_price')
+        for component in components.iterator(chunk_size=2000):
+            grouped[component.serial_no][component.category].append(component)
+        return grouped
+
+    def _load_purchased_codes(self):
+        grouped = defaultdict(list)
+        rows = Item.objects.filter(
+            serialno__in=self.serials
+        ).values_list('serialno', 'purchased_code')
+        for serialno, purchased_code in rows.iterator(chunk_size=2000):
+            grouped[serialno].append(purchased_code)
+        return grouped
+
+    def get(self, serial, category):
+        """Return the components of ``category`` fitted to ``serial``."""
+        if self._components is None:
+            self._components = self._load_components()
+        if serial not in self._components:
+            return []
+        return self._components[serial].get(category, [])
+
+    def purchased_codes(self, serial):
+        """Return the purchased codes of every Item sharing ``serial``."""
+        if self._purchased_codes is None:
+            self._purchased_codes = self._load_purchased_codes()
+        return self._purchased_codes.get(serial, [])
+
+
+def get_table_serials(table):
+    """
+    Return the serial numbers a django_tables2 table is going to render:
+    the current page when the table is paginated, else the whole queryset
+    (which is the case for ExportMixin exports).
+    """
+    if hasattr(table, 'page'):
+        return [row.record.serialno for row in table.page.object_list]
+
+    data = table.data.data
+    if hasattr(data, 'values'):
+        return data.values('serialno')
+    return [record.serialno for record in data]
@@ -0,0 +1,551 @@
+"""
+Bulk Excel import utility for Solv-IT application.
+
+This module imports spreadsheets in batches: the product intake sheet
+(one Item per row, with its components) and the category-only sheet
+(components per serial). Vendors and customers for the whole sheet are
+resolved up front, rows are built in memory and written with
+bulk_create, one transaction per chunk. A row that cannot be imported is
+reported with its sheet row number and skipped; it never aborts the
+rest of the sheet.
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import zip_longest
+
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.text import slugify
+import pandas as pd
+
+from accounts.models import Customer, Vendor
+from .models import ImportJob, Item, ProductAuditTrail, StockPool, catogaryitem, is_pool_serial
+from .autocomplete import autocomplete
+from .catalog import invalidate_parts_catalog
+from .component_parser import apply_parsed_attributes, normalize_name
+from .search import index_objects
+
+logger = logging.getLogger(__name__)
+
+
+IMPORT_BATCH_SIZE = 500
+
+# Sheet column holding each component spec and its quantities
+COMPONENT_COLUMNS = [
+    ('processor', 'Processor', 'Processor_Qty'),
+    ('ram', 'RAM', 'Ram_Qty'),
+    ('hdd', 'HDD', 'Hdd_Qty'),
+    ('ssd', 'SSD', 'Ssd_Qty'),
+]
+
+
+def cell(row, column, default=''):
+    """Return a cell as a stripped string, treating blanks and NaN as ``default``."""
+    value = row.get(column)
+    if value is None:
+        return default
+    value = str(value).strip()
+    if value == '' or value.lower() == 'nan':
+        return default
+    return value
+
+
+def parse_components(spec_string, quantity):
+    """
+    Split comma separated component names and quantities into
+    ``(NAME, qty)`` pairs, the same way create_category_items does.
+    """
+    names = [n.strip() for n in spec_string.split(',') if n.strip()]
+    quantities = [q.strip() for q in quantity.split(',') if q.strip()]
+
+    components = []
+    for name, qty in zip_longest(names, quantities, fillvalue='1'):
+        if not name or name.lower() == 'nan':
+            continue
+        try:
+            qty_val = int(float(qty))
+            if qty_val <= 0:
+                qty_val = 1
+        except (TypeError, ValueError):
+            qty_val = 1
+        components.append((name.upper(), qty_val))
+    return components
+
+
+def split_customer_name(full_name):
+    parts = full_name.split()
+    if not parts:
+        return '', ''
+    return parts[0], parts[-1] if len(parts) > 1 else ''
+
+
+class ImportResult:
+    """Outcome of an import: rows created and ``(row_number, message)`` errors."""
+
+    def __init__(self, total=0):
+        self.total = total
+        self.created = 0
+        self.errors = []
+        self.has_purchase_type = False
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+
+class SheetImporter:
+    """
+    Base class for batched sheet imports.
+
+    Subclasses implement ``build_row`` returning the unsaved objects of a
+    row; they are written per chunk with one bulk_create per model.
+
+    Args:
+        df: The pandas DataFrame read from the uploaded sheet.
+        user: The user recorded as creator.
+        batch_size: Number of sheet rows written per transaction.
+        on_progress: Optional callable receiving the ImportResult after
+            every chunk, e.g. to report progress of a background job.
+    """
+
+    def __init__(self, df, user, batch_size=IMPORT_BATCH_SIZE, on_progress=None):
+        self.df = df
+        self.user = user
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.result = ImportResult(total=len(df))
+
+    def prepare(self, rows):
+        """Hook to resolve lookups for the whole sheet before any row is built."""
+
+    def build_row(self, row):
+        raise NotImplementedError
+
+    def run(self):
+        # Row numbers as shown in Excel: 1-based, after the header row
+        rows = [(index + 2, row) for index, row in enumerate(self.df.to_dict('records'))]
+
+        self.prepare(rows)
+
+        for start in range(0, len(rows), self.batch_size):
+            self.import_chunk(rows[start:start + self.batch_size])
+            if self.on_progress:
+                self.on_progress(self.result)
+        return self.result
+
+    def write(self, built):
+        by_model = {}
+        for objects in built:
+            for obj in objects:
+                by_model.setdefault(type(obj), []).append(obj)
+        if catogaryitem in by_model:
+            by_model[catogaryitem] = self.add_to_pool(by_model[catogaryitem])
+        for model, objects in by_model.items():
+            if not objects:
+                continue
+            if model is catogaryitem:
+                # bulk_create skips catogaryitem.save(), which parses these
+                for obj in objects:
+                    apply_parsed_attributes(obj)
+            model.objects.bulk_create(objects)
+            # bulk_create sends no post_save, so index the rows here
+            index_objects(objects)
+        autocomplete.changed()
+        if catogaryitem in by_model:
+            invalidate_parts_catalog()
+
+    def add_to_pool(self, components):
+        """
+        Add the Solv-IT components to the stock pool, one upsert per part,
+        and return the components of other serials.
+        """
+        pooled, totals = {}, {}
+        for component in components:
+            if is_pool_serial(component.serial_no):
+                key = (component.category, normalize_name(component.name))
+                pooled.setdefault(key, component)
+                totals[key] = totals.get(key, 0) + (component.quantity or 0)
+        for key, component in pooled.items():
+            StockPool.objects.add(component.category, component.name, totals[key], component.unit_price, user=self.user)
+        return [component for component in components if not is_pool_serial(component.serial_no)]
+
+    def import_chunk(self, rows):
+        built = []
+        for row_number, row in rows:
+            try:
+                built.append((row_number, self.build_row(row)))
+            except ValueError as e:
+                self.result.add_error(row_number, str(e))
+
+        try:
+            with transaction.atomic():
+                self.write([objects for _, objects in built])
+            self.result.created += len(built)
+            return
+        except DatabaseError as e:
+            logger.warning(f"Bulk import of a chunk failed, retrying row by row: {e}")
+
+        # Isolate the failing rows so the rest of the chunk still imports
+        for row_number, objects in built:
+            for obj in objects:
+                obj.pk = None
+                obj._state.adding = True
+            try:
+                with transaction.atomic():
+                    self.write([objects])
+                self.result.created += 1
+            except DatabaseError as e:
+                self.result.add_error(row_number, str(e))
+
+
+class ItemSheetImporter(SheetImporter):
+    """
+    Import the rows of an intake sheet as Items with their components
+    and audit trail entries.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.customers = {}
+        self.taken_slugs = None
+
+    def prepare(self, rows):
+        self.resolve_vendors(rows)
+        self.resolve_customers(rows)
+
+    # ----- lookups for the whole sheet -----
+
+    def resolve_vendors(self, rows):
+        names = {}
+        for _, row in rows:
+            name = cell(row, 'vendor_name')
+            if name:
+                names.setdefault(name.lower(), name)
+        if not names:
+            return
+
+        existing = set(
+            Vendor.objects.annotate(name_lower=Lower('name'))
+            .filter(name_lower__in=names)
+            .values_list('name_lower', flat=True)
+        )
+        # Created one at a time: Vendor.slug is unique and derived from the name
+        for key, name in names.items():
+            if key not in existing:
+                Vendor.objects.create(name=name)
+
+    def resolve_customers(self, rows):
+        wanted = set()
+        for _, row in rows:
+            first, last = split_customer_name(cell(row, 'Customer'))
+            if first:
+                wanted.add((first.lower(), last.lower()))
+        if not wanted:
+            return
+
+        names = {first for first, _ in wanted} | {last for _, last in wanted if last}
+        by_full_name = {}
+        by_either_name = {}
+        candidates = Customer.objects.annotate(
+            first_lower=Lower('first_name'), last_lower=Lower('last_name')
+        ).filter(Q(first_lower__in=names) | Q(last_lower__in=names)).order_by('pk')
+        for customer in candidates:
+            last_lower = customer.last_lower or ''
+            by_full_name.setdefault((customer.first_lower, last_lower), customer)
+            by_either_name.setdefault(customer.first_lower, customer)
+            if last_lower:
+                by_either_name.setdefault(last_lower, customer)
+
+        missing = {}
+        for first, last in wanted:
+            if last:
+                customer = by_full_name.get((first, last))
+            else:
+                customer = by_either_name.get(first)
+            if customer:
+                self.customers[(first, last)] = customer
+            else:
+                missing[(first, last)] = None
+
+        if missing:
+            # Keep the spelling used on the sheet for new customers
+            for _, row in rows:
+                first, last = split_customer_name(cell(row, 'Customer'))
+                key = (first.lower(), last.lower())
+                if key in missing and missing[key] is None:
+                    missing[key] = Customer(first_name=first, last_name=last)
+            Customer.objects.bulk_create(missing.values())
+            self.customers.update(missing)
+
+    def next_slug(self, name):
+        """
+        Allocate a unique Item slug the way AutoSlugField does (name, then
+        name-2, name-3, ...) against slugs already taken, without a query
+        per row. Item.slug keeps a preset value on add, so bulk_create
+        stores it as is.
+        """
+        if self.taken_slugs is None:
+            self.taken_slugs = set(Item.objects.values_list('slug', flat=True))
+
+        max_length = Item._meta.get_field('slug').max_length
+        base = slugify(name)[:max_length].strip('-')
+        slug, counter = base, 2
+        while not slug or slug in self.taken_slugs:
+            suffix = f'-{counter}'
+            slug = base[:max_length - len(suffix)].strip('-') + suffix
+            counter += 1
+        self.taken_slugs.add(slug)
+        return slug
+
+    # ----- building and writing rows -----
+
+    def build_row(self, row):
+        """Return the unsaved Item, its components and its audit entry."""
+        serial_no = cell(row, 'Serialno')
+        if not serial_no:
+            raise ValueError("Missing serial number")
+
+        try:
+            price = Decimal(cell(row, 'Price', '0'))
+        except InvalidOperation:
+            raise ValueError(f"Invalid price '{row.get('Price')}'")
+        try:
+            quantity = int(float(cell(row, 'Quantity', '1')))
+        except ValueError:
+            raise ValueError(f"Invalid quantity '{row.get('Quantity')}'")
+
+        name = cell(row, 'Name')
+        make_and_models = cell(row, 'Make and models')
+        purchased_code = cell(row, 'Purchased code')
+        purchased_type = cell(row, 'Purchased type').lower()
+        smps = cell(row, 'Smps status').lower()
+        motherboard = cell(row, 'Motherboard status').lower()
+        first, last = split_customer_name(cell(row, 'Customer'))
+
+        if purchased_type:
+            self.result.has_purchase_type = True
+
+        item = Item(
+            slug=self.next_slug(name),
+            name=name,
+            serialno=serial_no,
+            make_and_models=make_and_models,
+            smps_status=smps or 'NA',
+            motherboard_status=motherboard or 'NA',
+            quantity=quantity,
+            price=price,
+            note=cell(row, 'Note'),
+            purchased_code=purchased_code,
+            purchased_type=purchased_type or None,
+            customer=self.customers.get((first.lower(), last.lower())) if first else None,
+            created_by=self.user,
+        )
+
+        components = []
+        audit_data = {}
+        for category, spec_column, qty_column in COMPONENT_COLUMNS:
+            spec = cell(row, spec_column)
+            qty = cell(row, qty_column)
+            for component_name, component_qty in parse_components(spec, qty):
+                components.append(catogaryitem(
+                    name=component_name,
+                    serial_no=serial_no,
+                    category=category,
+                    quantity=component_qty,
+                    unit_price=0.0,
+                    created_by=self.user,
+                    purchase_lot_code=purchased_code,
+                ))
+            audit_data[category] = spec
+            audit_data[f'{category}_qty'] = qty or 0
+
+        audit = ProductAuditTrail(
+            name=name,
+            serial_no=serial_no,
+            make_and_models=make_and_models,
+            smps=smps,
+            motherboard=motherboard,
+            price=price,
+            performed_by=self.user,
+            action='ASSIGN',
+            **audit_data
+        )
+        return [item, *components, audit]
+
+
+def find_column(columns, possible_substrings):
+    """Return the first header whose lowercased name contains one of the substrings."""
+    for column in columns:
+        if column is None:
+            continue
+        key = str(column).strip().lower()
+        for sub in possible_substrings:
+            if sub in key:
+                return column
+    return None
+
+
+class CategorySheetImporter(SheetImporter):
+    """
+    Import the rows of a category-only sheet as catogaryitem components.
+
+    A row either names a single component (category + name + qty columns)
+    or lists them in the wide Processors/RAMs/HDDs/SSDs columns; both are
+    imported when present.
+    """
+
+    WIDE_COLUMNS = [
+        ('processor', 'Processors', 'Processor_Qty'),
+        ('ram', 'RAMs', 'Ram_Qty'),
+        ('hdd', 'HDDs', 'Hdd_Qty'),
+        ('ssd', 'SSDs', 'Ssd_Qty'),
+    ]
+
+    def prepare(self, rows):
+        columns = list(self.df.columns)
+        self.serial_col = find_column(columns, ['serial', 'serialno', 'serial number'])
+        self.name_col = find_column(columns, ['name', 'item', 'product'])
+        self.category_col = find_column(columns, ['category', 'cat', 'component', 'type'])
+        self.qty_col = find_column(columns, ['quantity', 'qty'])
+        self.purchased_col = find_column(columns, ['purchased_code', 'purchased code', 'purchase code', 'product code', 'product code / vendor name'])
+
+    def component(self, name, qty, serial_no, category, purchased_code):
+        return catogaryitem(
+            name=name,
+            serial_no=serial_no,
+            category=category,
+            quantity=qty,
+            unit_price=0.0,
+            created_by=self.user,
+            purchase_lot_code=purchased_code,
+        )
+
+    def build_row(self, row):
+        """Return the unsaved components of a row."""
+        serial_no = cell(row, self.serial_col) if self.serial_col else ''
+        category = cell(row, self.category_col) if self.category_col else ''
+        name = cell(row, self.name_col) if self.name_col else ''
+        qty = cell(row, self.qty_col) if self.qty_col else ''
+        purchased_code = cell(row, self.purchased_col) if self.purchased_col else ''
+
+        components = []
+        if category and name:
+            for component_name, component_qty in parse_components(name, qty):
+                components.append(self.component(component_name, component_qty, serial_no, category, purchased_code))
+
+        for category, spec_column, qty_column in self.WIDE_COLUMNS:
+            for component_name, component_qty in parse_components(cell(row, spec_column), cell(row, qty_column)):
+                components.append(self.component(component_name, component_qty, serial_no, category, purchased_code))
+        return components
+
+
+def import_item_sheet(df, user, batch_size=IMPORT_BATCH_SIZE, on_progress=None):
+    """
+    Import an intake sheet DataFrame.
+
+    Returns:
+        ImportResult: created row count, per-row errors, and whether any
+        row carried a purchased type.
+    """
+    return ItemSheetImporter(df, user, batch_size=batch_size, on_progress=on_progress).run()
+
+
+def import_category_sheet(df, user, batch_size=IMPORT_BATCH_SIZE, on_progress=None):
+    """
+    Import a category-only sheet DataFrame.
+
+    Returns:
+        ImportResult: created row count and per-row errors.
+    """
+    return CategorySheetImporter(df, user, batch_size=batch_size, on_progress=on_progress).run()
+
+
+IMPORTERS = {
+    'items': import_item_sheet,
+    'category_items': import_category_sheet,
+}
+
+# Errors kept on an ImportJob; the counters still cover every row
+MAX_JOB_ERRORS = 500
+
+# A job still running this long after it started lost its worker (killed
+# or restarted mid-import); the largest sheets import in a few minutes
+STALE_JOB_TIMEOUT = timedelta(hours=1)
+
+
+def enqueue_import(kind, uploaded_file, user):
+    """Store an uploaded sheet as a queued ImportJob for the worker."""
+    return ImportJob.objects.create(kind=kind, file=uploaded_file, created_by=user)
+
+
+def fail_stale_jobs(timeout=STALE_JOB_TIMEOUT):
+    """
+    Mark running jobs that started more than ``timeout`` ago as failed, so
+    their upload page stops polling. They are not re-queued: the batches
+    imported before the worker died are committed, and importing the sheet
+    again from the top would add them twice. Returns the number of jobs.
+    """
+    return ImportJob.objects.filter(status='running', started_at__lt=timezone.now() - timeout).update(
+        status='failed',
+        message="The import worker stopped before finishing this sheet. Rows imported so far were kept; "
+                "upload the remaining rows again.",
+        finished_at=timezone.now(),
+    )
+
+
+def claim_next_job():
+    """
+    Mark the oldest queued ImportJob as running and return it, or None.
+    Jobs left running by a dead worker are failed first.
+
+    The conditional update makes the claim safe with several workers.
+    """
+    stale = fail_stale_jobs()
+    if stale:
+        logger.warning(f"Failed {stale} import jobs left running by a stopped worker")
+    while True:
+        job = ImportJob.objects.filter(status='queued').order_by('created_at').first()
+        if job is None:
+            return None
+        claimed = ImportJob.objects.filter(pk=job.pk, status='queued').update(
+            status='running', started_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_import_job(job):
+    """Import the sheet of a claimed job, recording progress as it goes."""
+    jobs = ImportJob.objects.filter(pk=job.pk)
+
+    def on_progress(result):
+        jobs.update(rows_done=result.created, rows_failed=result.failed)
+
+    try:
+        with job.file.open('rb') as f:
+            df = pd.read_excel(f)
+        if job.kind == 'category_items':
+            df = df.fillna('')
+        jobs.update(total_rows=len(df))
+        result = IMPORTERS[job.kind](df, job.created_by, on_progress=on_progress)
+    except Exception as e:
+        logger.exception(f"Import job {job.pk} failed")
+        jobs.update(status='failed', message=str(e), finished_at=timezone.now())
+        return
+
+    jobs.update(
+        status='done',
+        rows_done=result.created,
+        rows_failed=result.failed,
+        errors=[[row_number, message] for row_number, message in result.errors[:MAX_JOB_ERRORS]],
+        message=f"{result.created} rows imported, {result.failed} rows skipped.",
+        finished_at=timezone.now(),
+    )
@@ -33,6 +33,10 @@ class CategoryItemFilter(django_filters.FilterSet):
         label="Serial Number"
     )
 
+    # Parsed attributes (indexed per category)
+    generation = django_filters.NumberFilter(label="Processor Generation")
+    capacity_gb = django_filters.NumberFilter(label="Capacity (GB)")
+
     class Meta:
         model = catogaryitem  # Link to the CategoryItem model
-        fields = ['category', 'name', 'serial_no']  # The fields to be filtered on
+        fields = ['category', 'name', 'serial_no', 'generation', 'capacity_gb']  # The fields to be filtered on
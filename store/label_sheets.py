@@ -0,0 +1,139 @@
+"""
+Label sheet utility for Solv-IT application.
+
+This module prints barcode labels for many items at once as a multi-page
+PDF. Barcodes are drawn as vector Code128 straight onto the reportlab
+canvas, so no PNG is rendered or written per item. The sheet layout
+matches 21-up A4 label stock (3 x 7 labels of 63.5 x 38.1 mm, e.g. Avery
+L7160).
+"""
+
+import logging
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from reportlab.graphics.barcode.code128 import Code128
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+from .models import Item
+
+logger = logging.getLogger(__name__)
+
+
+PAGE_SIZE = A4
+LABEL_COLUMNS = 3
+LABEL_ROWS = 7
+LABEL_WIDTH = 63.5 * mm
+LABEL_HEIGHT = 38.1 * mm
+MARGIN_LEFT = 7.2 * mm
+MARGIN_TOP = 15.1 * mm
+COLUMN_PITCH = 66.0 * mm
+ROW_PITCH = LABEL_HEIGHT
+LABEL_PADDING = 3 * mm
+BARCODE_HEIGHT = 16 * mm
+MAX_BAR_WIDTH = 0.4 * mm
+
+
+def parse_serials(value):
+    """Split a comma, space or newline separated list of serial numbers."""
+    if not value:
+        return []
+    return [serial for serial in value.replace(',', ' ').split() if serial]
+
+
+def label_items(purchased_code=None, date_from=None, date_to=None, serials=None):
+    """
+    Items to print labels for, as (serialno, name, make_and_models) rows.
+
+    Args:
+        purchased_code (str): Purchase lot code (Item.purchased_code).
+        date_from (date): First creation date to include.
+        date_to (date): Last creation date to include.
+        serials (list): Serial numbers, matched case-insensitively.
+
+    Raises:
+        ValueError: If no filter is given; printing the whole inventory
+            by accident is never what anyone wants.
+    """
+    if not (purchased_code or date_from or date_to or serials):
+        raise ValueError("Give a purchase lot code, a date range or serial numbers")
+
+    items = Item.objects.exclude(serialno__isnull=True).exclude(serialno='')
+    if purchased_code:
+        items = items.filter(purchased_code=purchased_code)
+    if date_from:
+        items = items.filter(created_date__gte=timezone.make_aware(datetime.combine(date_from, time.min)))
+    if date_to:
+        items = items.filter(created_date__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min)))
+    if serials:
+        items = items.filter(serialno__upper__in=[serial.upper() for serial in serials])
+
+    return items.order_by('created_date', 'id').values_list('serialno', 'name', 'make_and_models')
+
+
+def _fit_text(pdf, text, font, size, width):
+    text = str(text or '')
+    while text and pdf.stringWidth(text, font, size) > width:
+        text = text[:-1]
+    return text
+
+
+def _draw_label(pdf, x, y, serialno, name, make_and_models):
+    """Draw one label with its bottom-left corner at (x, y)."""
+    inner_width = LABEL_WIDTH - 2 * LABEL_PADDING
+    serialno = serialno.strip()
+
+    title = _fit_text(pdf, make_and_models or name, 'Helvetica-Bold', 8, inner_width)
+    pdf.setFont('Helvetica-Bold', 8)
+    pdf.drawCentredString(x + LABEL_WIDTH / 2, y + LABEL_HEIGHT - LABEL_PADDING - 8, title)
+
+    try:
+        # Scale the bars so long serials still fit the label width
+        modules = Code128(serialno, barWidth=1, quiet=0).width
+        bar_width = min(MAX_BAR_WIDTH, inner_width / modules)
+        barcode = Code128(serialno, barWidth=bar_width, barHeight=BARCODE_HEIGHT, quiet=0)
+        barcode.drawOn(pdf, x + (LABEL_WIDTH - barcode.width) / 2, y + LABEL_PADDING + 10)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not draw barcode for serial {serialno}: {e}")
+
+    pdf.setFont('Helvetica', 9)
+    pdf.drawCentredString(
+        x + LABEL_WIDTH / 2, y + LABEL_PADDING,
+        _fit_text(pdf, serialno, 'Helvetica', 9, inner_width),
+    )
+
+
+def write_label_sheet(rows, fp, title='Barcode labels'):
+    """
+    Write a label-sheet PDF for ``rows`` of (serialno, name, make_and_models).
+
+    Args:
+        rows (iterable): Label rows, e.g. from label_items().
+        fp: A binary file-like object the PDF is written to.
+
+    Returns:
+        int: Number of labels written.
+    """
+    pdf = canvas.Canvas(fp, pagesize=PAGE_SIZE, pageCompression=1)
+    pdf.setTitle(title)
+    page_height = PAGE_SIZE[1]
+    per_page = LABEL_COLUMNS * LABEL_ROWS
+
+    count = 0
+    for serialno, name, make_and_models in rows:
+        slot = count % per_page
+        if count and not slot:
+            pdf.showPage()
+        column, row = slot % LABEL_COLUMNS, slot // LABEL_COLUMNS
+        x = MARGIN_LEFT + column * COLUMN_PITCH
+        y = page_height - MARGIN_TOP - (row + 1) * ROW_PITCH
+        _draw_label(pdf, x, y, serialno, name, make_and_models)
+        count += 1
+
+    if not count:
+        pdf.setFont('Helvetica', 12)
+        pdf.drawString(MARGIN_LEFT, page_height - MARGIN_TOP, 'No items matched the label filter.')
+    pdf.save()
+    return count
@@ -0,0 +1,44 @@
+"""
+Management command to parse the generation, capacity and normalized name
+of existing components.
+
+Rows saved through the ORM are parsed on save; run this after changing
+the parser, or after rows were written with raw SQL or queryset updates.
+It walks the table in primary key order, one batch per transaction.
+
+Usage:
+    python manage.py backfill_component_attributes
+    python manage.py backfill_component_attributes --batch-size 5000 --only-missing
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from store.catalog import invalidate_parts_catalog
+from store.component_parser import backfill_component_attributes
+from store.models import catogaryitem
+
+
+class Command(BaseCommand):
+    help = 'Parse generation, capacity and normalized name of existing components'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per batch (default 2000)')
+        parser.add_argument(
+            '--only-missing', action='store_true',
+            help='Only rows that were never parsed (empty normalized name)',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        def progress(last_pk, updated):
+            self.stdout.write(f'… up to id {last_pk}: {updated} rows updated')
+
+        updated = backfill_component_attributes(
+            catogaryitem,
+            batch_size=options['batch_size'],
+            only_missing=options['only_missing'],
+            on_progress=progress,
+        )
+        invalidate_parts_catalog()
+        self.stdout.write(self.style.SUCCESS(f'✅ {updated} components updated'))
@@ -0,0 +1,136 @@
+"""
+Management command to benchmark the serial-number, category and date indexes.
+
+Runs the hot-path queries twice: once with the indexes dropped (inside a
+savepoint that is rolled back) and once with them in place, and prints
+the query plan and timing of each side by side. Nothing is written to the
+database; synthetic rows added with --seed are rolled back as well.
+
+Usage:
+    python manage.py benchmark_indexes                 # Use the existing data
+    python manage.py benchmark_indexes --seed 20000    # Add 20000 synthetic serials first
+    python manage.py benchmark_indexes --repeat 200    # Time each query 200 times
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from store.models import Item, ProductAuditTrail, StockPool, catogaryitem
+from transactions.models import (
+    PaymentRecord, Sale, ServiceBillItem, Itempurchased, catogaryitempurchased
+)
+
+
+INDEXED_MODELS = [
+    catogaryitem, Item, ProductAuditTrail,
+    catogaryitempurchased, Itempurchased,
+    Sale, ServiceBillItem, PaymentRecord,
+]
+
+
+def hot_queries(serial):
+    """The lookups made by the product, sale and category views."""
+    return [
+        ('Pool stock by category', StockPool.objects.filter(category='ram')),
+        ('Components of a serial', catogaryitem.objects.filter(serial_no=serial, category='ram')),
+        ('Components of a serial (case-insensitive)', catogaryitem.objects.filter(category='ram', serial_no__upper=serial.upper())),
+        ('Item by serial', Item.objects.filter(serialno__upper=serial.upper())),
+        ('Purchased components of a serial', catogaryitempurchased.objects.filter(serial_no=serial, category='ram')),
+        ('Purchased item by serial', Itempurchased.objects.filter(serialno__upper=serial.upper())),
+        ('Latest sales', Sale.objects.order_by('-date_added')[:25]),
+        ('Latest service bills', ServiceBillItem.objects.order_by('-date_created')[:25]),
+        ('Latest payments', PaymentRecord.objects.order_by('-payment_date')[:25]),
+        ('Latest audit trail', ProductAuditTrail.objects.order_by('-timestamp')[:25]),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Compare query plans and timings of the hot-path queries with and without their indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Insert this many synthetic serials (rolled back afterwards)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='How many times each query is timed',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['seed'])
+
+            serial = (
+                Item.objects.exclude(serialno__isnull=True).values_list('serialno', flat=True).first()
+                or 'BENCH-0'
+            )
+            queries = hot_queries(serial)
+
+            after = self.measure(queries, options['repeat'], 'after')
+
+            # Plans without the indexes, in a savepoint that is rolled back
+            with transaction.atomic():
+                self.drop_indexes()
+                before = self.measure(queries, options['repeat'], 'before')
+                transaction.set_rollback(True)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Sample serial: {serial}\n")
+        for label, _ in queries:
+            plan_before, time_before = before[label]
+            plan_after, time_after = after[label]
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(f"  before ({time_before:.3f} ms): {plan_before}")
+            self.stdout.write(f"  after  ({time_after:.3f} ms): {plan_after}")
+
+    def seed(self, count):
+        categories = [choice for choice, _ in catogaryitem.CATEGORY_CHOICES]
+        serials = [f'BENCH-{i}' for i in range(count)]
+        catogaryitem.objects.bulk_create(
+            [catogaryitem(serial_no=serial, category=category, name=f'{category} part')
+             for serial in serials for category in categories],
+            batch_size=2000,
+        )
+        Item.objects.bulk_create(
+            [Item(name=serial, serialno=serial) for serial in serials],
+            batch_size=2000,
+        )
+        ProductAuditTrail.objects.bulk_create(
+            [ProductAuditTrail(serial_no=serial, action='ASSIGN') for serial in serials],
+            batch_size=2000,
+        )
+        self.stdout.write(f"Seeded {count} synthetic serials")
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+
+    def explain(self, queryset, phase):
+        # The phase comment keeps SQLite from handing back the plan it cached
+        # for the identical statement before the indexes were dropped.
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql} /* {phase} */', params)
+            return ' | '.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+    def measure(self, queries, repeat, phase):
+        results = {}
+        for label, queryset in queries:
+            plan = self.explain(queryset, phase)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - start) * 1000 / repeat
+            results[label] = (plan, elapsed)
+        return results
@@ -0,0 +1,33 @@
+"""
+Management command to fold Solv-IT component rows into the stock pool.
+
+Pool stock lives in StockPool, one row per part. The migration creating
+it folds the existing 'Solv-IT' catogaryitem rows; run this if such rows
+appear again (written through the admin, raw SQL or an old client).
+
+Usage:
+    python manage.py compact_stock_pool
+    python manage.py compact_stock_pool --batch-size 5000
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from store.catalog import invalidate_parts_catalog
+from store.models import StockPool, catogaryitem
+from store.stock_pool import compact_stock_pool
+
+
+class Command(BaseCommand):
+    help = "Fold 'Solv-IT' component rows into the stock pool table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per batch (default 2000)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        folded, created, updated = compact_stock_pool(catogaryitem, StockPool, batch_size=options['batch_size'])
+        invalidate_parts_catalog()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {folded} rows folded: {created} parts added to the pool, {updated} updated'
+        ))
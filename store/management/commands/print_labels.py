@@ -0,0 +1,66 @@
+"""
+Management command to print barcode labels for many items as one PDF.
+
+Usage:
+    python manage.py print_labels --lot PO-2024-17                # All items of a purchase lot
+    python manage.py print_labels --from 2024-05-01 --to 2024-05-31
+    python manage.py print_labels --serial ABC123 --serial XYZ9   # Specific serials
+    python manage.py print_labels --serials-file serials.txt      # One serial per line
+    python manage.py print_labels --lot PO-2024-17 --output lot17.pdf
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from store.label_sheets import label_items, parse_serials, write_label_sheet
+
+
+def _date(value):
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise CommandError(f"❌ Invalid date '{value}', use YYYY-MM-DD")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Print a barcode label-sheet PDF for a purchase lot, date range or serial list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lot', type=str, help='Purchase lot code (purchased code of the items)')
+        parser.add_argument('--from', dest='date_from', type=str, help='First creation date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=str, help='Last creation date (YYYY-MM-DD)')
+        parser.add_argument('--serial', action='append', default=[], help='Serial number (repeatable)')
+        parser.add_argument('--serials-file', type=str, help='File with serial numbers, one per line')
+        parser.add_argument('--output', type=str, default='labels.pdf', help='PDF file to write (default: labels.pdf)')
+
+    def handle(self, *args, **options):
+        serials = list(options['serial'])
+        if options['serials_file']:
+            try:
+                with open(options['serials_file']) as f:
+                    serials += parse_serials(f.read())
+            except OSError as e:
+                raise CommandError(f"❌ Cannot read serials file: {e}")
+
+        try:
+            rows = label_items(
+                purchased_code=options['lot'],
+                date_from=_date(options['date_from']) if options['date_from'] else None,
+                date_to=_date(options['date_to']) if options['date_to'] else None,
+                serials=serials,
+            )
+        except ValueError as e:
+            raise CommandError(f"❌ {e}")
+
+        start = time.perf_counter()
+        with open(options['output'], 'wb') as f:
+            count = write_label_sheet(rows.iterator(), f, title=f"Labels {options['lot'] or ''}".strip())
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Wrote {count} label(s) to {options['output']} in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,29 @@
+"""
+Management command to rebuild the dashboard rollup tables.
+
+The daily sales summary is kept current by signals on Sale; rebuild it
+after importing or editing sales with raw SQL or queryset updates. The
+stock snapshot of today is taken again as well.
+
+Usage:
+    python manage.py rebuild_dashboard_rollups
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from store.rollups import take_stock_snapshot
+from transactions.rollups import rebuild_sales_summary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales summary and take a fresh stock snapshot'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            days = rebuild_sales_summary()
+        self.stdout.write(self.style.SUCCESS(f'✅ Daily sales summary rebuilt: {days} day(s)'))
+
+        stock = take_stock_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            '✅ Stock snapshot: ' + ', '.join(f'{category} {quantity}' for category, quantity in stock.items())
+        ))
@@ -0,0 +1,29 @@
+"""
+Management command to rebuild the product and component search index.
+
+The index is normally kept up to date by signals and by the Excel
+importer; rebuild it after raw SQL changes or bulk queryset updates.
+
+Usage:
+    python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from store.search import SEARCH_INDEXES, fts_enabled, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of items, purchased items and components'
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            self.stdout.write(self.style.WARNING(
+                '⚠️ Database is not SQLite; searches use the trigram indexes, nothing to rebuild'
+            ))
+            return
+
+        for model, index in SEARCH_INDEXES.items():
+            with transaction.atomic():
+                count = rebuild(model)
+            self.stdout.write(self.style.SUCCESS(f'✅ {index.table}: {count} rows'))
@@ -1,113 +1,157 @@
 """
-Management command to generate/regenerate barcodes for products.
+Management command to pre-render product barcodes.
+
+Barcodes are served by the /barcode/<serial>.png|svg endpoint, which
+renders on demand into the sharded cache under BARCODE_CACHE_DIR (see
+store.barcode_utils.get_barcode_image). This command fills that cache
+ahead of time, e.g. before printing label sheets for a large intake, so
+no request has to render. Serials already cached are skipped without
+rendering; with --workers the rendering is spread over a process pool.
+
+Files under MEDIA_ROOT/barcodes and Item.barcode_file are no longer read
+or written by anything.
 
 Usage:
-    python manage.py regenerate_barcodes              # Regenerate for products without barcodes
-    python manage.py regenerate_barcodes --all        # Regenerate for all products
-    python manage.py regenerate_barcodes --serial ABC123  # Regenerate for specific serial
+    python manage.py regenerate_barcodes              # Render barcodes missing from the cache
+    python manage.py regenerate_barcodes --serial ABC123  # Render for specific serial
+    python manage.py regenerate_barcodes --workers 8  # Use 8 processes
+    python manage.py regenerate_barcodes --format png --format svg  # Both formats
+    python manage.py regenerate_barcodes --force      # Re-render even if cached
 """
 
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
 from django.core.management.base import BaseCommand, CommandError
 from store.models import Item
-from store.barcode_utils import generate_barcode_file
+from store.barcode_utils import BARCODE_FORMATS, warm_barcode_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _warm_task(task):
+    """Process-pool entry point: (serial, formats, force) -> result dict."""
+    serial, formats, force = task
+    try:
+        return warm_barcode_cache(serial, formats, force)
+    except Exception as e:
+        return {'serial': serial, 'status': 'failed', 'error': str(e)}
+
+
 class Command(BaseCommand):
-    help = 'Generate or regenerate barcodes for products'
+    help = 'Pre-render product barcodes into the barcode endpoint cache'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--all',
             action='store_true',
-            help='Regenerate barcodes for all products',
+            help='Accepted for old scripts; every product is processed by default',
         )
         parser.add_argument(
             '--serial',
             type=str,
-            help='Regenerate barcode for specific serial number',
+            help='Render the barcode of a specific serial number',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes rendering barcodes (default: 1, 0 = one per CPU)',
+        )
+        parser.add_argument(
+            '--format',
+            action='append',
+            choices=sorted(BARCODE_FORMATS),
+            dest='formats',
+            help='Format to render; repeat for several (default: png)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Render every barcode even if it is cached already',
         )
 
     def handle(self, *args, **options):
         try:
-            self.stdout.write(self.style.SUCCESS('🔄 Starting barcode regeneration...\n'))
-            
+            self.stdout.write(self.style.SUCCESS('🔄 Starting barcode rendering...\n'))
+            self.verbosity = options['verbosity']
+            self.force = options['force']
+            self.formats = tuple(options['formats'] or ['png'])
+            self.workers = options['workers'] or os.cpu_count() or 1
+            if self.workers < 0:
+                raise CommandError("❌ --workers must be 0 or more")
+
             if options['serial']:
-                # Regenerate for specific serial
+                # Render for specific serial
                 serial = options['serial']
                 self.stdout.write(f"🔍 Searching for product with serial: {serial}")
-                
-                try:
-                    item = Item.objects.get(serialno__iexact=serial)
-                    self._generate_barcode_for_item(item)
-                except Item.DoesNotExist:
+
+                items = Item.objects.filter(serialno__upper=serial.strip().upper())
+                if not items.exists():
                     raise CommandError(f"❌ Product with serial '{serial}' not found")
-            
-            elif options['all']:
-                # Regenerate for all products
-                self.stdout.write(self.style.WARNING('\n⚠️ Regenerating barcodes for ALL products...\n'))
-                items = Item.objects.all()
-                self._regenerate_for_items(items)
-            
             else:
-                # Regenerate for products without barcodes
-                self.stdout.write('🔄 Regenerating barcodes for products without barcodes...\n')
-                items = Item.objects.filter(barcode_file__isnull=True) | Item.objects.filter(barcode_file='')
-                
-                if not items.exists():
-                    self.stdout.write(self.style.SUCCESS('✅ All products already have barcodes!'))
-                    return
-                
-                self._regenerate_for_items(items)
-        
+                items = Item.objects.all()
+
+            self._render_for_items(items)
+
+        except CommandError:
+            raise
         except Exception as e:
             raise CommandError(f"❌ Error: {str(e)}")
 
-    def _regenerate_for_items(self, items):
-        """Regenerate barcodes for multiple items"""
-        total = items.count()
-        self.stdout.write(f"📦 Found {total} product(s) to process\n")
-        
-        success_count = 0
-        error_count = 0
-        
-        for index, item in enumerate(items, 1):
-            try:
-                self.stdout.write(f"\n[{index}/{total}] Processing: {item.name} (Serial: {item.serialno})")
-                self._generate_barcode_for_item(item)
-                success_count += 1
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"    ❌ Error: {str(e)}"))
-                error_count += 1
-        
+    def _render_for_items(self, items):
+        """Render the barcodes of the serials of ``items`` into the cache"""
+        serials = set()
+        missing_serial = 0
+        for serialno in items.values_list('serialno', flat=True).iterator():
+            serialno = (serialno or '').strip()
+            if serialno:
+                # Several items can share a serial; render each serial once
+                serials.add(serialno)
+            else:
+                missing_serial += 1
+
+        self.stdout.write(
+            f"📦 Found {len(serials)} serial(s) to process ({', '.join(self.formats)}, {self.workers} worker(s))\n"
+        )
+        tasks = [(serial, self.formats, self.force) for serial in sorted(serials)]
+
+        counts = {'written': 0, 'cached': 0, 'failed': 0}
+        for index, result in enumerate(self._run(tasks), 1):
+            serial = result['serial']
+            status = result['status']
+            counts[status] += 1
+
+            if status == 'failed':
+                self.stdout.write(self.style.ERROR(f"    ❌ Error for {serial}: {result['error']}"))
+                continue
+
+            if self.verbosity >= 2:
+                self.stdout.write(f"  [{index}/{len(tasks)}] 🏷️ {serial}: {status}")
+            elif index % 1000 == 0:
+                self.stdout.write(f"  ... {index}/{len(tasks)} serials processed")
+
         # Summary
         self.stdout.write('\n' + '='*70)
-        self.stdout.write(self.style.SUCCESS(f'✅ Successfully generated: {success_count}'))
-        if error_count > 0:
-            self.stdout.write(self.style.ERROR(f'❌ Failed: {error_count}'))
+        self.stdout.write(self.style.SUCCESS(f'✅ Rendered: {counts["written"]}'))
+        self.stdout.write(f'⏭️ Skipped (already cached): {counts["cached"]}')
+        if missing_serial:
+            self.stdout.write(self.style.WARNING(f'⚠️ Items without serial number: {missing_serial}'))
+        if counts['failed'] > 0:
+            self.stdout.write(self.style.ERROR(f'❌ Failed: {counts["failed"]}'))
         self.stdout.write('='*70)
 
-    def _generate_barcode_for_item(self, item):
-        """Generate barcode for a single item"""
-        if not item.serialno:
-            raise ValueError(f"Item {item.name} has no serial number")
-        
-        try:
-            serialno = item.serialno.strip()
-            self.stdout.write(f"  🏷️ Serial: {serialno}")
-            
-            # Generate barcode
-            barcode_filename, barcode_path = generate_barcode_file(serialno)
-            
-            # Update item
-            item.barcode_file = barcode_path
-            item.save()
-            
-            self.stdout.write(self.style.SUCCESS(
-                f'  ✅ Barcode generated: {barcode_filename}'
-            ))
-            
-        except Exception as e:
-            raise Exception(f"Barcode generation failed for {item.serialno}: {str(e)}")
+    def _run(self, tasks):
+        """Yield render results, in-process or from a process pool."""
+        if self.workers <= 1 or len(tasks) < 2:
+            for task in tasks:
+                yield _warm_task(task)
+            return
+
+        # Workers only touch files; django.setup() makes them work under
+        # the spawn start method too (it is a no-op after fork).
+        chunksize = max(1, min(256, len(tasks) // (self.workers * 4)))
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup) as executor:
+            yield from executor.map(_warm_task, tasks, chunksize=chunksize)
@@ -0,0 +1,52 @@
+"""
+Management command to process queued spreadsheet imports.
+
+Uploads only store the sheet as an ImportJob; this worker imports them
+one at a time and keeps their progress counters up to date.
+
+Usage:
+    python manage.py run_import_worker              # Poll for jobs forever
+    python manage.py run_import_worker --once       # Drain the queue and exit
+    python manage.py run_import_worker --interval 2 # Poll every 2 seconds
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from store.excel_import import claim_next_job, run_import_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued spreadsheet imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Import worker started')
+        try:
+            while True:
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+
+                self.stdout.write(f'Processing import #{job.pk} ({job.kind}) ...')
+                run_import_job(job)
+                job.refresh_from_db()
+                style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+                self.stdout.write(style(f'Import #{job.pk} {job.status}: {job.message}'))
+        except KeyboardInterrupt:
+            self.stdout.write('Import worker stopped')
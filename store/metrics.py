@@ -0,0 +1,285 @@
+"""
+Request metrics utility for Solv-IT application.
+
+This module collects per-view request metrics and renders them in the
+Prometheus text format served at ``/metrics``:
+
+- ``solvit_http_requests_total``: requests by view, method and status.
+- ``solvit_http_request_duration_seconds``: request latency histogram.
+- ``solvit_db_queries_per_request``: histogram of queries per request.
+- ``solvit_db_time_per_request_seconds``: histogram of time spent in the
+  database per request.
+- ``solvit_template_render_seconds``: histogram of template render time
+  per request.
+- ``solvit_duplicate_queries_total``: executions of a SELECT the same
+  request already ran (the N+1 pattern), and
+  ``solvit_requests_with_duplicate_queries_total`` for the requests that
+  had at least ``METRICS_DUPLICATE_QUERY_THRESHOLD`` of them.
+- ``solvit_slow_requests_total``: requests slower than
+  ``METRICS_SLOW_REQUEST_SECONDS``; a sample of them is logged with their
+  slowest and most repeated SQL.
+
+Views are labelled by URL name (``request.resolver_match.view_name``).
+
+Each worker process counts in memory and copies its totals to the shared
+Django cache at most every ``FLUSH_INTERVAL`` seconds; ``/metrics`` adds
+up the copies of every worker seen in the last ``WORKER_TTL`` seconds, so
+a scrape that lands on any gunicorn worker reports the whole server.
+"""
+
+import logging
+import os
+import random
+import re
+import socket
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+FLUSH_INTERVAL = 10
+WORKER_TTL = 60 * 60
+WORKERS_CACHE_KEY = 'store:metrics:workers'
+
+SLOW_LOG_QUERIES = 5
+
+METRICS = {
+    'solvit_http_requests_total': ('counter', 'HTTP requests by view, method and status.'),
+    'solvit_http_request_duration_seconds': ('histogram', 'Request latency by view.', LATENCY_BUCKETS),
+    'solvit_db_queries_per_request': ('histogram', 'Database queries per request by view.', QUERY_COUNT_BUCKETS),
+    'solvit_db_time_per_request_seconds': ('histogram', 'Database time per request by view.', LATENCY_BUCKETS),
+    'solvit_template_render_seconds': ('histogram', 'Template render time per request by view.', LATENCY_BUCKETS),
+    'solvit_duplicate_queries_total': ('counter', 'Repeated executions of a SELECT within one request.'),
+    'solvit_requests_with_duplicate_queries_total': ('counter', 'Requests with an N+1 query pattern.'),
+    'solvit_slow_requests_total': ('counter', 'Requests slower than the slow request threshold.'),
+}
+
+# Literals are dropped so "WHERE id = 1" and "WHERE id = 2" count as the
+# same statement when a backend inlines parameters
+SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Registry:
+    """
+    The counters and histograms of this process.
+
+    Counters map (name, labels) to a number; histograms map (name, labels)
+    to [bucket counts..., sum, count] with non-cumulative bucket counts
+    and one extra bucket for +Inf.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.key = f'store:metrics:worker:{socket.gethostname()}:{os.getpid()}'
+        self.flushed_at = 0
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, labels)
+        with self.lock:
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = [0] * (len(buckets) + 3)
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {key: list(series) for key, series in self.histograms.items()},
+            }
+
+    def flush(self, force=False):
+        """Copy this process' totals to the shared cache, at most every FLUSH_INTERVAL seconds."""
+        now = time.time()
+        if not force and now - self.flushed_at < FLUSH_INTERVAL:
+            return
+        self.flushed_at = now
+        try:
+            cache.set(self.key, self.snapshot(), WORKER_TTL)
+            workers = cache.get(WORKERS_CACHE_KEY) or {}
+            workers = {key: seen for key, seen in workers.items() if now - seen < WORKER_TTL}
+            workers[self.key] = now
+            cache.set(WORKERS_CACHE_KEY, workers, None)
+        except Exception:
+            # Metrics must never fail a request
+            logger.exception('Could not flush request metrics')
+
+    def collect(self):
+        """The totals of every live worker, this one included."""
+        self.flush(force=True)
+        workers = cache.get(WORKERS_CACHE_KEY) or {}
+        snapshots = cache.get_many(list(workers)).values() if workers else []
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for key, value in snapshot['counters'].items():
+                counters[key] = counters.get(key, 0) + value
+            for key, series in snapshot['histograms'].items():
+                if key in histograms:
+                    histograms[key] = [a + b for a, b in zip(histograms[key], series)]
+                else:
+                    histograms[key] = list(series)
+        return counters, histograms
+
+
+registry = Registry()
+
+
+class RequestRecorder:
+    """
+    What one request did: installed as a database execute wrapper, and
+    read by the template instrumentation through ``current_request``.
+    """
+
+    def __init__(self):
+        self.queries = []  # (sql, seconds)
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.db_time += elapsed
+            self.queries.append((sql, elapsed))
+
+    def duplicates(self):
+        """SELECT statement -> times it ran, for those that ran more than once."""
+        counts = {}
+        for sql, _ in self.queries:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            statement = SQL_LITERAL.sub('?', sql)
+            counts[statement] = counts.get(statement, 0) + 1
+        return {statement: count for statement, count in counts.items() if count > 1}
+
+
+current_request = ContextVar('store_metrics_request', default=None)
+
+_template_render = Template.render
+
+
+def _timed_template_render(self, context):
+    recorder = current_request.get()
+    # Included templates render inside their parent; time the outermost only
+    if recorder is None or recorder.rendering:
+        return _template_render(self, context)
+    recorder.rendering = True
+    start = time.perf_counter()
+    try:
+        return _template_render(self, context)
+    finally:
+        recorder.template_time += time.perf_counter() - start
+        recorder.rendering = False
+
+
+def instrument_templates():
+    """Time template rendering (the way django.test instruments it)."""
+    Template.render = _timed_template_render
+
+
+def record_request(request, response, recorder, duration):
+    match = getattr(request, 'resolver_match', None)
+    view = (match.view_name if match else None) or '<unresolved>'
+    labels = (('view', view),)
+
+    registry.inc('solvit_http_requests_total', labels + (('method', request.method), ('status', str(response.status_code))))
+    registry.observe('solvit_http_request_duration_seconds', labels, duration)
+    registry.observe('solvit_db_queries_per_request', labels, len(recorder.queries))
+    registry.observe('solvit_db_time_per_request_seconds', labels, recorder.db_time)
+    if recorder.template_time:
+        registry.observe('solvit_template_render_seconds', labels, recorder.template_time)
+
+    duplicates = recorder.duplicates()
+    repeated = sum(count - 1 for count in duplicates.values())
+    if repeated:
+        registry.inc('solvit_duplicate_queries_total', labels, repeated)
+        if repeated >= setting('METRICS_DUPLICATE_QUERY_THRESHOLD', 10):
+            registry.inc('solvit_requests_with_duplicate_queries_total', labels)
+
+    slow = setting('METRICS_SLOW_REQUEST_SECONDS', 1.0)
+    if slow is not None and duration >= slow:
+        registry.inc('solvit_slow_requests_total', labels)
+        if random.random() < setting('METRICS_SLOW_LOG_SAMPLE_RATE', 1.0):
+            log_slow_request(request, view, duration, recorder, duplicates)
+
+    registry.flush()
+
+
+def log_slow_request(request, view, duration, recorder, duplicates):
+    lines = [
+        f"Slow request {request.method} {request.path} ({view}): {duration * 1000:.0f} ms, "
+        f"{len(recorder.queries)} queries in {recorder.db_time * 1000:.0f} ms, "
+        f"templates {recorder.template_time * 1000:.0f} ms"
+    ]
+    for sql, elapsed in sorted(recorder.queries, key=lambda query: query[1], reverse=True)[:SLOW_LOG_QUERIES]:
+        lines.append(f"  {elapsed * 1000:.1f} ms: {sql[:500]}")
+    for statement, count in sorted(duplicates.items(), key=lambda item: item[1], reverse=True)[:SLOW_LOG_QUERIES]:
+        lines.append(f"  ran {count}x: {statement[:500]}")
+    logger.warning('\n'.join(lines))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    """All workers' metrics in the Prometheus text exposition format."""
+    counters, histograms = registry.collect()
+    lines = []
+    for name, (kind, help_text, *rest) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+            continue
+        buckets = rest[0]
+        for (metric, labels), series in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], series):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(series[-2])}')
+            lines.append(f'{name}_count{_labels(labels)} {series[-1]}')
+    return '\n'.join(lines) + '\n'
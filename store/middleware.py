@@ -0,0 +1,54 @@
+"""
+Middleware for Solv-IT application.
+
+RequestMetricsMiddleware times every request, counts and times its
+database queries and template rendering, and records the result per URL
+name in ``store.metrics``. It should come first in MIDDLEWARE so the
+queries of the other middleware (sessions, auth) are counted too.
+Streamed responses (the CSV exports) are timed until they start streaming.
+"""
+
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import RequestRecorder, current_request, instrument_templates, record_request
+
+
+class RequestMetricsMiddleware:
+    """
+    Settings:
+    - METRICS_ENABLED: Collect metrics (default True).
+    - METRICS_EXCLUDE_PATHS: Path prefixes not recorded (default /metrics,
+      static and media).
+    - METRICS_SLOW_REQUEST_SECONDS, METRICS_SLOW_LOG_SAMPLE_RATE,
+      METRICS_DUPLICATE_QUERY_THRESHOLD: See ``store.metrics``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+        self.exclude = tuple(getattr(
+            settings, 'METRICS_EXCLUDE_PATHS', ['/metrics', '/' + settings.STATIC_URL.lstrip('/'), settings.MEDIA_URL]
+        ))
+        if self.enabled:
+            instrument_templates()
+
+    def __call__(self, request):
+        if not self.enabled or request.path.startswith(self.exclude):
+            return self.get_response(request)
+
+        recorder = RequestRecorder()
+        token = current_request.set(recorder)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        record_request(request, response, recorder, time.perf_counter() - start)
+        return response
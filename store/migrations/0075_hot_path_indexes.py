@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:55
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_customer_person_type'),
+        ('store', '0074_item_barcode_file'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='catogaryitem',
+            index=models.Index(fields=['serial_no', 'category'], name='catitem_serial_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catogaryitem',
+            index=models.Index(django.db.models.functions.text.Upper('serial_no'), name='catitem_serial_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['serialno'], name='item_serialno_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(django.db.models.functions.text.Upper('serialno'), name='item_serialno_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productaudittrail',
+            index=models.Index(fields=['timestamp'], name='audit_timestamp_idx'),
+        ),
+    ]
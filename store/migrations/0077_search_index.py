@@ -0,0 +1,55 @@
+from django.db import migrations
+
+
+# (table, indexed table, name column, serial column, model column)
+SEARCH_TABLES = [
+    ('store_item_search', 'store_item', 'name', 'serialno', 'make_and_models'),
+    ('transactions_itempurchased_search', 'transactions_itempurchased', 'name', 'serialno', 'make_and_models'),
+    ('store_catogaryitem_search', 'store_catogaryitem', 'name', 'serial_no', 'category'),
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for table, source, name, serial, model in SEARCH_TABLES:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} "
+                f"USING fts5(name, serial, model, tokenize='trigram')"
+            )
+            schema_editor.execute(
+                f"INSERT INTO {table} (rowid, name, serial, model) "
+                f"SELECT id, COALESCE({name}, ''), COALESCE({serial}, ''), COALESCE({model}, '') FROM {source}"
+            )
+    elif vendor == 'postgresql':
+        # icontains compiles to UPPER(col) LIKE UPPER(%s); index exactly that
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table, source, *columns in SEARCH_TABLES:
+            for column in columns:
+                schema_editor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {source}_{column}_trgm '
+                    f'ON {source} USING gin (UPPER({column}) gin_trgm_ops)'
+                )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for table, *_ in SEARCH_TABLES:
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+    elif vendor == 'postgresql':
+        for table, source, *columns in SEARCH_TABLES:
+            for column in columns:
+                schema_editor.execute(f'DROP INDEX IF EXISTS {source}_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0076_importjob'),
+        ('transactions', '0048_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0077_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('category', models.CharField(max_length=50)),
+                ('quantity', models.IntegerField(default=0)),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-date', 'category'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'category'), name='stocksnapshot_date_category_uniq')],
+            },
+        ),
+    ]
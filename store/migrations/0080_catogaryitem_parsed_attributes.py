@@ -0,0 +1,48 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+from store.component_parser import backfill_component_attributes
+
+
+def parse_existing_components(apps, schema_editor):
+    # Same chunked pass as ``manage.py backfill_component_attributes``
+    backfill_component_attributes(apps.get_model('store', 'catogaryitem'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0079_item_name_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catogaryitem',
+            name='capacity_gb',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='catogaryitem',
+            name='generation',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='catogaryitem',
+            name='normalized_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='catogaryitem',
+            index=models.Index(fields=['category', 'generation'], name='catitem_category_gen_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catogaryitem',
+            index=models.Index(fields=['category', 'capacity_gb'], name='catitem_category_capacity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catogaryitem',
+            index=models.Index(fields=['normalized_name'], name='catitem_normalized_name_idx'),
+        ),
+        migrations.RunPython(parse_existing_components, migrations.RunPython.noop),
+    ]
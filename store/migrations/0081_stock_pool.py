@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:35
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+from store.stock_pool import compact_stock_pool
+
+
+def fold_pool_components(apps, schema_editor):
+    # Same batched pass as ``manage.py compact_stock_pool``
+    compact_stock_pool(apps.get_model('store', 'catogaryitem'), apps.get_model('store', 'StockPool'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0080_catogaryitem_parsed_attributes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockPool',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('ssd', 'SSDs'), ('processor', 'Processors'), ('hdd', 'HDDs'), ('ram', 'RAMs')], max_length=20)),
+                ('name', models.CharField(max_length=100)),
+                ('normalized_name', models.CharField(editable=False, max_length=100)),
+                ('generation', models.PositiveSmallIntegerField(blank=True, editable=False, null=True)),
+                ('capacity_gb', models.PositiveIntegerField(blank=True, editable=False, null=True)),
+                ('quantity', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('unit_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_pool_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'stock pool',
+                'ordering': ['category', 'name'],
+                'indexes': [models.Index(fields=['category', 'generation'], name='stockpool_category_gen_idx'), models.Index(fields=['category', 'capacity_gb'], name='stockpool_category_cap_idx')],
+                'constraints': [models.UniqueConstraint(fields=('category', 'normalized_name'), name='stockpool_category_name_uniq')],
+            },
+        ),
+        migrations.RunPython(fold_pool_components, migrations.RunPython.noop),
+    ]
@@ -11,18 +11,27 @@ This module defines the following classes:
 Each class provides specific fields and methods for handling related data.
 """
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Upper
 from django.urls import reverse
 from django.forms import model_to_dict
 from django_extensions.db.fields import AutoSlugField
 from phonenumber_field.modelfields import PhoneNumberField
 from accounts.models import Vendor
+from .component_parser import PARSED_FIELDS, apply_parsed_attributes, normalize_name
 from django.core.validators import MinValueValidator
 from django import forms
 from django.contrib.auth.models import User
 from django.utils import timezone
 from accounts.models import Vendor, Customer
 from django.conf import settings
+from transactions.field_tracking import TrackedFieldsMixin
+
+
+# Allow ``serial_no__upper=VALUE.upper()`` lookups. Unlike ``__iexact``
+# (a LIKE on SQLite) these are served by the Upper() indexes below.
+models.CharField.register_lookup(Upper)
 
 class Ram(models.Model):
     """
@@ -124,7 +133,7 @@ class Motherboard(models.Model):
         verbose_name_plural = 'Motherboards'
 
 
-class catogaryitem(models.Model):
+class catogaryitem(TrackedFieldsMixin, models.Model):
     CATEGORY_CHOICES = [
         ('ssd', 'SSDs'),
         ('processor', 'Processors'),
@@ -141,7 +150,11 @@ class catogaryitem(models.Model):
     quantity = models.IntegerField(default=1, null=True, blank=True)
     unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     purchase_lot_code = models.CharField(max_length=100, null=True, blank=True, default=None)
-    
+
+    # Parsed from name on save (see store.component_parser)
+    generation = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    capacity_gb = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    normalized_name = models.CharField(max_length=100, blank=True, default='', editable=False)
 
     created_by = models.ForeignKey(
         User, on_delete=models.SET_NULL, null=True, blank=True, related_name='category_items_created'
@@ -158,10 +171,27 @@ class catogaryitem(models.Model):
         """
         return f"category: {self.category} ( {self.name} ) X {self.quantity}"
 
+    # Indexed by the search bar autocomplete (store.autocomplete)
+    tracked_fields = ('name', 'serial_no', 'category')
+
+    def save(self, *args, **kwargs):
+        apply_parsed_attributes(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'name', 'category'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | set(PARSED_FIELDS)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name_plural = 'category_item'
-
-class Item(models.Model):
+        indexes = [
+            models.Index(fields=['serial_no', 'category'], name='catitem_serial_category_idx'),
+            models.Index(Upper('serial_no'), name='catitem_serial_upper_idx'),
+            models.Index(fields=['category', 'generation'], name='catitem_category_gen_idx'),
+            models.Index(fields=['category', 'capacity_gb'], name='catitem_category_capacity_idx'),
+            models.Index(fields=['normalized_name'], name='catitem_normalized_name_idx'),
+        ]
+
+class Item(TrackedFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ('NA', 'NA'),
         ('available', 'Available'),
@@ -174,7 +204,7 @@ class Item(models.Model):
         ('customer', 'Customer'),
     ]
 
-    slug = AutoSlugField(unique=False, populate_from='name')
+    slug = AutoSlugField(unique=False, populate_from='name', overwrite_on_add=False)
     name = models.CharField(max_length=50)
     serialno = models.CharField(max_length=50, unique=False, null=True)
     make_and_models = models.CharField(max_length=100, null=True)
@@ -205,6 +235,9 @@ class Item(models.Model):
 
     barcode_file = models.ImageField(upload_to='barcodes/', null=True, blank=True)
 
+    # Indexed by the search bar autocomplete (store.autocomplete)
+    tracked_fields = ('name', 'serialno', 'make_and_models')
+
     def __str__(self):
         return f"{self.name} - serialno: {self.serialno or 'N/A'}, make_and_models: {self.make_and_models}, customer_name: {self.customer.first_name if self.customer else 'N/A'}"
 
@@ -238,6 +271,12 @@ class Item(models.Model):
     class Meta:
         ordering = ['name']
         verbose_name_plural = 'Items'
+        indexes = [
+            models.Index(fields=['serialno'], name='item_serialno_idx'),
+            models.Index(Upper('serialno'), name='item_serialno_upper_idx'),
+            # Keyset pagination of the product list (Meta.ordering + pk)
+            models.Index(fields=['name', 'id'], name='item_name_id_idx'),
+        ]
 
 
 
@@ -304,6 +343,9 @@ class ProductAuditTrail(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp'], name='audit_timestamp_idx'),
+        ]
         verbose_name = 'Product Audit Trail'
         verbose_name_plural = 'Product Audit Trails'
     
@@ -314,3 +356,226 @@ class ProductAuditTrail(models.Model):
     
 
 
+
+
+class ImportJob(models.Model):
+    """
+    A spreadsheet upload queued for the ``run_import_worker`` command.
+
+    The upload view only stores the file and returns; the worker imports
+    it in chunks and keeps the row counters up to date for the progress
+    endpoint.
+    """
+    KIND_CHOICES = [
+        ('items', 'Products'),
+        ('category_items', 'Category Items'),
+    ]
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    file = models.FileField(upload_to='imports/')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+
+    total_rows = models.PositiveIntegerField(default=0)
+    rows_done = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True, default='')
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='importjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.kind}) - {self.status}"
+
+    @property
+    def eta_seconds(self):
+        """Seconds left at the current import rate, or None when unknown."""
+        processed = self.rows_done + self.rows_failed
+        if self.status != 'running' or not self.started_at or not processed:
+            return None
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        remaining = max(self.total_rows - processed, 0)
+        return round(elapsed / processed * remaining, 1)
+
+    def to_progress(self):
+        return {
+            'id': self.pk,
+            'kind': self.kind,
+            'status': self.status,
+            'total_rows': self.total_rows,
+            'rows_done': self.rows_done,
+            'rows_failed': self.rows_failed,
+            'eta_seconds': self.eta_seconds,
+            'errors': self.errors[:50],
+            'message': self.message,
+        }
+
+
+class DailyStockSnapshot(models.Model):
+    """
+    Solv-IT pool stock (StockPool) per component category on a day.
+
+    The dashboard reads today's rows instead of aggregating the stock
+    pool on every load; they are refreshed when older than a few minutes
+    and the previous days are kept as stock history.
+    """
+    date = models.DateField()
+    category = models.CharField(max_length=50)
+    quantity = models.IntegerField(default=0)
+    taken_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-date', 'category']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category'], name='stocksnapshot_date_category_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.category} stock on {self.date}: {self.quantity}"
+
+
+# Serial number the Solv-IT pool goes by; its stock is kept in StockPool
+STOCK_POOL_SERIAL = 'Solv-IT'
+
+
+def is_pool_serial(serial_no):
+    return (serial_no or '').strip().upper() == STOCK_POOL_SERIAL.upper()
+
+
+class StockPoolManager(models.Manager):
+
+    def lookup(self, category, name):
+        """The pool row of a part (one indexed read), or None."""
+        return self.filter(category=category, normalized_name=normalize_name(name)).first()
+
+    def add(self, category, name, quantity, unit_price=None, user=None):
+        """
+        Add ``quantity`` of a part to the pool: an F() increment of its row,
+        or a new row if the pool never held it. The lowest unit price is kept.
+        """
+        key = {'category': category, 'normalized_name': normalize_name(name)}
+        changes = {'quantity': F('quantity') + quantity, 'updated_by': user, 'updated_at': timezone.now()}
+        if unit_price is not None:
+            changes['unit_price'] = Case(
+                When(Q(unit_price__isnull=True) | Q(unit_price__gt=unit_price), then=Value(unit_price)),
+                default=F('unit_price'),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            )
+        if self.filter(**key).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                self.create(
+                    category=category, name=' '.join(name.split()), quantity=quantity,
+                    unit_price=unit_price, updated_by=user,
+                )
+        except IntegrityError:
+            # Created by someone else in the meantime
+            self.filter(**key).update(**changes)
+
+    def take(self, category, name, quantity, user=None):
+        """
+        Take ``quantity`` of a part from the pool with a single conditional
+        F() decrement. Returns False, changing nothing, if the pool holds less.
+        """
+        return bool(
+            self.filter(category=category, normalized_name=normalize_name(name), quantity__gte=quantity)
+            .update(quantity=F('quantity') - quantity, updated_by=user, updated_at=timezone.now())
+        )
+
+
+class StockPool(models.Model):
+    """
+    Solv-IT spare parts stock: one row per part, unique on category and
+    normalized name, so a stock lookup is a single indexed row and
+    quantities change with in-place F() updates (see StockPoolManager).
+    """
+    category = models.CharField(max_length=20, choices=catogaryitem.CATEGORY_CHOICES)
+    name = models.CharField(max_length=100)
+    normalized_name = models.CharField(max_length=100, editable=False)
+    generation = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    capacity_gb = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    quantity = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    updated_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_pool_updated'
+    )
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = StockPoolManager()
+
+    class Meta:
+        ordering = ['category', 'name']
+        verbose_name_plural = 'stock pool'
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'normalized_name'], name='stockpool_category_name_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['category', 'generation'], name='stockpool_category_gen_idx'),
+            models.Index(fields=['category', 'capacity_gb'], name='stockpool_category_cap_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category}: {self.name} X {self.quantity}"
+
+    def save(self, *args, **kwargs):
+        apply_parsed_attributes(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'name', 'category'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | set(PARSED_FIELDS)
+        super().save(*args, **kwargs)
+
+
+class CacheVersionManager(models.Manager):
+
+    def current(self, key):
+        """The version of ``key`` (1 until it is first bumped)."""
+        version = self.filter(key=key).values_list('version', flat=True).first()
+        return 1 if version is None else version
+
+    def bump(self, key):
+        """
+        Increment the version of ``key`` and return the new value. The
+        increment is one F() update and the read-back is in the same
+        transaction, so two concurrent bumps never return the same value.
+        """
+        with transaction.atomic():
+            if not self.filter(key=key).update(version=F('version') + 1):
+                try:
+                    with transaction.atomic():
+                        self.create(key=key, version=2)
+                except IntegrityError:
+                    # Created by someone else in the meantime
+                    self.filter(key=key).update(version=F('version') + 1)
+            return self.filter(key=key).values_list('version', flat=True).get()
+
+
+class CacheVersion(models.Model):
+    """
+    Version counters of cached data shared by all worker processes (the
+    parts catalog, the autocomplete index, the picker lookups). They live
+    in the database rather than the cache so that bumps are atomic and
+    never evicted.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    version = models.PositiveIntegerField(default=1)
+
+    objects = CacheVersionManager()
+
+    def __str__(self):
+        return f"{self.key}: {self.version}"
@@ -0,0 +1,293 @@
+"""
+Pagination utility for Solv-IT application.
+
+This module provides keyset (cursor) pagination for the list views.
+Instead of ``OFFSET n`` plus a ``COUNT(*)`` on every request, a page is
+fetched with a ``WHERE (ordering field, id) > (last row seen)`` filter on
+the view's ordering, so page 5,000 reads the same ten index entries as
+page 1.
+
+The ``cursor`` query parameter holds the ordering values of the row the
+next (or previous) page starts after, and the position of that page, so
+row numbers and "page N" keep working. Old ``?page=`` links are still
+answered with the regular Django paginator, as are querysets that are not
+ordered by model fields or annotations.
+
+Ranked search results (``store.search.search_queryset``) are ordered by
+their rank annotations and paged the same way. They can match a large
+share of the table, so they are only counted up to
+``RANKED_COUNT_LIMIT`` rows ("page 3 of over 100").
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+from math import ceil
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+from django.http import Http404
+
+
+CURSOR_PARAM = 'cursor'
+# How long an approximate count may be reused
+APPROXIMATE_COUNT_TIMEOUT = 300
+# Querysets ordered by an annotation (search results) are counted up to this
+RANKED_COUNT_LIMIT = 1000
+
+
+def encode_cursor(values, position, direction):
+    data = json.dumps({'v': values, 'p': position, 'd': direction}, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(values, position, direction) of a cursor; raises ValueError if malformed."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values, position, direction = data['v'], int(data['p']), data['d']
+    except (binascii.Error, UnicodeDecodeError, TypeError, KeyError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if direction not in ('next', 'prev') or not isinstance(values, list) or position < 0:
+        raise ValueError("Invalid cursor")
+    return values, position, direction
+
+
+def approximate_count(queryset, limit=None):
+    """
+    Number of rows in ``queryset`` (at most ``limit``), possibly a few
+    minutes old.
+
+    An unfiltered table on PostgreSQL is answered from the planner
+    statistics; anything else is counted once and cached for
+    ``APPROXIMATE_COUNT_TIMEOUT`` seconds.
+    """
+    if connection.vendor == 'postgresql' and limit is None and not queryset.query.has_filters():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # -1 until the table has been analyzed
+        if row and row[0] >= 0:
+            return row[0]
+
+    queryset = queryset.order_by()[:limit]
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    key = 'store:count:' + hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, APPROXIMATE_COUNT_TIMEOUT)
+    return count
+
+
+class KeysetPaginator:
+    """Paginator stand-in; ``count`` is None when the view does not count."""
+
+    def __init__(self, per_page, count=None, approximate=False, capped=False):
+        self.per_page = per_page
+        self.count = count
+        self.approximate = approximate
+        # ``count`` is a lower bound: there are more rows than were counted
+        self.capped = capped
+
+    @property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return max(1, ceil(self.count / self.per_page))
+
+    @property
+    def page_range(self):
+        return range(1, (self.num_pages or 1) + 1)
+
+
+class KeysetPage:
+    """One page of rows, compatible with what the templates use of Django's Page."""
+
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, position, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.position = position
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Keyset page {self.number}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def number(self):
+        return self.position // self.paginator.per_page + 1
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def start_index(self):
+        return self.position + 1 if self.object_list else 0
+
+    def end_index(self):
+        return self.position + len(self.object_list)
+
+
+class KeysetPaginationMixin:
+    """
+    Keyset pagination for ListView subclasses (including the
+    django_tables2 SingleTableView ones).
+
+    The ordering is the queryset's own (``order_by()`` or the model's
+    ``Meta.ordering``) with the primary key appended as a tie-breaker.
+    Only non-null fields of the model itself and annotations (which must
+    not be NULL either, like the search ranking) qualify; any other
+    ordering falls back to offset pagination.
+
+    Attributes:
+    - keyset_count: ``'approximate'`` (default) for a cached or estimated
+      row count, ``'exact'`` for a ``COUNT(*)`` per request, or None to
+      show next/previous links only.
+    - ranked_count_limit: Querysets ordered by an annotation are counted
+      up to this many rows.
+    """
+
+    keyset_count = 'approximate'
+    ranked_count_limit = RANKED_COUNT_LIMIT
+    cursor_param = CURSOR_PARAM
+
+    def get_keyset_ordering(self, queryset):
+        """[(field name, descending), ...] ending with the pk, or None."""
+        query = queryset.query
+        if query.extra_order_by:
+            return None
+        ordering = list(query.order_by or (queryset.model._meta.ordering if query.default_ordering else []))
+        pk_name = queryset.model._meta.pk.name
+
+        keys = []
+        for item in ordering:
+            if not isinstance(item, str) or item == '?':
+                return None
+            descending = item.startswith('-')
+            name = item.lstrip('-')
+            if name in query.annotations:
+                if query.annotations[name].contains_aggregate:
+                    return None
+                keys.append((name, descending))
+                continue
+            try:
+                field = queryset.model._meta.get_field(pk_name if name == 'pk' else name)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.null or field.many_to_many or field.one_to_many:
+                return None
+            keys.append((field.attname, descending))
+            if field.primary_key:
+                return keys
+        return keys + [(queryset.model._meta.pk.attname, keys[-1][1] if keys else False)]
+
+    def _keyset_filter(self, keys, values, forwards):
+        """Rows after ``values`` in the (forwards or reversed) ordering."""
+        condition = Q()
+        for i, (name, descending) in enumerate(keys):
+            lookup = 'lt' if descending == forwards else 'gt'
+            step = Q(**{earlier: value for (earlier, _), value in zip(keys[:i], values[:i])})
+            step &= Q(**{f'{name}__{lookup}': values[i]})
+            condition |= step
+        return condition
+
+    def _count(self, queryset, limit=None):
+        if self.keyset_count == 'exact':
+            return queryset.order_by()[:limit].count()
+        if self.keyset_count == 'approximate':
+            return approximate_count(queryset, limit)
+        return None
+
+    def paginate_queryset(self, queryset, page_size):
+        keys = self.get_keyset_ordering(queryset)
+        page_kwarg = self.page_kwarg
+        if keys is None or self.kwargs.get(page_kwarg) or self.request.GET.get(page_kwarg):
+            return super().paginate_queryset(queryset, page_size)
+
+        cursor = self.request.GET.get(self.cursor_param)
+        values, position, direction = [], 0, 'next'
+        if cursor:
+            try:
+                values, position, direction = decode_cursor(cursor)
+            except ValueError as e:
+                raise Http404(str(e))
+            if len(values) != len(keys):
+                raise Http404("Invalid cursor")
+
+        forwards = direction == 'next'
+        order = [('-' if descending == forwards else '') + name for name, descending in keys]
+        rows = queryset.order_by(*order)
+        if values:
+            rows = rows.filter(self._keyset_filter(keys, values, forwards))
+        rows = list(rows[:page_size + 1])
+        more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if forwards:
+            has_next, has_previous = more, bool(values)
+        else:
+            rows.reverse()
+            has_next, has_previous = True, more
+            if not more:
+                position = 0
+            if not more and len(rows) < page_size:
+                # Rows deleted meanwhile left the first page short; refill it
+                rows = list(queryset.order_by(*[('-' if d else '') + n for n, d in keys])[:page_size + 1])
+                has_next = len(rows) > page_size
+                rows = rows[:page_size]
+
+        def cursor_for(obj, target, target_direction):
+            return encode_cursor([getattr(obj, name) for name, _ in keys], target, target_direction)
+
+        ranked = any(name in queryset.query.annotations for name, _ in keys)
+        limit = self.ranked_count_limit if ranked else None
+        # One row past the limit tells whether there are more
+        count = self._count(queryset, None if limit is None else limit + 1)
+        capped = limit is not None and count is not None and count > limit
+        paginator = KeysetPaginator(
+            page_size,
+            count=limit if capped else count,
+            approximate=self.keyset_count == 'approximate',
+            capped=capped,
+        )
+        page = KeysetPage(
+            rows,
+            paginator,
+            position,
+            next_cursor=cursor_for(rows[-1], position + len(rows), 'next') if rows and has_next else None,
+            previous_cursor=cursor_for(rows[0], max(0, position - page_size), 'prev') if rows and has_previous else None,
+        )
+        return paginator, page, rows, page.has_other_pages()
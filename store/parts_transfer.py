@@ -0,0 +1,303 @@
+"""
+Parts transfer utility for Solv-IT application.
+
+This module moves components between the Solv-IT pool (StockPool rows)
+and the serial numbers of devices (catogaryitem rows). A whole transfer,
+for one serial or for many, runs in one transaction:
+
+1. Every pool and device row involved is locked with ``SELECT ... FOR
+   UPDATE`` (one query per table, in id order, so two operatives working
+   on the same parts queue up instead of deadlocking).
+2. Shortages are checked against the locked quantities before anything
+   is written; one short part fails the whole transfer.
+3. Quantities are written back as ``F()`` expressions in one
+   ``bulk_update`` per table, emptied device rows are deleted in one
+   query, new device rows are created with ``bulk_create`` and parts new
+   to the pool are upserted.
+
+Parts are matched on category and normalized name, so "8gb  DDR4" and
+"8GB DDR4" are the same part.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .autocomplete import autocomplete
+from .catalog import invalidate_parts_catalog
+from .component_parser import apply_parsed_attributes, normalize_name
+from .models import STOCK_POOL_SERIAL, Item, ProductAuditTrail, StockPool, catogaryitem, is_pool_serial
+from .search import index_objects
+
+
+POOL = STOCK_POOL_SERIAL
+COMPONENT_CATEGORIES = ['processor', 'ram', 'hdd', 'ssd']
+
+
+class StockError(Exception):
+    """A transfer needs more of a part than its source holds."""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__('; '.join(
+            f"Not enough '{name}' ({category}) in {source}: {available} available, {wanted} needed"
+            for source, category, name, available, wanted in shortages
+        ))
+
+
+class TransferResult:
+    """
+    What a transfer did.
+
+    Attributes:
+    - moved: (source, target, category, name, quantity, unit_price) tuples.
+    - missing: (serial, category, name, quantity) of parts that were not in
+      the pool and were added to the device directly (``replace`` only).
+    - audits: The ProductAuditTrail records created.
+    """
+
+    def __init__(self):
+        self.moved = []
+        self.missing = []
+        self.audits = []
+
+
+def _holder(serial):
+    return POOL if is_pool_serial(serial) else serial
+
+
+class PartsTransferService:
+    """
+    Assign parts from the pool to devices and return them to the pool.
+
+    Parts are given as (category, name, quantity) tuples.
+
+    Args:
+        user: The user recorded as updated_by and in the audit trail.
+    """
+
+    def __init__(self, user=None):
+        self.user = user
+
+    def assign(self, serial, parts, audit=True):
+        """Move ``parts`` from the pool to ``serial``."""
+        return self.assign_many({serial: parts}, audit=audit)
+
+    def assign_many(self, assignments, audit=True):
+        """
+        Move parts from the pool to many serials at once.
+
+        Args:
+            assignments (dict): serial -> list of (category, name, quantity).
+        """
+        moves = [
+            (POOL, serial, category, name, quantity)
+            for serial, parts in assignments.items()
+            for category, name, quantity in parts
+        ]
+        with transaction.atomic():
+            return self._transfer(moves, action='ASSIGN' if audit else None, adjust_price=True)
+
+    def remove(self, serial, parts, audit=True):
+        """Move ``parts`` from ``serial`` back to the pool."""
+        moves = [(serial, POOL, category, name, quantity) for category, name, quantity in parts]
+        with transaction.atomic():
+            return self._transfer(moves, action='REMOVE' if audit else None, adjust_price=True)
+
+    def replace(self, serial, parts, categories=COMPONENT_CATEGORIES):
+        """
+        Return every part of ``categories`` fitted to ``serial`` to the
+        pool, then fit ``parts`` instead. Parts the pool has never held
+        are added to the device directly, at a unit price of 0.
+        """
+        with transaction.atomic():
+            fitted = (
+                catogaryitem.objects.select_for_update()
+                .filter(serial_no=serial, category__in=categories, quantity__gt=0)
+                .order_by('id')
+                .values_list('category', 'name', 'quantity')
+            )
+            returns = [(serial, POOL, category, name, quantity) for category, name, quantity in fitted]
+            moves = [(POOL, serial, category, name, quantity) for category, name, quantity in parts]
+            return self._transfer(returns + moves, action=None, adjust_price=False, allow_missing=True)
+
+    def _lock(self, moves):
+        """
+        Lock every row the moves read or write, oldest first. Returns
+        (holder, category, normalized name) -> rows; a pool part has at
+        most one (StockPool) row.
+        """
+        categories = {move[2] for move in moves}
+        names = {normalize_name(move[3]) for move in moves}
+        holdings = defaultdict(list)
+
+        pools = StockPool.objects.select_for_update().filter(
+            category__in=categories, normalized_name__in=names
+        ).order_by('id')
+        for pool in pools:
+            holdings[POOL, pool.category, pool.normalized_name].append(pool)
+
+        serials = {serial for source, target, *_ in moves for serial in (source, target) if serial != POOL}
+        if serials:
+            rows = catogaryitem.objects.select_for_update().filter(
+                serial_no__in=serials, category__in=categories, normalized_name__in=names
+            ).order_by('id')
+            for row in rows:
+                holdings[row.serial_no, row.category, row.normalized_name].append(row)
+        return holdings
+
+    def _transfer(self, moves, action, adjust_price, allow_missing=False):
+        moves = [
+            (_holder(source), _holder(target), category, name, quantity)
+            for source, target, category, name, quantity in moves
+            if quantity > 0
+        ]
+        result = TransferResult()
+        if not moves:
+            return result
+        holdings = self._lock(moves)
+
+        deltas = defaultdict(int)  # (model, pk) -> quantity change of an existing row
+        created = {}  # (holder, category, normalized name) -> new row
+
+        def add(holder, category, name, quantity, unit_price):
+            key = (holder, category, normalize_name(name))
+            rows = holdings[key]
+            if rows:
+                rows[0].quantity = (rows[0].quantity or 0) + quantity
+                if rows[0].pk is not None:
+                    deltas[type(rows[0]), rows[0].pk] += quantity
+                return
+            if holder == POOL:
+                row = StockPool(category=category, name=name, quantity=quantity, unit_price=unit_price)
+            else:
+                row = catogaryitem(
+                    category=category, name=name, serial_no=holder, quantity=quantity, unit_price=unit_price,
+                    created_by=self.user, updated_by=self.user,
+                )
+            apply_parsed_attributes(row)
+            rows.append(row)
+            created[key] = row
+
+        # Work the moves out on the locked rows; nothing is written until
+        # the whole transfer is known to fit
+        shortages = []
+        for source, target, category, name, quantity in moves:
+            rows = holdings[source, category, normalize_name(name)]
+            if not rows and source == POOL and allow_missing:
+                add(target, category, name, quantity, Decimal('0'))
+                result.missing.append((target, category, name, quantity))
+                continue
+
+            available = sum(max(row.quantity or 0, 0) for row in rows)
+            if available < quantity:
+                shortages.append((source, category, name, available, quantity))
+                continue
+
+            # Keep the name the part is held under
+            name = rows[0].name
+            unit_price = min((row.unit_price for row in rows if row.unit_price is not None), default=None)
+            remaining = quantity
+            for row in rows:  # FIFO
+                taken = min(max(row.quantity or 0, 0), remaining)
+                if taken:
+                    row.quantity -= taken
+                    remaining -= taken
+                    if row.pk is not None:
+                        deltas[type(row), row.pk] -= taken
+                if not remaining:
+                    break
+            add(target, category, name, quantity, unit_price)
+            result.moved.append((source, target, category, name, quantity, unit_price))
+
+        if shortages:
+            raise StockError(shortages)
+
+        self._write(holdings, deltas, created, timezone.now())
+        invalidate_parts_catalog()
+        if adjust_price:
+            self._adjust_prices(result.moved)
+        if action:
+            result.audits = self._audit(result.moved, action)
+        return result
+
+    def _write(self, holdings, deltas, created, now):
+        rows = {(type(row), row.pk): row for rows in holdings.values() for row in rows if row.pk is not None}
+
+        # Pool rows stay at zero so the part keeps its row; device rows go
+        changed = {StockPool: [], catogaryitem: []}
+        emptied = []
+        for (model, pk), delta in deltas.items():
+            if not delta:
+                continue
+            row = rows[model, pk]
+            if model is catogaryitem and (row.quantity or 0) <= 0:
+                emptied.append(pk)
+                continue
+            row.quantity = F('quantity') + delta
+            row.updated_by = self.user
+            if model is StockPool:
+                row.updated_at = now
+            else:
+                row.updated_date = now
+            changed[model].append(row)
+
+        if emptied:
+            catogaryitem.objects.filter(pk__in=emptied).delete()
+        if changed[StockPool]:
+            StockPool.objects.bulk_update(changed[StockPool], ['quantity', 'updated_by', 'updated_at'], batch_size=500)
+        if changed[catogaryitem]:
+            catogaryitem.objects.bulk_update(
+                changed[catogaryitem], ['quantity', 'updated_by', 'updated_date'], batch_size=500
+            )
+
+        new_rows = [row for row in created.values() if (row.quantity or 0) > 0]
+        for pool in [row for row in new_rows if isinstance(row, StockPool)]:
+            # Not locked (it did not exist); the upsert copes with a concurrent insert
+            StockPool.objects.add(pool.category, pool.name, pool.quantity, pool.unit_price, user=self.user)
+        new_rows = [row for row in new_rows if isinstance(row, catogaryitem)]
+        if new_rows:
+            new_rows = catogaryitem.objects.bulk_create(new_rows, batch_size=500)
+            index_objects(new_rows)
+            autocomplete.changed()
+
+    def _adjust_prices(self, moved):
+        """Add each assigned part's unit price to its device, subtract removed ones."""
+        price_changes = defaultdict(Decimal)
+        for source, target, category, name, quantity, unit_price in moved:
+            if unit_price is None:
+                continue
+            if target != POOL:
+                price_changes[target] += unit_price
+            if source != POOL:
+                price_changes[source] -= unit_price
+        for serial, change in price_changes.items():
+            if change:
+                Item.objects.filter(serialno__upper=serial.upper()).update(price=F('price') + change)
+
+    def _audit(self, moved, action):
+        """One ProductAuditTrail record per device."""
+        per_serial = defaultdict(list)
+        for source, target, category, name, quantity, unit_price in moved:
+            per_serial[target if action == 'ASSIGN' else source].append((category, name, quantity, unit_price))
+
+        items = {}
+        for item in Item.objects.filter(serialno__upper__in=[serial.upper() for serial in per_serial]).order_by('id'):
+            items.setdefault(item.serialno.upper(), item)
+
+        audits = []
+        for serial, parts in per_serial.items():
+            audit = ProductAuditTrail(serial_no=serial, action=action, performed_by=self.user, price=0)
+            item = items.get(serial.upper())
+            if item is not None:
+                audit.name, audit.make_and_models = item.name, item.make_and_models
+                audit.smps, audit.motherboard = item.smps_status, item.motherboard_status
+            for category, name, quantity, unit_price in parts:
+                setattr(audit, category, name)
+                setattr(audit, f'{category}_qty', quantity)
+                audit.price += (unit_price or 0) * quantity
+            audits.append(audit)
+        return ProductAuditTrail.objects.bulk_create(audits)
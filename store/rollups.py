@@ -0,0 +1,47 @@
+"""
+Stock snapshot utility for Solv-IT application.
+
+This module keeps DailyStockSnapshot, the Solv-IT pool stock per
+component category for each day. The dashboard reads today's snapshot and
+only re-aggregates the stock pool table when it is older than
+``STOCK_SNAPSHOT_MAX_AGE``; the pool quantities are also changed by bulk
+queryset updates, which no signal would see.
+"""
+
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import DailyStockSnapshot, StockPool
+
+
+STOCK_CATEGORIES = ['ssd', 'processor', 'hdd', 'ram']
+STOCK_SNAPSHOT_MAX_AGE = timedelta(minutes=5)
+
+
+def take_stock_snapshot():
+    """Aggregate today's pool stock in one grouped query and store it."""
+    quantities = dict(
+        StockPool.objects.filter(category__in=STOCK_CATEGORIES)
+        .order_by().values_list('category').annotate(total=Sum('quantity'))
+    )
+    today, now = timezone.localdate(), timezone.now()
+    for category in STOCK_CATEGORIES:
+        DailyStockSnapshot.objects.update_or_create(
+            date=today, category=category,
+            defaults={'quantity': quantities.get(category) or 0, 'taken_at': now},
+        )
+    return {category: quantities.get(category) or 0 for category in STOCK_CATEGORIES}
+
+
+def stock_summary():
+    """Today's pool stock per category, from a snapshot at most a few minutes old."""
+    snapshot = list(
+        DailyStockSnapshot.objects.filter(date=timezone.localdate()).values_list('category', 'quantity', 'taken_at')
+    )
+    fresh = timezone.now() - STOCK_SNAPSHOT_MAX_AGE
+    if len(snapshot) < len(STOCK_CATEGORIES) or any(taken_at < fresh for _, _, taken_at in snapshot):
+        return take_stock_snapshot()
+    quantities = {category: quantity for category, quantity, _ in snapshot}
+    return {category: quantities.get(category, 0) for category in STOCK_CATEGORIES}
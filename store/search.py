@@ -0,0 +1,266 @@
+"""
+Search utility for Solv-IT application.
+
+This module backs the product, purchased item and component searches
+with an index instead of OR-chains of ``__icontains`` filters:
+
+- On SQLite every searchable model has an FTS5 table using the trigram
+  tokenizer (rowid = primary key), so any substring of three or more
+  characters is answered from the index.
+- On other backends the same queries fall back to ``__icontains``, which
+  the pg_trgm GIN indexes created by the search index migration make
+  index-backed on PostgreSQL.
+
+List pages (``search_queryset``) get every match, as a subquery of
+their own filtered queryset, ranked in the database: exact serial number
+first, then serial prefix, then the shortest (most specific) text. The
+ranking is annotated (``search_rank``, ``search_length``) so that the
+keyset pagination of ``store.pagination`` can page through it. The
+type-ahead lookups (``match_ids``, ``match_q``, ``search_ids``) only take
+the newest ``SEARCH_RESULT_LIMIT`` matches.
+
+The tables are kept in sync by the signals in ``store.signals`` and by
+``index_objects`` for bulk writes; ``manage.py rebuild_search_index``
+rebuilds them from scratch.
+"""
+
+import logging
+import operator
+from functools import reduce
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Length
+
+from transactions.models import Itempurchased
+from .models import Item, catogaryitem
+
+logger = logging.getLogger(__name__)
+
+
+# Maximum number of matches a type-ahead lookup ranks and returns. A
+# common word can match a large share of 500k components; bm25 would have
+# to visit every one of them, so the newest matches are taken from the
+# index instead.
+SEARCH_RESULT_LIMIT = 500
+
+# The trigram tokenizer cannot match terms shorter than this
+MIN_INDEXED_TERM = 3
+
+SEARCH_COLUMNS = ('name', 'serial', 'model')
+
+
+class SearchIndex:
+    """
+    The FTS5 table of one model.
+
+    Args:
+        table: Name of the FTS5 table.
+        fields: Model field for each of the ``name``, ``serial`` and
+            ``model`` columns.
+    """
+
+    def __init__(self, model, table, name, serial, model_field):
+        self.model = model
+        self.table = table
+        self.fields = dict(zip(SEARCH_COLUMNS, (name, serial, model_field)))
+
+    def row(self, obj):
+        return [obj.pk] + [getattr(obj, self.fields[column]) or '' for column in SEARCH_COLUMNS]
+
+    def field_q(self, term, columns=SEARCH_COLUMNS):
+        return reduce(operator.or_, (Q(**{f'{self.fields[column]}__icontains': term}) for column in columns))
+
+    def serial_rank(self, terms):
+        """0 for an exact serial number match, 1 for a serial prefix, else 2."""
+        serial = self.fields['serial']
+        return Case(
+            When(**{f'{serial}__iexact': ' '.join(terms)}, then=Value(0)),
+            When(**{f'{serial}__istartswith': terms[0]}, then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        )
+
+    def rank_annotations(self, terms):
+        """The ranking as annotations: serial match, then total text length."""
+        text_length = sum(
+            (Coalesce(Length(self.fields[column]), Value(0)) for column in SEARCH_COLUMNS),
+            Value(0),
+        )
+        return {'search_rank': self.serial_rank(terms), 'search_length': text_length}
+
+    def ranking(self, terms):
+        """order_by() arguments putting the best matches first."""
+        annotations = self.rank_annotations(terms)
+        return [annotations['search_rank'], annotations['search_length'], '-pk']
+
+
+SEARCH_INDEXES = {
+    Item: SearchIndex(Item, 'store_item_search', 'name', 'serialno', 'make_and_models'),
+    Itempurchased: SearchIndex(Itempurchased, 'transactions_itempurchased_search', 'name', 'serialno', 'make_and_models'),
+    catogaryitem: SearchIndex(catogaryitem, 'store_catogaryitem_search', 'name', 'serial_no', 'category'),
+}
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _terms(query):
+    return [term for term in (query or '').split() if term]
+
+
+def _match_expression(terms, columns):
+    """FTS5 query: every term, as a quoted phrase, in any of ``columns``."""
+    prefix = '' if columns == SEARCH_COLUMNS else '{%s}: ' % ' '.join(columns)
+    return ' AND '.join(prefix + '"%s"' % term.replace('"', '""') for term in terms)
+
+
+def _fts_query(index, terms, columns, select, limit):
+    """
+    Build the SQL selecting ``select`` from the FTS table for ``terms``.
+
+    Terms too short for the trigram index are applied as LIKE filters on
+    the rows the longer terms matched. Returns None if every term is too
+    short, in which case the caller falls back to the ORM.
+    """
+    long_terms = [term for term in terms if len(term) >= MIN_INDEXED_TERM]
+    short_terms = [term for term in terms if len(term) < MIN_INDEXED_TERM]
+    if not long_terms:
+        return None
+
+    sql = [f'SELECT {select} FROM {index.table} WHERE {index.table} MATCH %s']
+    params = [_match_expression(long_terms, columns)]
+    for term in short_terms:
+        like = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        sql.append('AND (' + ' OR '.join(f"{column} LIKE %s ESCAPE '\\'" for column in columns) + ')')
+        params += [like] * len(columns)
+    if limit is not None:
+        # Walking the doclists backwards stops after ``limit`` matches
+        sql.append('ORDER BY rowid DESC LIMIT %s')
+        params.append(limit)
+    return ' '.join(sql), params
+
+
+def match_ids(model, terms, limit=SEARCH_RESULT_LIMIT, columns=SEARCH_COLUMNS):
+    """
+    Primary keys of the newest ``model`` rows matching every term, newest
+    first.
+
+    Args:
+        model: Item, Itempurchased or catogaryitem.
+        terms (list): The words of the search box text.
+        limit (int): Maximum number of results, None for all.
+        columns (tuple): Which of ``name``, ``serial``, ``model`` to search.
+    """
+    index = SEARCH_INDEXES[model]
+    if not terms:
+        return []
+
+    built = _fts_query(index, terms, columns, 'rowid', limit) if fts_enabled() else None
+    if built is None:
+        condition = reduce(operator.and_, (index.field_q(term, columns) for term in terms))
+        return list(model.objects.filter(condition).order_by('-pk').values_list('pk', flat=True)[:limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(*built)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def match_q(model, query, limit=SEARCH_RESULT_LIMIT, columns=SEARCH_COLUMNS):
+    """
+    Like ``match_ids`` but as a filter, so the index lookup runs as a
+    subquery of the caller's query instead of a query of its own (on
+    other backends the limit is left to the caller). ``limit=None`` keeps
+    every match.
+    """
+    index = SEARCH_INDEXES[model]
+    terms = _terms(query)
+    if not terms:
+        return Q(pk__in=[])
+
+    built = _fts_query(index, terms, columns, 'rowid', limit) if fts_enabled() else None
+    if built is None:
+        return reduce(operator.and_, (index.field_q(term, columns) for term in terms))
+    return Q(pk__in=RawSQL(*built))
+
+
+def search_queryset(queryset, query, columns=SEARCH_COLUMNS):
+    """
+    Restrict ``queryset`` to the rows matching every word of ``query``,
+    best match first.
+
+    Every match is kept: the index lookup is a subquery of ``queryset``,
+    so its filters, and any the caller adds afterwards, apply to all the
+    matches rather than to a capped first page of them. The ranking is
+    ordered by name (``search_rank``, ``search_length``, ``-pk``), which
+    keyset pagination can resume from.
+    """
+    terms = _terms(query)
+    if not terms:
+        return queryset.none()
+    return (
+        queryset.filter(match_q(queryset.model, query, limit=None, columns=columns))
+        .annotate(**SEARCH_INDEXES[queryset.model].rank_annotations(terms))
+        .order_by('search_rank', 'search_length', '-pk')
+    )
+
+
+def search_ids(model, query, limit=SEARCH_RESULT_LIMIT, columns=SEARCH_COLUMNS):
+    """Primary keys of the newest ``limit`` rows matching ``query``, best match first."""
+    terms = _terms(query)
+    ids = match_ids(model, terms, limit=limit, columns=columns)
+    if not ids:
+        return []
+    return list(
+        model.objects.filter(pk__in=ids).order_by(*SEARCH_INDEXES[model].ranking(terms)).values_list('pk', flat=True)
+    )
+
+
+def index_objects(objects):
+    """Add or refresh the index rows of saved objects (any indexed model)."""
+    if not fts_enabled():
+        return
+    by_index = {}
+    for obj in objects:
+        index = SEARCH_INDEXES.get(type(obj))
+        if index is not None and obj.pk is not None:
+            by_index.setdefault(index, []).append(index.row(obj))
+
+    with connection.cursor() as cursor:
+        for index, rows in by_index.items():
+            cursor.executemany(f'DELETE FROM {index.table} WHERE rowid = %s', [[row[0]] for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {index.table} (rowid, name, serial, model) VALUES (%s, %s, %s, %s)', rows
+            )
+
+
+def remove_objects(model, pks):
+    if not fts_enabled() or model not in SEARCH_INDEXES:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {SEARCH_INDEXES[model].table} WHERE rowid = %s', [[pk] for pk in pks]
+        )
+
+
+def rebuild(model):
+    """Rebuild the index of one model from its table. Returns the row count."""
+    index = SEARCH_INDEXES[model]
+    if not fts_enabled():
+        return 0
+    name, serial, model_field = (
+        connection.ops.quote_name(model._meta.get_field(index.fields[column]).column)
+        for column in SEARCH_COLUMNS
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {index.table}')
+        cursor.execute(
+            f'INSERT INTO {index.table} (rowid, name, serial, model) '
+            f"SELECT id, COALESCE({name}, ''), COALESCE({serial}, ''), COALESCE({model_field}, '') "
+            f'FROM {model._meta.db_table}'
+        )
+        cursor.execute(f"INSERT INTO {index.table} ({index.table}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {index.table}')
+        return cursor.fetchone()[0]
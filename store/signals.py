@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from transactions.models import Itempurchased
+from .autocomplete import autocomplete
+from .catalog import invalidate_parts_catalog
+from .models import Item, StockPool, catogaryitem
+from .search import index_objects, remove_objects
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_save, sender=Itempurchased)
+@receiver(post_save, sender=catogaryitem)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """Keep the FTS search tables in step with saved items and components."""
+    if not raw:
+        index_objects([instance])
+
+
+@receiver(post_delete, sender=Item)
+@receiver(post_delete, sender=Itempurchased)
+@receiver(post_delete, sender=catogaryitem)
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_objects(sender, [instance.pk])
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_save, sender=catogaryitem)
+def update_autocomplete(sender, instance, created, raw=False, **kwargs):
+    """Apply a created or edited name, serial or model to the prefix index."""
+    if not raw:
+        autocomplete.saved(instance, created)
+
+
+@receiver(post_delete, sender=Item)
+@receiver(post_delete, sender=catogaryitem)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    autocomplete.deleted(instance)
+
+
+@receiver(post_save, sender=catogaryitem)
+@receiver(post_delete, sender=catogaryitem)
+@receiver(post_save, sender=StockPool)
+@receiver(post_delete, sender=StockPool)
+def refresh_parts_catalog(sender, instance, raw=False, **kwargs):
+    """Any component or pool write may change the Solv-IT pool the catalog shows."""
+    if not raw:
+        invalidate_parts_catalog()
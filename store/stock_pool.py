@@ -0,0 +1,83 @@
+"""
+Stock pool utility for Solv-IT application.
+
+Solv-IT spare stock used to be catogaryitem rows with the serial number
+'Solv-IT', and the old assign / remove code created a new such row for
+every user who touched a part. This module folds those rows into
+StockPool, one row per (category, normalized name): quantities are
+summed, the lowest unit price is kept and the folded rows are deleted.
+
+The migration that introduces StockPool folds the existing rows;
+``manage.py compact_stock_pool`` does the same for rows with the pool
+serial that appear later (e.g. added through the admin).
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .component_parser import normalize_name, parse_component
+from .models import STOCK_POOL_SERIAL
+
+
+def compact_stock_pool(component_model, pool_model, batch_size=2000):
+    """
+    Fold pool-serial component rows into the stock pool table.
+
+    Both models may be a migration's historical models. Returns
+    (rows folded, parts created, parts updated).
+    """
+    folded = created = updated = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                component_model.objects.select_for_update()
+                .filter(serial_no__upper=STOCK_POOL_SERIAL.upper())
+                .order_by('pk')
+                .values('pk', 'category', 'name', 'quantity', 'unit_price')[:batch_size]
+            )
+            if not rows:
+                return folded, created, updated
+
+            parts = {}
+            totals = defaultdict(int)
+            prices = {}
+            for row in rows:
+                key = (row['category'], normalize_name(row['name']))
+                parts.setdefault(key, ' '.join((row['name'] or '').split()))
+                totals[key] += row['quantity'] or 0
+                if row['unit_price'] is not None:
+                    prices[key] = min(prices.get(key, row['unit_price']), row['unit_price'])
+
+            existing = {
+                (pool.category, pool.normalized_name): pool
+                for pool in pool_model.objects.select_for_update().filter(
+                    category__in={category for category, _ in parts},
+                    normalized_name__in={name for _, name in parts},
+                )
+            }
+            now = timezone.now()
+            changed, new = [], []
+            for key, name in parts.items():
+                pool = existing.get(key)
+                if pool is None:
+                    pool = pool_model(
+                        category=key[0], name=name, quantity=totals[key], unit_price=prices.get(key),
+                        updated_at=now, **parse_component(key[0], name),
+                    )
+                    new.append(pool)
+                    continue
+                pool.quantity = F('quantity') + totals[key]
+                if key in prices and (pool.unit_price is None or prices[key] < pool.unit_price):
+                    pool.unit_price = prices[key]
+                pool.updated_at = now
+                changed.append(pool)
+
+            pool_model.objects.bulk_create(new)
+            pool_model.objects.bulk_update(changed, ['quantity', 'unit_price', 'updated_at'])
+            component_model.objects.filter(pk__in=[row['pk'] for row in rows]).delete()
+            folded += len(rows)
+            created += len(new)
+            updated += len(changed)
@@ -1,5 +1,5 @@
 # Django core imports
-from django.urls import path
+from django.urls import path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from transactions.views import search_suggestions_purchase
@@ -40,6 +40,10 @@ from .views import (
     operativedashboard,
     upload_category_items,
     upload_category_only,
+    import_job_status,
+    barcode_image,
+    label_sheet_pdf,
+    metrics,
     ProductAuditTrailView
     
 )
@@ -191,6 +195,10 @@ urlpatterns = [
     path('operative-dashboard/', operativedashboard, name='operative-dashboard'),
     path('upload-category-items/', upload_category_items, name='upload_category_items'),
     path('upload-category-only/', upload_category_only, name='upload_category_only'),
+    path('import-jobs/<int:pk>/', import_job_status, name='import_job_status'),
+    re_path(r'^barcode/(?P<serial>.+)\.(?P<fmt>png|svg)$', barcode_image, name='barcode_image'),
+    path('labels/sheet.pdf', label_sheet_pdf, name='label_sheet_pdf'),
+    path('metrics', metrics, name='metrics'),
     path('search-suggestions-purchase/', search_suggestions_purchase, name='search-suggestions-purchase'),
     path('customers/', customer_search, name='customer_search'),
     path('customer_create11/', customer_create, name='customer_create11'),
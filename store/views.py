@@ -15,6 +15,8 @@ from collections import defaultdict
 from itertools import zip_longest
 import operator
 from functools import reduce
+import hmac
+import logging
 import re
 from django.contrib import messages
 from django.contrib.messages import success
@@ -47,13 +49,23 @@ from requests import Response
 # Local app imports
 from accounts.models import Profile, Vendor
 from transactions.models import Itempurchased, Sale, catogaryitempurchased
-from .models import  Item, Delivery, ProductAuditTrail, Ram, Ssd, Hdd, Processor , catogaryitem  #, Nvme, M_2
+from .models import  Item, Delivery, ProductAuditTrail, Ram, Ssd, Hdd, Processor , catogaryitem, ImportJob, StockPool, STOCK_POOL_SERIAL, is_pool_serial  #, Nvme, M_2
 from .forms import ItemForm,  DeliveryForm, RamForm, SddForm, HddForm, ProcessorForm , catogaryForm   #, NvmeForm, M_2Form
 from .tables import ItemTable, CategoryItemTable
+from .search import SEARCH_INDEXES, match_q, search_queryset
+from django.db.models import IntegerField, Value
+from .autocomplete import suggest
+from .catalog import get_parts_catalog, invalidate_parts_catalog
+from .pagination import KeysetPaginationMixin
+from .metrics import render_metrics
+from .parts_transfer import COMPONENT_CATEGORIES, POOL, PartsTransferService, StockError
 from accounts.models import Customer
 from django.views.decorators.http import require_http_methods
 import json
 
+logger = logging.getLogger(__name__)
+
+
 @require_http_methods(["POST"])
 def create_customer_ajax(request):
     try:
@@ -93,43 +105,33 @@ import pandas as pd
 from django.db import transaction
 from .forms import ExcelUploadForm
 from django.db.models import Min
+from .rollups import stock_summary as current_stock_summary
+from transactions.rollups import sales_series, total_sales_count
+
+# Days of sales shown in the dashboard chart
+DASHBOARD_SALES_DAYS = 90
 
 
 
 
 @login_required
 def dashboard(request):
-    # Solv-IT stock by category
-    stock_categories = ['ssd', 'processor', 'hdd', 'ram']
-    stock_summary = {}
-    for cat in stock_categories:
-        qty = catogaryitem.objects.filter(category=cat, serial_no__iexact='Solv-IT').aggregate(total=Sum('quantity'))['total'] or 0
-        stock_summary[cat] = qty
+    # Solv-IT stock by category and daily sales come from the rollup
+    # tables, so the page cost does not grow with the sales history
+    stock_summary = current_stock_summary()
     user_profile = request.user.profile
-    profiles = Profile.objects.all()
-    profiles_count = profiles.count()
+    profiles_count = Profile.objects.count()
     customers_count = Customer.objects.count()
     # Total inventory quantity (sum of all Item.quantity)
     total_items = Item.objects.aggregate(total=Sum('quantity'))['total'] or 0
 
-    sale_dates = (
-        Sale.objects.values("date_added__date")
-        .annotate(total_sales=Sum("grand_total"))
-        .order_by("date_added__date")
-    )
-    sale_dates_labels = [
-        date["date_added__date"].strftime("%Y-%m-%d") for date in sale_dates
-    ]
-    sale_dates_values = [float(date["total_sales"]) for date in sale_dates]
+    sale_dates_labels, sale_dates_values = sales_series(DASHBOARD_SALES_DAYS)
 
     context = {
-        "profiles": profiles,
         "profiles_count": profiles_count,
         "customers_count": customers_count,
         "total_items": total_items,
-        "vendors": Vendor.objects.all(),
-        "delivery": Delivery.objects.all(),
-        "sales": Sale.objects.all(),
+        "sales_count": total_sales_count(),
         "sale_dates_labels": sale_dates_labels,
         "sale_dates_values": sale_dates_values,
         'user_role': user_profile.role,
@@ -142,7 +144,7 @@ def dashboard(request):
         return render(request, 'store/dashboard.html', context)
 
 
-class ProductListView(LoginRequiredMixin, ExportMixin, tables.SingleTableView):
+class ProductListView(LoginRequiredMixin, ExportMixin, KeysetPaginationMixin, tables.SingleTableView):
     """
     View class to update product information.
 
@@ -206,9 +208,12 @@ class ProductListView(LoginRequiredMixin, ExportMixin, tables.SingleTableView):
         return context
 
 
-class CatogaryItemListView(LoginRequiredMixin, ExportMixin, tables.SingleTableView):
+class CatogaryItemListView(LoginRequiredMixin, ExportMixin, KeysetPaginationMixin, tables.SingleTableView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        if getattr(context['page_obj'], 'is_keyset', False):
+            # Cursor pages only link to their neighbours
+            return context
         window = 5
         page_number = context['page_obj'].number
         num_pages = context['paginator'].num_pages
@@ -241,12 +246,7 @@ class CatogaryItemListView(LoginRequiredMixin, ExportMixin, tables.SingleTableVi
 
         query = self.request.GET.get("q")
         if query:
-            query_list = query.split()
-            result = result.filter(
-                reduce(
-                    operator.and_, (Q(name__icontains=q) | Q(category__icontains=q) | Q(serial_no__icontains=q) for q in query_list)
-                )
-            )
+            result = search_queryset(result, query)
 
         return result
 
@@ -266,19 +266,8 @@ class CatogaryItemSearchListView(CatogaryItemListView):
 
 
     def get_queryset(self):
-        result = super(CatogaryItemSearchListView, self).get_queryset()
-
-        query = self.request.GET.get("q")
-        if query:
-            query_list = query.split()
-            result = result.filter(
-                reduce(
-                    operator.and_, (Q(name__icontains=q) | Q(category__icontains=q) | Q(serial_no__icontains=q) for q in query_list)
-                )
-            )
-
-        print('result', result)
-        return result
+        # The search itself is applied by CatogaryItemListView
+        return super(CatogaryItemSearchListView, self).get_queryset()
     
 
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
@@ -302,12 +291,7 @@ class ItemSearchListView(ProductListView):
 
         query = self.request.GET.get("q")
         if query:
-            query_list = query.split()
-            result = result.filter(
-                reduce(
-                    operator.and_, (Q(name__icontains=q) | Q(make_and_models__icontains=q) | Q(serialno__icontains=q) for q in query_list)
-                )
-            )
+            result = search_queryset(result, query)
         
         # Filter by purchased type (vendor/customer)
         purchased_type = self.request.GET.get("purchased_type")
@@ -389,28 +373,14 @@ class ProductDetailView(LoginRequiredMixin, FormMixin, DetailView):
 
 
 from django.http import JsonResponse
-from .models import Customer
+from transactions.lookups import lookup_page, page_number
 
 def customer_search_suggestions(request):
+    """Customers matching ?q= for the customer suggestion boxes, ten per page."""
     query = request.GET.get('q', '')
-    suggestions = []
-
-    if query and len(query) >= 2:
-        print('Query:', query)  # Debugging line
-        customers = Customer.objects.filter(
-            Q(first_name__icontains=query) | Q(last_name__icontains=query) | Q(phone__icontains=query)
-        )[:10]
-        suggestions = [
-            {
-                'id': customer.pk,
-                'first_name': customer.first_name,
-                'last_name': customer.last_name,
-                'text': (customer.first_name + ' ' + customer.last_name).strip() if customer.last_name else customer.first_name
-            }
-            for customer in customers
-        ]
-
-    return JsonResponse({'results': suggestions})
+    if len(query) < 2:
+        return JsonResponse({'results': [], 'more': False})
+    return JsonResponse(lookup_page('customer', query, page_number(request), page_size=10))
 
 
 
@@ -420,7 +390,7 @@ from django.urls import reverse_lazy
 from django.views.generic.edit import CreateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from .models import Item, Customer, catogaryitem  # make sure to import Customer
-from .barcode_utils import generate_barcode_file
+from .excel_import import enqueue_import
 
 class ProductCreateView(LoginRequiredMixin, CreateView):
     model = Item
@@ -441,18 +411,9 @@ class ProductCreateView(LoginRequiredMixin, CreateView):
                 messages.error(self.request, "Selected customer does not exist.")
                 return self.form_invalid(form)
 
+        # The barcode is rendered on demand by the barcode_image view
         item.save()
 
-        # ✅ Generate barcode for the item
-        try:
-            serialno = item.serialno.strip()
-            barcode_file, barcode_path = generate_barcode_file(serialno)
-            item.barcode_file = barcode_path
-            item.save()
-            messages.success(self.request, f"✅ Barcode generated successfully for {serialno}")
-        except Exception as e:
-            messages.warning(self.request, f"⚠️ Barcode generation failed: {str(e)}")
-
         serialno = item.serialno.strip()
         component_fields = ['processor', 'ram', 'hdd', 'ssd']
 
@@ -532,11 +493,6 @@ class ProductCreateView(LoginRequiredMixin, CreateView):
 
 
 
-def ordinal(n):
-    return f"{n}{'th' if 11 <= n <= 14 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')}"
-
-
-
 class ProductUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     """
     View class to update product information.
@@ -610,293 +566,24 @@ class ProductUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        item = self.get_object()  # if it's a DetailView or similar
-        
-
-        # Get all category items for this item’s serial number
-        all_category_items = catogaryitem.objects.filter(serial_no__iexact='Solv-IT', quantity__gt=0)
-        operative_page_item = catogaryitem.objects.filter(serial_no__iexact=item.serialno)
-        
-        
-
-
-        all_category_in_table = catogaryitem.objects.filter(serial_no__iexact='Solv-IT', quantity__gt=0).distinct()
-
-        # Prepare processor-by-generation buckets (1st Generation .. 13th Generation) and Unknown
-        processor_by_generation = {f"{ordinal(i)} Generation": [] for i in range(1, 20)}
-        processor_by_generation['Unknown'] = []
-
-        # A separate dict for consolidated results
-        processor_by_generation1 = {f"{ordinal(i)} Generation": [] for i in range(1, 20)}
-        processor_by_generation1['Unknown'] = []
-
-        # ------------------- Processor: Group by Generation -------------------
-        for data in all_category_in_table:
-            if data.category == 'processor':
-                match = re.search(r'(\d{1,2})(?:st|nd|rd|th)?\s*(?:Gen|Generation)', data.name, re.IGNORECASE)
-                if match:
-                    gen_number = int(match.group(1))
-                    generation_label = f"{ordinal(gen_number)} Generation"
-                    if generation_label in processor_by_generation:
-                        processor_by_generation[generation_label].append(f"{data.name} X({data.quantity}) - ({data.serial_no})")
-                    else:
-                        # Add to Unknown bucket
-                        processor_by_generation['Unknown'].append(f"{data.name} X({data.quantity}) - ({data.serial_no})")
-                else:
-                    processor_by_generation['Unknown'].append(f"{data.name} X({data.quantity}) - ({data.serial_no})")
-
-        # Consolidate processor entries with the same name and serial_no
-        for generation, options in processor_by_generation.items():
-            # Consolidate entries with the same name and serial_no
-            consolidated = {}
-            for option in options:
-                if not option:  # Skip empty entries
-                    continue
-                    
-                # Parse the option string to extract parts
-                name_parts = option.split(" X(")
-                if len(name_parts) < 2:  # Skip malformed entries
-                    continue
-                    
-                item_name = name_parts[0]
-                qty_serial = name_parts[1]
-                
-                try:
-                    qty = int(qty_serial.split(")")[0])
-                    serial_no = qty_serial.split("- (")[1].rstrip(")")
-                    
-                    # Create a key for consolidation
-                    key = (item_name, serial_no)
-                    
-                    # Add to consolidated dict
-                    if key not in consolidated:
-                        consolidated[key] = {'name': item_name, 'qty': qty, 'serial_no': serial_no}
-                    else:
-                        consolidated[key]['qty'] += qty
-                except (IndexError, ValueError):
-                    # Skip entries that don't match expected format
-                    continue
-            
-            # Rebuild the options list with consolidated items
-            processor_by_generation1[generation] = [
-                f"{item['name']} X({item['qty']}) - ({item['serial_no']})" 
-                for item in consolidated.values()
-            ]
-            
-        for generation, options in processor_by_generation1.items():
-            print('processor_by_generation', generation, options)
-
-        
-        
-        # ------------------- RAM, HDD, SSD: Group by Size -------------------
-        hdd_sizes = [
-            '40GB', '80GB', '120GB', '160GB', '250GB', '320GB', '500GB', '640GB',
-            '750GB', '1TB', '1.5TB', '2TB', '3TB', '4TB', '5TB', '6TB', '8TB',
-            '10TB', '12TB', '14TB', '16TB', '18TB', '20TB'
-        ]
-
-        ssd_sizes = [
-            '64GB', '120GB','140GB' ,'128GB', '240GB', '250GB', '256GB', '480GB', '500GB',
-            '512GB', '1TB', '2TB', '4TB', '8TB'
-        ]
-
-        ram_sizes = [
-            '4GB','8GB', '16GB','32GB','64GB','128GB','256GB','512GB'
-        ]
-
-        rambysize = {}
-        rambysize1 = {}
-        hddbysize = {}
-        ssdbysize = {}
-
-
-        for data in all_category_in_table:
-            if data.category == 'ram':
-                ram_name = data.name.strip()
-                
-                # Try to extract the RAM size from the name
-                size_found = next((size for size in ram_sizes if size in ram_name), None)
-                
-                # Determine the size label or use 'Unknown'
-                size_key = size_found if size_found else 'Unknown'
-                
-                # Initialize the key in dict if not present
-                if size_key not in rambysize:
-                    rambysize[size_key] = []
-
-                print('size_key', size_key)
-                print('ram_name', ram_name)
-
-                # Add the formatted RAM info
-                rambysize[size_key].append(f"{ram_name} X({data.quantity}) - ({data.serial_no})")
-                print('rambysize', size_key, rambysize[size_key])
-                for size, options in rambysize.items():
-                    # Consolidate entries with the same name and serial_no
-                    consolidated = {}
-                    for option in options:
-                        # Parse the option string to extract parts
-                        name_parts = option.split(" X(")
-                        item_name = name_parts[0]
-                        qty_serial = name_parts[1]
-                        qty = int(qty_serial.split(")")[0])
-                        serial_no = qty_serial.split("- (")[1].rstrip(")")
-                        
-                        # Create a key for consolidation
-                        key = (item_name, serial_no)
-                        
-                        # Add to consolidated dict
-                        if key not in consolidated:
-                            consolidated[key] = {'name': item_name, 'qty': qty, 'serial_no': serial_no}
-                        else:
-                            consolidated[key]['qty'] += qty
-                    
-                    # Rebuild the options list with consolidated items
-                    rambysize1[size] = [f"{item['name']} X({item['qty']}) - ({item['serial_no']})" 
-                                    for item in consolidated.values()]
-                    
-                # print('rambysize', ram_size, rambysize1[size])
-                
-            elif data.category == 'hdd':
-                hdd_name = data.name.strip()
-                
-                # Try to extract the HDD size from the name
-                size_found = next((size for size in hdd_sizes if size in hdd_name), None)
-                
-                # Determine the size label or use 'Unknown'
-                size_key = size_found if size_found else 'Unknown'
-                
-                # Initialize the key in dict if not present
-                if size_key not in hddbysize:
-                    hddbysize[size_key] = []
-
-                # Add the formatted HDD info
-                hddbysize[size_key].append(f"{hdd_name} X({data.quantity}) - ({data.serial_no})")
+        item = self.object
 
-            elif data.category == 'ssd':
-                ssd_name = data.name.strip()
-                
-                # Try to extract the SSD size from the name
-                size_found = next((size for size in ssd_sizes if size in ssd_name), None)
-                
-                # Determine the size label or use 'Unknown'
-                size_key = size_found if size_found else 'Unknown'
-                
-                # Initialize the key in dict if not present
-                if size_key not in ssdbysize:
-                    ssdbysize[size_key] = []
-
-                # Add the formatted SSD info
-                ssdbysize[size_key].append(f"{ssd_name} X({data.quantity}) - ({data.serial_no})")
-
-        # Output the structure
-        # Consolidate HDD entries
-        hddbysize1 = {}
-        for size, options in hddbysize.items():
-            # Consolidate entries with the same name and serial_no
-            consolidated = {}
-            for option in options:
-                if not option:  # Skip empty entries
-                    continue
-                
-                # Parse the option string to extract parts
-                name_parts = option.split(" X(")
-                if len(name_parts) < 2:  # Skip malformed entries
-                    continue
-                    
-                item_name = name_parts[0]
-                qty_serial = name_parts[1]
-                
-                try:
-                    qty = int(qty_serial.split(")")[0])
-                    serial_no = qty_serial.split("- (")[1].rstrip(")")
-                    
-                    # Create a key for consolidation
-                    key = (item_name, serial_no)
-                    
-                    # Add to consolidated dict
-                    if key not in consolidated:
-                        consolidated[key] = {'name': item_name, 'qty': qty, 'serial_no': serial_no}
-                    else:
-                        consolidated[key]['qty'] += qty
-                except (IndexError, ValueError):
-                    # Skip entries that don't match expected format
-                    continue
-            
-            # Rebuild the options list with consolidated items
-            hddbysize1[size] = [
-                f"{item['name']} X({item['qty']}) - ({item['serial_no']})" 
-                for item in consolidated.values()
-            ]
-        
-        # Consolidate SSD entries
-        ssdbysize1 = {}
-        for size, options in ssdbysize.items():
-            # Consolidate entries with the same name and serial_no
-            consolidated = {}
-            for option in options:
-                if not option:  # Skip empty entries
-                    continue
-                
-                # Parse the option string to extract parts
-                name_parts = option.split(" X(")
-                if len(name_parts) < 2:  # Skip malformed entries
-                    continue
-                    
-                item_name = name_parts[0]
-                qty_serial = name_parts[1]
-                
-                try:
-                    qty = int(qty_serial.split(")")[0])
-                    serial_no = qty_serial.split("- (")[1].rstrip(")")
-                    
-                    # Create a key for consolidation
-                    key = (item_name, serial_no)
-                    
-                    # Add to consolidated dict
-                    if key not in consolidated:
-                        consolidated[key] = {'name': item_name, 'qty': qty, 'serial_no': serial_no}
-                    else:
-                        consolidated[key]['qty'] += qty
-                except (IndexError, ValueError):
-                    # Skip entries that don't match expected format
-                    continue
-            
-            # Rebuild the options list with consolidated items
-            ssdbysize1[size] = [
-                f"{item['name']} X({item['qty']}) - ({item['serial_no']})" 
-                for item in consolidated.values()
-            ]
-
-        # Add to context with consolidated data
-        context['processor_by_generation'] = processor_by_generation1
-        context['rambysize'] = rambysize1
-        context['hddbysize'] = hddbysize1
-        context['ssdbysize'] = ssdbysize1
-        context['item'] = item
+        # Solv-IT stock grouped by generation / size, cached until the pool changes
+        catalog = get_parts_catalog()
+        context['processor_by_generation'] = catalog['processor_by_generation']
+        context['rambysize'] = catalog['rambysize']
+        context['hddbysize'] = catalog['hddbysize']
+        context['ssdbysize'] = catalog['ssdbysize']
 
         #-------------------For Display all Material in Solv-IT DB in OP Form--------------------
-
-        # Filter and format
-        processors = []
-        rams = []
-        hdds = []
-        ssds = []
-        for data in all_category_items:
-            if data.category == 'processor':
-                processors.append(f"{data.name} X({data.quantity}) --({data.serial_no})")
-            if data.category == 'ram':
-                rams.append(f"{data.name} X({data.quantity}) --({data.serial_no})")
-            if data.category == 'hdd':
-                hdds.append(f"{data.name} X({data.quantity}) --({data.serial_no})")
-            if data.category == 'ssd':
-                ssds.append(f"{data.name} X({data.quantity}) --({data.serial_no})")
-
-        context['processor_options'] = processors
-        context['ram_options'] = rams
-        context['hdd_options'] = hdds
-        context['ssd_options'] = ssds
+        context['processor_options'] = catalog['options']['processor']
+        context['ram_options'] = catalog['options']['ram']
+        context['hdd_options'] = catalog['options']['hdd']
+        context['ssd_options'] = catalog['options']['ssd']
         context['item'] = item
-        
+
+        # Components fitted to this item's serial number
+        operative_page_item = list(catogaryitem.objects.filter(serial_no__iexact=item.serialno)) if item.serialno else []
 
         #-------------------For Move / Remove product to Solv-IT DB--------------------
         # Filter and format
@@ -957,6 +644,18 @@ class ProductUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
 
         return context
 
+    def posted_parts(self, components):
+        """(category, name, quantity) of the part picked for each component in the OP forms."""
+        parts = []
+        for component in components:
+            item_raw = self.request.POST.get(component, '').strip()
+            qty_raw = self.request.POST.get(f'{component}_qty', '').strip()
+            qty = int(qty_raw) if qty_raw.isdigit() else 0
+            if item_raw and qty > 0:
+                # Options read "<name> X(<qty>) --(<serial>)"
+                parts.append((component, item_raw.split(' X(')[0].strip(), qty))
+        return parts
+
     def get_success_url(self):
 
         """
@@ -970,137 +669,21 @@ class ProductUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
             user_profile = self.request.user.profile
             if user_profile.role == 'OP':
                 serialno = self.request.POST['serialno'].strip()
-                components = ['ram', 'processor', 'hdd', 'ssd']
-                quantities = {
-                    'processor': self.request.POST.get('processor_qty', '').strip(),
-                    'ram': self.request.POST.get('ram_qty', '').strip(),
-                    'hdd': self.request.POST.get('hdd_qty', '').strip(),
-                    'ssd': self.request.POST.get('ssd_qty', '').strip(),
-                }
-
-                # Prepare audit data
-                audit_data = {
-                    'serial_no': serialno,
-                    'action': 'ASSIGN',
-                    'performed_by': self.request.user,
-                    'processor': None,
-                    'processor_qty': 0,
-                    'ram': None,
-                    'ram_qty': 0,
-                    'hdd': None,
-                    'hdd_qty': 0,
-                    'ssd': None,
-                    'ssd_qty': 0
-                }
+                parts = self.posted_parts(['ram', 'processor', 'hdd', 'ssd'])
 
-
-                
-
-                # Get additional info from Item model if exists
+                # Takes the parts from Solv-IT, prices them onto the device
+                # and writes the audit trail, all in one transaction
                 try:
-                    item = Item.objects.get(serialno__iexact=serialno)
-                    audit_data['name'] = getattr(item, 'name', None)
-                    audit_data['make_and_models'] = getattr(item, 'make_and_models', None)
-                    audit_data['smps'] = getattr(item, 'smps_status', None)
-                    audit_data['motherboard'] = getattr(item, 'motherboard_status', None)
-                except Item.DoesNotExist:
-                    pass
-
-                for component in components:
-                    print('component', component)
-                    item_raw = self.request.POST.get(component, '').strip()
-                    if not item_raw:
-                        continue
-
-                    qty_raw = quantities[component]
-                    qty = int(qty_raw) if qty_raw.isdigit() else 0
-
-                    if qty <= 0:
-                        continue
-
-                    clean_name = item_raw.split(' X(')[0].strip()
-                    print(f"\nProcessing {component.upper()}: {clean_name} | Qty: {qty}")
-                    
-                    # Store in audit data
-                    audit_data[component] = clean_name
-                    audit_data[f'{component}_qty'] = qty
-
-                    # Get all matching items and work with total available quantity
-                    available_items = catogaryitem.objects.filter(
-                        name=clean_name,
-                        category=component,
-                        serial_no='Solv-IT'
-                    )
-
-                    if not available_items.exists():
-                        messages.error(self.request, f"No available '{clean_name}' ({component}) in stock.")
-                        return reverse_lazy('dashboard')
-
-                    total_available = sum(item.quantity for item in available_items)
-                    if total_available < qty:
-                        messages.error(self.request, f"Not enough '{clean_name}' available in {component}.")
-                        return reverse_lazy('productslist')
-
-                    # Get the minimum unit price from available items
-                    unit_price = available_items.aggregate(Min('unit_price'))['unit_price__min']
-                    print('unit_price', unit_price)
-
-                    audit_data['price'] = unit_price * qty
-
-
-                    
-                    # Addition of price based on category price on purchased price
-                    update_items = Item.objects.filter(serialno__iexact=serialno)
-                    for items1 in update_items:
-                        print('items1', items1, items1.price)
-                        items1.price += unit_price
-
-                        items1.save()
-
-
-
-                    # Deduct from items (FIFO approach)
-                    remaining_to_deduct = qty
-                    for item in available_items:
-                        if remaining_to_deduct <= 0:
-                            break
-                            
-                        deduct_amount = min(item.quantity, remaining_to_deduct)
-                        item.quantity -= deduct_amount
-                        remaining_to_deduct -= deduct_amount
-                        
-                        if item.quantity <= 0:
-                            item.delete()
-                        else:
-                            item.save()
-
-                    
-
-                    # Assign to serialno: update if exists, else create new
-                    assigned_item, created = catogaryitem.objects.get_or_create(
-                        name=clean_name,
-                        category=component,
-                        serial_no=serialno,
-                        updated_by=self.request.user,
-                        defaults={
-                            'quantity': 0,
-                            'unit_price': unit_price,
-                        }
-                    )
-
-                    assigned_item.quantity += qty
-                    assigned_item.updated_by = self.request.user
-                    assigned_item.save()
-
-                # Create audit trail record
-                ProductAuditTrail.objects.create(**audit_data)
+                    PartsTransferService(self.request.user).assign(serialno, parts)
+                except StockError as e:
+                    messages.error(self.request, str(e))
+                    return reverse_lazy('productslist')
 
                 messages.success(self.request, f"✅ Parts Assigned to {serialno}. Audit trail created.")
                 return reverse_lazy('dashboard')
             else:
                 messages.success(self.request, "Product update successful!")
                 return reverse_lazy('productslist')
-
         elif 'button2' in self.request.POST:
             print('button2')
             user_profile = self.request.user.profile
@@ -1116,126 +699,13 @@ class ProductUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
             user_profile = self.request.user.profile
             if user_profile.role == 'OP':
                 serialno = self.request.POST['serialno'].strip()
-                components = ['processor', 'ram', 'hdd', 'ssd']
-                quantities = {
-                    'processor': self.request.POST.get('processor_qty', '').strip(),
-                    'ram': self.request.POST.get('ram_qty', '').strip(),
-                    'hdd': self.request.POST.get('hdd_qty', '').strip(),
-                    'ssd': self.request.POST.get('ssd_qty', '').strip(),
-                }
+                parts = self.posted_parts(['processor', 'ram', 'hdd', 'ssd'])
 
-                # Prepare audit data with existing values from DB
-                existing_items = catogaryitem.objects.filter(serial_no=serialno)
-
-                # Build a map of existing category → (name, qty)
-                existing_map = {}
-                for comp in ['processor', 'ram', 'hdd', 'ssd']:
-                    item = existing_items.filter(category=comp).aggregate(
-                        total_qty=Sum('quantity'),
-                        first_name=Min('name')
-                    )
-                    existing_map[comp] = {
-                        'name': item['first_name'],
-                        'qty': item['total_qty'] if item['total_qty'] else 0
-                    }
-
-                # Prepare audit data
-                audit_data = {
-                    'serial_no': serialno,
-                    'action': 'REMOVE',
-                    'performed_by': self.request.user,
-                    'processor': None,
-                    'processor_qty': 0,
-                    'ram': None,
-                    'ram_qty': 0,
-                    'hdd': None,
-                    'hdd_qty': 0,
-                    'ssd': None,
-                    'ssd_qty': 0,
-                }
-
-                # Get additional info from Item model if exists
                 try:
-                    item = Item.objects.get(serialno__iexact=serialno)
-                    audit_data['name'] = getattr(item, 'name', None)
-                    audit_data['make_and_models'] = getattr(item, 'make_and_models', None)
-                    audit_data['smps'] = getattr(item, 'smps_status', None)
-                    audit_data['motherboard'] = getattr(item, 'motherboard_status', None)
-                except Item.DoesNotExist:
-                    pass
-
-                for component in components:
-                    print('component', self.request.POST.get(component, '').strip())
-                    item_raw = self.request.POST.get(component, '').strip()
-                    print('item_raw', item_raw)
-                    if not item_raw:
-                        continue
-
-                    qty_raw = quantities[component]
-                    qty = int(qty_raw) if qty_raw.isdigit() else 0
-
-                    if qty <= 0:
-                        continue
-
-                    clean_name = item_raw.split(' X(')[0].strip()
-                    print(f"\nProcessing {component.upper()}: {clean_name} | Qty: {qty}")
-
-                    # Store in audit data
-                    audit_data[component] = clean_name
-                    audit_data[f'{component}_qty'] = qty
-
-                    # Get the item from the source device
-                    assigned_item = catogaryitem.objects.filter(
-                        name=clean_name,
-                        category=component,
-                        serial_no=serialno
-                    )
-
-                    total_available = assigned_item.aggregate(Sum('quantity'))['quantity__sum'] if assigned_item.exists() else 0
-                    print('total_available', total_available)
-                    if total_available < qty:
-                        messages.error(self.request, f"Not enough '{clean_name}' in {serialno}.")
-                        return reverse_lazy('productslist')
-
-                    # Get the minimum unit price from available items
-                    unit_price = assigned_item.aggregate(Min('unit_price'))['unit_price__min']
-                    print('unit_price', unit_price)
-
-
-                    audit_data['price'] = unit_price * qty
-
-                    # Deduction of price based on category price
-                    update_items = Item.objects.filter(serialno__iexact=serialno)
-                    for items1 in update_items:
-                        print('items1', items1, items1.price)
-                        items1.price -= unit_price
-                        items1.save()
-
-                    # Deduct from source
-                    total_available -= qty
-                    
-                    if total_available <= 0:
-                        assigned_item.delete()
-                    else:
-                        assigned_item.update(updated_by=self.request.user, quantity=total_available)
-
-                    # Add to 'Solv-IT'
-                    stock_item, created = catogaryitem.objects.get_or_create(
-                        name=clean_name,
-                        category=component,
-                        serial_no='Solv-IT',
-                        updated_by=self.request.user,
-                        defaults={
-                            'quantity': 0,
-                            'unit_price': unit_price,
-                        }
-                    )
-                    stock_item.quantity += qty
-                    stock_item.updated_by = self.request.user
-                    stock_item.save()
-
-                # Create audit trail record
-                ProductAuditTrail.objects.create(**audit_data)
+                    PartsTransferService(self.request.user).remove(serialno, parts)
+                except StockError as e:
+                    messages.error(self.request, str(e))
+                    return reverse_lazy('productslist')
 
                 messages.success(self.request, f"✅ Parts Moved to Solv-IT. Audit trail created.")
                 return reverse_lazy('dashboard')
@@ -1247,131 +717,31 @@ class ProductUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
             print('button main')
             serialno = self.request.POST['serialno'].strip()
             print('serialno', serialno)
-            print('dataaa', self.request.POST)
-
-            components = ['processor', 'ram', 'hdd', 'ssd']
-            print('processor data',self.request.POST.get('processor', '').strip())
-
-            # Get quantities from POST data
-            quantities = {
-                'processor': self.request.POST.get('processor_qty', '').strip(),
-                'ram': self.request.POST.get('ram_qty', '').strip(),
-                'hdd': self.request.POST.get('hdd_qty', '').strip(),
-                'ssd': self.request.POST.get('ssd_qty', '').strip(),
-            }
-
-            # STEP 1: Return all existing components (processor, ram, hdd, ssd) to 'Solv-IT'
-            
-
-            # STEP 2: Assign selected components to this serial number
-            for component in components:
-                print('component 891', component)
-                item_raw = self.request.POST.get(component, '').strip()
-                qty_raw = self.request.POST.get(f"{component}_qty", '').strip()
-                qty = int(qty_raw) if qty_raw.isdigit() else 0
-
-                
-                item_list = [i.strip() for i in item_raw.split(",") if i.strip()]
-                qty_list = [q.strip() for q in qty_raw.split(",") if q.strip()]
-
-                print('item_list, qty_list', item_list, qty_list)
-
-                # if not item_raw or qty <= 0:
-                #     continue
-
-                clean_name = item_raw.split(' X(')[0].strip()
-                print(f"🔄 Updating {component.upper()} for {serialno}: {clean_name} x {qty}")
-
-                # ✅ Return only the current component to Solv-IT
-                existing_items = catogaryitem.objects.filter(serial_no=serialno, category=component)
-                for item in existing_items:
-                    print(f"♻️ Returning {item.category.upper()}: {item.name} X {item.quantity}")
-
-                    central_item, created = catogaryitem.objects.get_or_create(
-                        name=item.name.upper(),
-                        category=component,
-                        serial_no='Solv-IT',
-                        updated_by = self.request.user,
-                        defaults={
-                            'quantity': 0,
-                            'unit_price': item.unit_price,
-                        }
-                    )
-                    central_item.quantity += item.quantity
-                    central_item.updated_by = self.request.user
-                    central_item.save()
-                    item.delete()
 
+            # The main form posts comma separated names and quantities per component
+            parts = []
+            for component in COMPONENT_CATEGORIES:
+                item_list = [i.strip() for i in self.request.POST.get(component, '').split(",") if i.strip()]
+                qty_list = [q.strip() for q in self.request.POST.get(f"{component}_qty", '').split(",") if q.strip()]
                 for name, qty_str in zip(item_list, qty_list):
                     try:
-                        qty = int(qty_str)
+                        parts.append((component, name, int(qty_str)))
                     except ValueError:
                         messages.error(self.request, f"Invalid quantity '{qty_str}' for {name}")
-                        return redirect('productslist')
-
-                    if qty <= 0:
-                        continue
-
-                    
-                    print(f"✅ Processing {component.upper()}: {name} | Qty: {qty}")
-
-                    # Fetch from 'Solv-IT' stock
-                    try:
-                        available_item = catogaryitem.objects.get(
-                            name=name,
-                            category=component,
-                            serial_no='Solv-IT'
-                        )
-                    except catogaryitem.DoesNotExist:
-                        assigned_item1, created = catogaryitem.objects.get_or_create(
-                            name=name.upper(),
-                            category=component,
-                            serial_no=serialno,
-                            updated_by = self.request.user,
-                            defaults={
-                                'quantity': qty,
-                                'unit_price': 0,  # or some fallback
-                            }
-                        )
-                        if not created:
-                            assigned_item1.quantity += qty
-                            assigned_item1.updated_by = self.request.user
-                            assigned_item1.save()
-                        print(f"⚠️ '{name}' not found in Solv-IT, but added directly to {serialno}.")
-                        messages.success(self.request,f"⚠️ '{name}' not found in Solv-IT, but added directly to {serialno}.")
-                        continue
+                        return reverse_lazy('productslist')
 
-                    if available_item.quantity < qty:
-                        print(f"Not enough '{name}' available in {component}")
-                        messages.error(self.request, f"Not enough '{name}' available in {component}.")
-                        return redirect('productslist')
-
-                    # Deduct from stock
-                    available_item.quantity -= qty
-                    if available_item.quantity <= 0:
-                        available_item.delete()
-                    else:
-                        available_item.save()
-
-                    # Assign to target serial number
-                    assigned_item, created = catogaryitem.objects.get_or_create(
-                        name=name,
-                        category=component,
-                        serial_no=serialno,
-                        updated_by = self.request.user,
-                        defaults={
-                            'quantity': 0,
-                            'unit_price': available_item.unit_price,
-                        }
-                    )
-                    assigned_item.quantity += qty
-                    assigned_item.updated_by = self.request.user
-                    assigned_item.save()
+            # Return the fitted components to Solv-IT and fit the posted ones
+            try:
+                result = PartsTransferService(self.request.user).replace(serialno, parts)
+            except StockError as e:
+                messages.error(self.request, str(e))
+                return reverse_lazy('productslist')
 
-                    messages.success(
-                        self.request,
-                        f"✅ Assigned {qty} of '{name}' to {serialno}. {'Created new' if created else 'Updated existing'}."
-                    )
+            for target, category, name, qty in result.missing:
+                messages.success(self.request, f"⚠️ '{name}' not found in Solv-IT, but added directly to {serialno}.")
+            for source, target, category, name, qty, unit_price in result.moved:
+                if source == POOL:
+                    messages.success(self.request, f"✅ Assigned {qty} of '{name}' to {serialno}.")
             return reverse_lazy('productslist')
 
 
@@ -1560,6 +930,16 @@ class CategoryCreateView(LoginRequiredMixin, CreateView):
         form.instance.created_date = now
         form.instance.updated_date = now
         form.instance.updated_by = getattr(self.request, 'user', None)
+        if is_pool_serial(form.instance.serial_no):
+            # Solv-IT stock is kept in the stock pool, one row per part
+            component = form.instance
+            StockPool.objects.add(
+                component.category, component.name, component.quantity or 0, component.unit_price,
+                user=form.instance.updated_by,
+            )
+            invalidate_parts_catalog()
+            messages.success(self.request, f"✅ {component.quantity or 0} X '{component.name}' added to Solv-IT stock.")
+            return redirect('category-list')
         return super().form_valid(form)
 
 
@@ -1611,65 +991,74 @@ def get_items_ajax_view(request):
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         try:
             term = request.POST.get("term", "").strip()
-            print("📥 Received POST Data:", request.POST)
-            print("🔍 Search Term:", term)
+            logger.debug("🔍 Item search term: %s", term)
 
             if not term:
                 return JsonResponse({'error': 'No search term provided'}, status=400)
 
-            # Match Items
-            items = Item.objects.filter(serialno__icontains=term)
-            if not items.exists():
-                print('🔄 Searching in purchased items')
-                items = Itempurchased.objects.filter(serialno__icontains=term)
-            print("✅ Matching Items Found:", items.count())
+            # One query for both item tables: stock items first, purchased
+            # items only when no stock item matches. A scanned serial always
+            # matches exactly, even if newer rows contain it as a substring.
+            item_fields = ('id', 'name', 'serialno', 'price', 'quantity', 'source', 'match_rank')
+            terms = term.split()
+            items = (
+                Item.objects.filter(match_q(Item, term, limit=10, columns=('serial',)) | Q(serialno__upper=term.upper()))
+                .annotate(source=Value(0, output_field=IntegerField()), match_rank=SEARCH_INDEXES[Item].serial_rank(terms))
+                .order_by().values(*item_fields)
+                .union(
+                    Itempurchased.objects.filter(match_q(Itempurchased, term, limit=10, columns=('serial',)) | Q(serialno__upper=term.upper()))
+                    .annotate(source=Value(1, output_field=IntegerField()), match_rank=SEARCH_INDEXES[Itempurchased].serial_rank(terms))
+                    .order_by().values(*item_fields),
+                    all=True,
+                )
+                .order_by('source', 'match_rank', '-id')[:20]
+            )
+            items = list(items)
+            items = [item for item in items if item['source'] == items[0]['source']][:10] if items else []
+            logger.debug("✅ Matching items found: %d", len(items))
+
+            # One query for the components of every matched serial; purchased
+            # components are only used for serials without stock components
+            serials = {item['serialno'] for item in items}
+            component_fields = ('serial_no', 'category', 'name', 'source')
+            components = (
+                catogaryitem.objects.filter(serial_no__in=serials)
+                .annotate(source=Value(0, output_field=IntegerField()))
+                .order_by().values(*component_fields)
+                .union(
+                    catogaryitempurchased.objects.filter(serial_no__in=serials)
+                    .annotate(source=Value(1, output_field=IntegerField()))
+                    .order_by().values(*component_fields),
+                    all=True,
+                )
+            )
+            grouped = defaultdict(lambda: ([], []))
+            for component in components:
+                grouped[component['serial_no']][component['source']].append(component)
 
             data = []
-            for item in items[:10]:
-                # Get category details for each item's serial number
-                category_items = catogaryitem.objects.filter(serial_no=item.serialno)
-                if not category_items.exists():
-                    print('🔄 Searching in purchased category items')
-                    category_items = catogaryitempurchased.objects.filter(serial_no=item.serialno)
-                print(f"📦 Category items for {item.serialno}: {category_items.count()}")
-
-                # Build description
-                # description_parts = []
-                # for cat_item in category_items:
-                #     description_parts.append(f"{cat_item.category.capitalize()}: {cat_item.name}")
-                #     print(f"🔧 {cat_item.category}: {cat_item.name}")
-
-                description_parts = []
-                for cat_item in category_items:
-                    print('cat_itemcat_item',cat_item.category, cat_item.name)
-                    description_parts.append(f"<span class='badge bg-secondary me-1'>{cat_item.category.capitalize()}: {cat_item.name}</span>")
-                description = " ".join(description_parts)
-
-
-                description = ", ".join(description_parts)
-
-                # Build response object
-                print('description', description)
-                item_data = {
-                    'id': item.id,
-                    'name': item.name,
-                    'serial_no': item.serialno,
+            for item in items:
+                stock_components, purchased_components = grouped[item['serialno']]
+                description = ", ".join(
+                    f"<span class='badge bg-secondary me-1'>{cat_item['category'].capitalize()}: {cat_item['name']}</span>"
+                    for cat_item in (stock_components or purchased_components)
+                )
+                data.append({
+                    'id': item['id'],
+                    'name': item['name'],
+                    'serial_no': item['serialno'],
                     'description': description,
-                    'price': item.price,
-                    'quantity': item.quantity,
-                    # 'total_item': float(item.unit_price) * item.quantity
-                }
-
-                print("📄 Final Item Data:", item_data)
-                data.append(item_data)
+                    'price': item['price'],
+                    'quantity': item['quantity'],
+                })
 
             return JsonResponse(data, safe=False)
 
         except Exception as e:
-            print("❌ Error:", str(e))
+            logger.exception("❌ Item search failed")
             return JsonResponse({'error': str(e)}, status=500)
 
-    print("⚠️ Not an AJAX request")
+    logger.debug("⚠️ Item search outside an AJAX request")
     return JsonResponse({'error': 'Not an AJAX request'}, status=400)
 
 
@@ -1684,20 +1073,11 @@ from .models import Item  # Replace with your model
 @csrf_exempt
 def search_suggestions(request):
     query = request.GET.get('q', '')
-    items = catogaryitem.objects.all()  # Start by getting all items
     suggestions = []
 
     if query:
-        # Filter items based on the query's initial letters
-        items = catogaryitem.objects.filter(name__icontains=query)  # or filter based on other fields as needed
-        item1 = catogaryitem.objects.filter(serial_no__icontains=query)
-        item2 = catogaryitem.objects.filter(category__icontains=query)
-        if items:
-            suggestions = list(set([f"{item.name}" for item in items]))
-        elif item1:
-            suggestions = list(set([f"{item.serial_no}" for item in item1]))
-        else:
-            suggestions = list(set([f"{item.category}" for item in item2])) # or other fields like item.serial_no, etc.
+        # Names first, then serial numbers, then categories
+        suggestions = suggest(catogaryitem, query)
     return JsonResponse({'suggestions': suggestions})
 
 
@@ -1705,20 +1085,11 @@ def search_suggestions(request):
 @csrf_exempt
 def search_suggestions_product(request):
     query = request.GET.get('q', '')
-    items = Item.objects.all()  # Start by getting all items
     suggestions = []
     
     if query:
-        # Filter items based on the query's initial letters
-        items = Item.objects.filter(name__icontains=query)  # or filter based on other fields as needed
-        item1 = Item.objects.filter(serialno__icontains=query)
-        item2 = Item.objects.filter(make_and_models__icontains=query)
-        if items:
-            suggestions = list(set([f"{item.name}" for item in items]))
-        elif item1:
-            suggestions = list(set([f"{item.serialno}" for item in item1]))
-        else:
-            suggestions = list(set([f"{item.make_and_models}" for item in item2])) # or other fields like item.serial_no, etc.
+        # Names first, then serial numbers, then make and models
+        suggestions = suggest(Item, query)
     return JsonResponse({'suggestions': suggestions})
 
 
@@ -1823,11 +1194,14 @@ def get_category_items(request):
             "ssds": list(catogaryitem.objects.filter(category='ssd', serial_no__icontains=serial).values("id", "name", "quantity", "serial_no")),
         }
     elif name:
+        pool = StockPool.objects.filter(name__icontains=name, quantity__gte=1).annotate(
+            serial_no=Value(STOCK_POOL_SERIAL)
+        )
         data = {
-            "processors": list(catogaryitem.objects.filter(category='processor', name__icontains=name,  serial_no__icontains='Solv-IT', quantity__gte=1).values("id", "name", "quantity", "serial_no")),
-            "rams": list(catogaryitem.objects.filter(category='ram', name__icontains=name,  serial_no__icontains='Solv-IT', quantity__gte=1).values("id", "name", "quantity", "serial_no")),
-            "hdds": list(catogaryitem.objects.filter(category='hdd', name__icontains=name,  serial_no__icontains='Solv-IT', quantity__gte=1).values("id", "name", "quantity", "serial_no")),
-            "ssds": list(catogaryitem.objects.filter(category='ssd', name__icontains=name,  serial_no__icontains='Solv-IT', quantity__gte=1).values("id", "name", "quantity", "serial_no")),
+            "processors": list(pool.filter(category='processor').values("id", "name", "quantity", "serial_no")),
+            "rams": list(pool.filter(category='ram').values("id", "name", "quantity", "serial_no")),
+            "hdds": list(pool.filter(category='hdd').values("id", "name", "quantity", "serial_no")),
+            "ssds": list(pool.filter(category='ssd').values("id", "name", "quantity", "serial_no")),
         }
     else:
         # Default to empty lists for all categories if neither serial nor name is provided
@@ -1859,11 +1233,13 @@ def get_category_items_by_type(request):
     if category not in ['processor', 'ram', 'hdd', 'ssd']:
         return JsonResponse({"error": "Invalid category. Must be: processor, ram, hdd, or ssd"}, status=400)
     
-    items = catogaryitem.objects.filter(
-        category=category,
-        serial_no__iexact=serial_no,
-        quantity__gte=1
-    ).values("id", "name", "quantity", "unit_price", "serial_no").order_by('name')
+    if is_pool_serial(serial_no):
+        items = StockPool.objects.filter(category=category, quantity__gte=1).annotate(
+            serial_no=Value(STOCK_POOL_SERIAL)
+        )
+    else:
+        items = catogaryitem.objects.filter(category=category, serial_no__upper=serial_no.upper(), quantity__gte=1)
+    items = items.values("id", "name", "quantity", "unit_price", "serial_no").order_by('name')
     
     print(f"Retrieved {items.count()} items for category '{category}' and serial_no '{serial_no}'")
     return JsonResponse({
@@ -2021,224 +1397,155 @@ def create_category_itemspurchase(spec_string, serial_no, category, quantity, cr
 @login_required
 @csrf_exempt
 def upload_category_items(request):
+    # Pages posting here: the purchase page sends source=purchase
+    template = (
+        'transactions/purchasecreate.html'
+        if request.POST.get('source') == 'purchase'
+        else 'store/productcreate.html'
+    )
+
     if request.method == 'POST':
         form = ExcelUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            excel_file = request.FILES['file']
-            df = pd.read_excel(excel_file)
-
-            render_purchase = False  # 🔑 flag
-
-            for _, row in df.iterrows():
-                serial_no = str(row.get('Serialno')).strip()
-                name = str(row.get('Name', '')).strip()
-                vendor_name = str(row.get('vendor_name', '')).strip()
-                purchased_code = str(row.get('Purchased code', '')).strip()
-                purchased_type = str(row.get('Purchased type', '')).strip()
-
-                if purchased_type:
-                    render_purchase = True  # remember choice
-
-                # ----- your existing logic -----
-                vendor = Vendor.objects.filter(name__iexact=vendor_name).first()
-                if not vendor and vendor_name:
-                    vendor = Vendor.objects.create(name=vendor_name)
-
-                # Customer logic (unchanged)
-                from django.db.models import Q
-                full_name = str(row.get('Customer', '')).strip()
-                first = last = ''
-                if full_name:
-                    parts = full_name.split()
-                    first = parts[0]
-                    last = parts[-1] if len(parts) > 1 else ''
-
-                if first and last:
-                    customer = Customer.objects.filter(
-                        first_name__iexact=first,
-                        last_name__iexact=last
-                    ).first()
-                elif first:
-                    customer = Customer.objects.filter(
-                        Q(first_name__iexact=first) | Q(last_name__iexact=first)
-                    ).first()
-                 
-                # ✅ CREATE if not found
-                if not customer and first:
-                    customer = Customer.objects.create(
-                        first_name=first,
-                        last_name=last
-    )
-
-                # Item creation
-                if purchased_type:
-                    Item.objects.create(
-                        name=name,
-                        serialno=serial_no,
-                        make_and_models=row.get('Make and models', ''),
-                        smps_status=str(row.get('Smps status', '')).strip().lower(),
-                        motherboard_status=str(row.get('Motherboard status', '')).strip().lower(),
-                        quantity=row.get('Quantity', 1),
-                        price=row.get('Price', 0.0),
-                        note=row.get('Note', ''),
-                        purchased_code=purchased_code,
-                        purchased_type=purchased_type.lower(),
-                        customer=customer,
-                        created_by=request.user
-                    )
-                else:
-                    Item.objects.create(
-                        name=name,
-                        serialno=serial_no,
-                        make_and_models=row.get('Make and models', ''),
-                        smps_status=str(row.get('Smps status', '')).strip().lower(),
-                        motherboard_status=str(row.get('Motherboard status', '')).strip().lower(),
-                        quantity=row.get('Quantity', 1),
-                        price=row.get('Price', 0.0),
-                        note=row.get('Note', ''),
-                        purchased_code=purchased_code,
-                        customer=customer,
-                        created_by=request.user
-                    )
-
-                # Category items
-                create_category_items(row.get('Processor', ''), serial_no, 'processor', row.get('Processor_Qty', ''), 0.0, request.user, purchased_code)
-                create_category_items(row.get('RAM', ''), serial_no, 'ram', row.get('Ram_Qty', ''), 0.0, request.user, purchased_code)
-                create_category_items(row.get('HDD', ''), serial_no, 'hdd', row.get('Hdd_Qty', ''), 0.0, request.user, purchased_code)
-                create_category_items(row.get('SSD', ''), serial_no, 'ssd', row.get('Ssd_Qty', ''), 0.0, request.user, purchased_code)
-
-                    
-                # Audit Trail
-                audit_data = {
-                    'name': name,
-                    'serial_no': serial_no,
-                    'make_and_models': row.get('Make and models', ''),
-                    'smps': str(row.get('Smps status', '')).strip().lower(),
-                    'motherboard': str(row.get('Motherboard status', '')).strip().lower(),
-                    'price': row.get('Price', 0.0),
-                    'ram': row.get('RAM', ''),
-                    'processor': row.get('Processor', ''),
-                    'hdd': row.get('HDD', ''),
-                    'ssd': row.get('SSD', ''),
-                    'ram_qty': 0 if row.get('Ram_Qty') in [None, 'nan'] else row.get('Ram_Qty'),
-                    'processor_qty': 0 if row.get('Processor_Qty', '') in [None, 'nan'] else row.get('Processor_Qty', 0),
-                    'hdd_qty': 0 if row.get('Hdd_Qty', '') in [None, 'nan'] else row.get('Hdd_Qty', 0),
-                    'ssd_qty': 0 if row.get('Ssd_Qty', '') in [None, 'nan'] else row.get('Ssd_Qty', 0),
-                    'performed_by': request.user,
-                    'action': 'ASSIGN'
-                }
-
-
-                ProductAuditTrail.objects.create(**audit_data)
-                
-
-            # ✅ Render AFTER loop
-            template = (
-                'transactions/purchasecreate.html'
-                if render_purchase
-                else 'store/productcreate.html'
-            )
+            # ✅ Queue the sheet; run_import_worker imports it in the background
+            job = enqueue_import('items', request.FILES['file'], request.user)
 
             return render(request, template, {
                 'form': ExcelUploadForm(),
-                'success': "Excel imported successfully!"
+                'success': f"Excel upload queued as import #{job.pk}.",
+                'import_job': job,
             })
 
     else:
         form = ExcelUploadForm()
 
-    return render(request, 'store/productcreate.html', {'form': form})
+    return render(request, template, {'form': form})
 
 
 
 
+@login_required
 @csrf_exempt
 def upload_category_only(request):
     if request.method == 'POST':
         form = ExcelUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            excel_file = request.FILES['file']
-            # try:
-            # Read and replace NaN with empty strings to avoid 'nan' and float issues
-            df = pd.read_excel(excel_file).fillna('')
-
-            print('df', df.head())
-
-            # Build normalized map of columns once to support flexible header names
-            norm_map = {}
-            for c in df.columns:
-                if c is None:
-                    continue
-                norm_map[str(c).strip().lower()] = c
-
-            print(f"upload_category_only: normalized columns detected: {list(norm_map.keys())}")
-
-            def find_col(possible_substrings):
-                for k, orig in norm_map.items():
-                    for sub in possible_substrings:
-                        if sub in k:
-                            return orig
-                return None
-
-            serial_col = find_col(['serial', 'serialno', 'serial number'])
-            name_col = find_col(['name', 'item', 'product'])
-            category_col = find_col(['Category', 'cat', 'component', 'type'])
-            qty_col = find_col(['quantity', 'qty'])
-            price_col = find_col(['unit price', 'unit_price', 'price', 'unitprice'])
-            vendor_col = find_col(['vendor', 'product code', 'vendor name', 'product code / vendor name'])
-            purchased_col = find_col(['purchased_code', 'purchased code', 'purchase code', 'product code', 'product code / vendor name'])
-
-            for row_idx, row in df.iterrows():
-                serial_no = str(row.get(serial_col, '')).strip() if serial_col else ''
-                row_category = str(row.get(category_col, '')).strip() if category_col else ''
-                comp_name = str(row.get(d, '')).strip() if name_col else ''
-                qty_val = row.get(qty_col, '') if qty_col else 1
-                unit_price = 0.0 #row.get(price_col, '') if price_col else ''
-                vendor_name = str(row.get(vendor_col, '')).strip() if vendor_col else ''
-                purchased_code = str(row.get(purchased_col, '')).strip() if purchased_col else ''
-
-                print(f"upload_category_only: row {row_idx} -> serial_no={serial_no}, category={row_category}, name={comp_name}, qty={qty_val}, price={unit_price}, purchased_code={purchased_code}")
-
-                # If row has category+name populate a single catogaryitem
-                try:
-                    if row_category and comp_name:
-                        print(f"upload_category_only: creating single category item for serial {serial_no}, category {row_category}, name {comp_name}, qty {qty_val}, price {unit_price}")
-                        create_category_items(comp_name, serial_no, row_category.strip(), str(qty_val), unit_price, request.user, purchased_code)
-                    else:
-                        print(f"upload_category_only: no single category+name found for row {row_idx}, falling back to wide-columns")
-                        # Fallback: wide-columns Processor/Ram/Hdd/Ssd
-                        proc_spec = str(row.get('Processor', '') or '').strip()
-                        ram_spec = str(row.get('Ram', '') or '').strip()
-                        hdd_spec = str(row.get('Hdd', '') or '').strip()
-                        ssd_spec = str(row.get('Ssd', '') or '').strip()
-
-                    create_category_items(row.get('Processors', ''), serial_no, 'processor', row.get('Processor_Qty', ''),0.0, request.user, purchased_code)
-                    create_category_items(row.get('RAMs', ''), serial_no, 'ram', row.get('Ram_Qty', ''),0.0, request.user, purchased_code)
-                    create_category_items(row.get('HDDs', ''), serial_no, 'hdd', row.get('Hdd_Qty', ''),0.0, request.user, purchased_code)
-                    create_category_items(row.get('SSDs', ''), serial_no, 'ssd',row.get('Ssd_Qty', ''),0.0, request.user, purchased_code)
-                except Exception as e:
-                    print(f"upload_category_only: failed to create category items for serial {serial_no} at row {row_idx}: {e}")
-                    return render(request, 'store/category_form.html', {
-                        'form': ExcelUploadForm(),
-                        'error': f"Import failed for serial {serial_no} at row {row_idx}: {e}"
-                    })
+            # ✅ Queue the sheet; run_import_worker imports it in the background
+            job = enqueue_import('category_items', request.FILES['file'], request.user)
 
             return render(request, 'store/category_form.html', {
                 'form': ExcelUploadForm(),
-                'success': "Excel imported successfully!"
+                'success': f"Excel upload queued as import #{job.pk}.",
+                'import_job': job,
             })
-
-            # except Exception as e:
-            #     return render(request, 'store/productcreate.html', {
-            #         'form': form,
-            #         'error': f"Import failed: {e}"
-            #     })
     else:
         form = ExcelUploadForm()
 
     return render(request, 'store/category_form.html', {'form': form})
 
 
+@login_required
+def import_job_status(request, pk):
+    """Progress of a queued spreadsheet import, polled by the upload pages."""
+    job = get_object_or_404(ImportJob, pk=pk)
+    return JsonResponse(job.to_progress())
+
+
+
+from django.conf import settings
+from django.http import Http404
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from .barcode_utils import BARCODE_FORMATS, get_barcode_image
+
+
+def _barcode_etag(request, serial, fmt):
+    try:
+        return get_barcode_image(serial, fmt)[1]
+    except Exception:
+        return None
+
+
+@login_required
+@condition(etag_func=_barcode_etag)
+def barcode_image(request, serial, fmt):
+    """
+    Serve the Code128 barcode of a serial number as PNG or SVG.
+
+    Barcodes are rendered on first request and then served from the
+    in-process LRU / sharded disk cache in barcode_utils. Browsers get a
+    strong ETag, so a repeat request with If-None-Match is answered with
+    304 by the condition decorator without sending the image again.
+    """
+    try:
+        content, _ = get_barcode_image(serial, fmt)
+    except Exception as e:
+        raise Http404(f"Cannot render barcode for {serial}: {e}")
+
+    response = HttpResponse(content, content_type=BARCODE_FORMATS[fmt][0])
+    patch_cache_control(response, private=True, max_age=settings.BARCODE_CACHE_MAX_AGE)
+    return response
+
+
+def metrics(request):
+    """
+    Request metrics of all workers in the Prometheus text format.
+
+    Open to staff users and to scrapers sending METRICS_BEARER_TOKEN as
+    ``Authorization: Bearer <token>``. The client address is not trusted:
+    behind a reverse proxy every request comes from localhost.
+    """
+    token = getattr(settings, 'METRICS_BEARER_TOKEN', '')
+    scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    has_token = bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.encode(), token.encode())
+    if not (request.user.is_staff or has_token):
+        return HttpResponse(status=403)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+import tempfile
+from django.http import FileResponse, HttpResponseBadRequest
+from django.utils.dateparse import parse_date
+from .label_sheets import label_items, parse_serials, write_label_sheet
+
+
+@login_required
+def label_sheet_pdf(request):
+    """
+    Print barcode labels for a purchase lot, a date range or a list of
+    serials as one multi-page PDF.
+
+    Query parameters: ``lot`` (purchased code), ``date_from`` / ``date_to``
+    (YYYY-MM-DD) and ``serials`` (comma or whitespace separated).
+    """
+    dates = {}
+    for key in ('date_from', 'date_to'):
+        value = request.GET.get(key)
+        try:
+            dates[key] = parse_date(value) if value else None
+        except ValueError:
+            dates[key] = None
+        if value and dates[key] is None:
+            return HttpResponseBadRequest("Dates must be given as YYYY-MM-DD")
+
+    lot = (request.GET.get('lot') or '').strip()
+    try:
+        rows = label_items(
+            purchased_code=lot or None,
+            date_from=dates['date_from'],
+            date_to=dates['date_to'],
+            serials=parse_serials(request.GET.get('serials')),
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    # Spooled to disk past 5 MB, then streamed back in chunks
+    pdf_file = tempfile.SpooledTemporaryFile(max_size=5 * 1024 * 1024)
+    write_label_sheet(rows.iterator(), pdf_file, title=f"Labels {lot}".strip())
+    pdf_file.seek(0)
+    return FileResponse(pdf_file, content_type='application/pdf', filename=f"labels-{lot or 'items'}.pdf")
+
+
 
 class ProductAuditTrailView(LoginRequiredMixin, ListView):
     """
@@ -0,0 +1,142 @@
+"""
+Balance posting utility for Solv-IT application.
+
+Every path that changes a bank balance goes through this module. The
+payment views used to do ``account.opening_balance += x; account.save()``,
+which loses one of two payments posted to the same account at the same
+time (both read the old balance, the second save overwrites the first).
+
+- ``post_balance`` adds a delta in the database with
+  ``UPDATE ... SET opening_balance = opening_balance + x`` and writes the
+  posting's LedgerEntry in the same transaction. A debit that must not
+  overdraw the account is a conditional update (``... AND
+  opening_balance >= x``), so the check and the debit cannot be split
+  by another posting.
+- ``transfer`` moves money between two accounts after locking both rows
+  with ``select_for_update`` (in id order, so two opposite transfers
+  cannot deadlock).
+- ``post_record_payment`` posts the payment of a saved Sale or Purchase.
+
+The views also lock the Sale, Purchase or ServiceBillItem they take a
+payment for with ``select_for_update`` inside ``transaction.atomic()``,
+so its ``amount_paid`` is not read-modified-written concurrently either.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import BankTransaction, Bankaccount, LedgerEntry
+
+
+class InsufficientBalance(ValueError):
+    """A debit would take an account below zero."""
+
+
+def _account_id(account):
+    return account.pk if isinstance(account, Bankaccount) else account
+
+
+def post_balance(account, amount, entry_type, note, overdraft=True, **links):
+    """
+    Add ``amount`` (negative to take money out) to the balance of
+    ``account`` (a Bankaccount or its id; None is cash in hand, which only
+    has ledger entries) and write the LedgerEntry of the posting.
+    ``links`` are the entry's sale, purchase, servicebill or
+    payment_record. Returns the LedgerEntry.
+
+    Raises:
+        InsufficientBalance: ``overdraft`` is False and the account holds
+            less than ``-amount``.
+        Bankaccount.DoesNotExist: The account does not exist.
+    """
+    amount = Decimal(str(amount))
+    account_id = _account_id(account)
+    with transaction.atomic():
+        if account_id:
+            rows = Bankaccount.objects.filter(pk=account_id)
+            if not overdraft and amount < 0:
+                rows = rows.filter(opening_balance__gte=-amount)
+            if not rows.update(opening_balance=F('opening_balance') + amount):
+                if not Bankaccount.objects.filter(pk=account_id).exists():
+                    raise Bankaccount.DoesNotExist(f"Bank account {account_id} does not exist")
+                raise InsufficientBalance(f"Insufficient balance in bank account {account_id}")
+        return LedgerEntry.objects.create(
+            account_id=account_id,
+            amount=amount,
+            entry_type=entry_type,
+            note=note,
+            **links
+        )
+
+
+def lock_accounts(*accounts):
+    """Lock the rows of ``accounts`` (Bankaccounts or ids) until the transaction ends."""
+    ids = sorted({_account_id(account) for account in accounts if _account_id(account)})
+    return {account.pk: account for account in Bankaccount.objects.select_for_update().filter(pk__in=ids).order_by('pk')}
+
+
+def transfer(source, destination, amount, note, **links):
+    """
+    Move ``amount`` from ``source`` to ``destination`` and post both legs
+    to the ledger. Returns the two accounts as locked, before the transfer.
+
+    Raises:
+        InsufficientBalance: ``source`` holds less than ``amount``.
+    """
+    with transaction.atomic():
+        accounts = lock_accounts(source, destination)
+        post_balance(source, -Decimal(str(amount)), 'Transfer', note, overdraft=False, **links)
+        post_balance(destination, amount, 'Transfer', note, **links)
+    return accounts[_account_id(source)], accounts[_account_id(destination)]
+
+
+def _payment_account_id(payment_type, bank_account_id):
+    """The bank account a payment sits on; None is cash in hand."""
+    return bank_account_id if payment_type == 'Bank' else None
+
+
+def post_record_payment(record, entry_type, saved):
+    """
+    Post the payment of a Sale or Purchase just saved: ``saved`` holds the
+    payment fields it had before (``changed_fields()``; empty for a new
+    record). Only the difference is posted, and the record's
+    BankTransaction is kept in step.
+    """
+    link = {entry_type.lower(): record}
+    amount = Decimal(str(record.amount_paid))
+    account_id = _payment_account_id(record.payment_type, record.bank_account_id)
+    if not saved:
+        postings = [(account_id, amount)]
+    else:
+        old_amount = Decimal(str(saved.get('amount_paid', record.amount_paid)))
+        old_account_id = _payment_account_id(
+            saved.get('payment_type', record.payment_type),
+            saved.get('bank_account', record.bank_account_id),
+        )
+        if old_account_id == account_id:
+            postings = [(account_id, amount - old_amount)]
+        else:
+            postings = [(old_account_id, -old_amount), (account_id, amount)]
+        postings = [(account, delta) for account, delta in postings if delta]
+
+    with transaction.atomic():
+        for posting_account_id, delta in postings:
+            post_balance(posting_account_id, delta, entry_type, f"{entry_type} payment posted ({entry_type} ID: {record.id})", **link)
+
+        if account_id:
+            note = f"{entry_type} payment received ({entry_type} ID: {record.id})"
+            logged = 0
+            if saved:
+                logged = BankTransaction.objects.filter(**link).update(bank_account_id=account_id, amount=amount, note=note)
+            if not logged:
+                BankTransaction.objects.create(
+                    bank_account_id=account_id,
+                    transaction_type='credit',
+                    amount=amount,
+                    note=note,
+                    **link
+                )
+        elif saved:
+            BankTransaction.objects.filter(**link).delete()
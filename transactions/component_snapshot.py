@@ -0,0 +1,99 @@
+"""
+Component snapshot utility for Solv-IT application.
+
+A sale or purchase line records the components its device had when it
+was sold or bought, as a JSON list on ``SaleDetail.components`` /
+``PurchaseDetail.components``::
+
+    [{"category": "ram", "name": "Kingston 8GB", "quantity": 2, "unit_cost": "450.00"}, ...]
+
+Invoices render it with ``transactions/detail_components.html`` and the
+exports and purchase list group it with ``group_lines``; neither parses
+text or queries the component tables again.
+
+Lines written before the snapshot existed only had an HTML description
+("PROCESSOR: i5 X(1)<br>RAM: 8GB X(2), 4GB X(1)<br>");
+``parse_description`` converts those once, in the migration adding the
+field (unit costs were not recorded, so they are None).
+"""
+
+import re
+
+
+COMPONENT_CATEGORIES = ['processor', 'ram', 'hdd', 'ssd']
+
+# "8GB DDR4 X(2)" -> name, quantity; purchase descriptions end a category
+# with the device serial, e.g. "RAM: 8GB X(2) (SN123)"
+PART_RE = re.compile(r'\s*(.+?)\s+X\((\d+)\)(?:\s*\([^()]*\))?\s*(?:,|$)')
+
+
+def snapshot_components(components):
+    """The snapshot of component rows (catogaryitem or catogaryitempurchased)."""
+    parts = [
+        {
+            'category': component.category,
+            'name': component.name,
+            'quantity': component.quantity or 0,
+            'unit_cost': None if component.unit_price is None else str(component.unit_price),
+        }
+        for component in components
+    ]
+    order = {category: index for index, category in enumerate(COMPONENT_CATEGORIES)}
+    parts.sort(key=lambda part: order.get(part['category'], len(order)))
+    return parts
+
+
+def component_lines(parts):
+    """[("PROCESSOR", "i5 X(1)"), ("RAM", "8GB X(2), 4GB X(1)")] in category order."""
+    grouped = {}
+    for part in parts or []:
+        grouped.setdefault(part['category'], []).append(f"{part['name']} X({part['quantity']})")
+    return [(category.upper(), ", ".join(names)) for category, names in grouped.items()]
+
+
+def group_lines(details):
+    """
+    The component lines of many detail rows grouped by category, as
+    ``{"PROCESSOR": ["PROCESSOR: i5 X(1)", ...], "RAM": [...], ...}``.
+    """
+    grouped = {category.upper(): [] for category in COMPONENT_CATEGORIES}
+    for detail in details:
+        for category, names in component_lines(detail.components):
+            grouped.setdefault(category, []).append(f"{category}: {names}")
+    return grouped
+
+
+def parse_description(description):
+    """The snapshot of a historical HTML description."""
+    parts = []
+    for line in (description or '').split('<br>'):
+        category, separator, rest = line.partition(':')
+        category = category.strip().lower()
+        if not separator or category not in COMPONENT_CATEGORIES:
+            continue
+        for name, quantity in PART_RE.findall(rest):
+            parts.append({'category': category, 'name': name.strip(), 'quantity': int(quantity), 'unit_cost': None})
+    return parts
+
+
+def backfill_snapshots(model, batch_size=2000):
+    """
+    Fill ``components`` of the rows of ``model`` (SaleDetail or
+    PurchaseDetail, possibly historical) that have a description but no
+    snapshot. Returns the number of rows updated.
+    """
+    rows = model.objects.filter(components=[]).exclude(description__isnull=True).exclude(description='')
+    rows = rows.order_by('pk').only('pk', 'description', 'components')
+    updated, last_pk = 0, 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return updated
+        changed = []
+        for row in batch:
+            row.components = parse_description(row.description)
+            if row.components:
+                changed.append(row)
+        model.objects.bulk_update(changed, ['components'])
+        updated += len(changed)
+        last_pk = batch[-1].pk
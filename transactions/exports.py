@@ -0,0 +1,201 @@
+"""
+Export engine for sales, purchases and bank accounts.
+
+Rows are read from the database in chunks (with their details prefetched
+once per chunk) and written either as CSV straight into a
+StreamingHttpResponse, or through an openpyxl write-only workbook that is
+spooled to a temporary file and streamed back with FileResponse. Memory
+use stays bounded no matter how many rows are exported.
+"""
+
+import csv
+import tempfile
+
+from django.db.models import Prefetch
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment
+from openpyxl.utils import get_column_letter
+
+from .models import Bankaccount, Purchase, PurchaseDetail, Sale, SaleDetail
+
+
+CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+DESCRIPTION_CATEGORIES = ['PROCESSOR', 'RAM', 'HDD', 'SSD']
+
+INVOICE_COLUMNS = [
+    'Sub Total', 'Grand Total', 'Tax Amount', 'Tax Percentage',
+    'Amount Paid', 'Amount Change', 'Item Descriptions',
+]
+
+
+class Echo:
+    """File-like object whose write() hands the value back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def make_naive(value):
+    if value is not None and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+def description_text(transaction):
+    """Join the grouped item descriptions of a Sale or Purchase line by line."""
+    items = transaction.get_item_descriptions_by_type()
+    lines = []
+    for category in DESCRIPTION_CATEGORIES:
+        for line in items.get(category, []):
+            lines.append(line.strip())
+    return "\n".join(lines)
+
+
+class ExportSpec:
+    """
+    Describes one export: its header, column widths, and the row iterator.
+
+    ``wrap_columns`` holds 1-based column indexes rendered with wrapped text
+    in xlsx output.
+    """
+
+    title = ''
+    filename = ''
+    columns = []
+    widths = []
+    wrap_columns = ()
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get_row(self, obj):
+        raise NotImplementedError
+
+    def iter_rows(self):
+        for obj in self.get_queryset().iterator(chunk_size=CHUNK_SIZE):
+            yield self.get_row(obj)
+
+
+class SaleExport(ExportSpec):
+    title = 'Sales'
+    filename = 'sales'
+    columns = ['INV no', 'Date', 'Customer'] + INVOICE_COLUMNS
+    widths = [12, 20, 18, 14, 14, 14, 14, 14, 14, 50]
+    wrap_columns = (10,)
+
+    def get_queryset(self):
+        return Sale.objects.select_related('customer').prefetch_related(
+            Prefetch('saledetail_set', queryset=SaleDetail.objects.only('sale_id', 'components'))
+        ).order_by('id')
+
+    def get_row(self, sale):
+        return [
+            'INV' + str(sale.id),
+            make_naive(sale.date_added),
+            sale.customer.phone if sale.customer else '',
+            sale.sub_total,
+            sale.grand_total,
+            sale.tax_amount,
+            sale.tax_percentage,
+            sale.amount_paid,
+            sale.amount_change,
+            description_text(sale),
+        ]
+
+
+class PurchaseExport(ExportSpec):
+    title = 'purchases'
+    filename = 'purchases'
+    columns = ['INV no', 'Date', 'Vendor'] + INVOICE_COLUMNS
+    widths = [12, 20, 24, 14, 14, 14, 14, 14, 14, 50]
+    wrap_columns = (10,)
+
+    def get_queryset(self):
+        return Purchase.objects.select_related('vendor').prefetch_related(
+            Prefetch('purchasedetail_set', queryset=PurchaseDetail.objects.only('purchase_id', 'components'))
+        ).order_by('id')
+
+    def get_row(self, purchase):
+        return [
+            'INV' + str(purchase.id),
+            make_naive(purchase.date_added),
+            purchase.vendor.name if purchase.vendor else '',
+            purchase.sub_total,
+            purchase.grand_total,
+            purchase.tax_amount,
+            purchase.tax_percentage,
+            purchase.amount_paid,
+            purchase.amount_change,
+            description_text(purchase),
+        ]
+
+
+class BankExport(ExportSpec):
+    title = 'Bank Details'
+    filename = 'Bank Details'
+    columns = ['ID', 'Account Name', 'Opening Balance', 'As Of Date']
+    widths = [8, 30, 18, 20]
+
+    def get_queryset(self):
+        return Bankaccount.objects.order_by('id')
+
+    def get_row(self, bank):
+        return [
+            bank.id,
+            bank.account_name,
+            bank.opening_balance,
+            make_naive(bank.as_of_date),
+        ]
+
+
+def stream_csv(spec):
+    writer = csv.writer(Echo())
+
+    def rows():
+        yield writer.writerow(spec.columns)
+        for row in spec.iter_rows():
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{spec.filename}.csv"'
+    return response
+
+
+def stream_xlsx(spec):
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(spec.title)
+
+    # Write-only sheets cannot be rescanned, so widths are fixed up front.
+    for index, width in enumerate(spec.widths, 1):
+        worksheet.column_dimensions[get_column_letter(index)].width = width
+
+    wrap = Alignment(wrap_text=True)
+    worksheet.append(spec.columns)
+    for row in spec.iter_rows():
+        for index in spec.wrap_columns:
+            cell = WriteOnlyCell(worksheet, value=row[index - 1])
+            cell.alignment = wrap
+            row[index - 1] = cell
+        worksheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{spec.filename}.xlsx',
+        content_type=XLSX_CONTENT_TYPE,
+    )
+
+
+def export_response(request, spec):
+    """Stream ``spec`` as CSV when ``?format=csv`` is given, else as xlsx."""
+    if request.GET.get('format', '').lower() == 'csv':
+        return stream_csv(spec)
+    return stream_xlsx(spec)
@@ -0,0 +1,75 @@
+"""
+Field tracking utility for Solv-IT application.
+
+Models that act on a change of some of their fields when saved (the bank
+postings of Sale and Purchase, the autocomplete index of Item and
+catogaryitem) used to re-read their row with
+``objects.get(pk=...)`` on every save to compare against.
+``TrackedFieldsMixin`` instead remembers the values of ``tracked_fields``
+when an instance is loaded and after every save, so ``changed_fields()``
+answers without a query.
+"""
+
+
+class TrackedFieldsMixin:
+    """
+    Remember the saved values of ``tracked_fields`` (field names; foreign
+    keys are compared by their id). Put it before ``models.Model`` in the
+    bases.
+    """
+
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_tracked_fields()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self.remember_tracked_fields(fields)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.remember_tracked_fields(kwargs.get('update_fields'))
+
+    def _tracked_attnames(self):
+        return {name: self._meta.get_field(name).attname for name in self.tracked_fields}
+
+    def remember_tracked_fields(self, fields=None):
+        """Take the current values of ``fields`` (default all) as the saved ones."""
+        saved = self.__dict__.setdefault('_tracked_values', {})
+        for name, attname in self._tracked_attnames().items():
+            if fields is not None and name not in fields and attname not in fields:
+                continue
+            # Deferred fields are remembered when they are loaded
+            if attname in self.__dict__:
+                saved[name] = self.__dict__[attname]
+
+    def saved_values(self):
+        """The tracked values as last loaded or saved; {} for an unsaved instance."""
+        if self._state.adding:
+            return {}
+        saved = self.__dict__.setdefault('_tracked_values', {})
+        # A field deferred when loaded and assigned since: its saved value
+        # is only in the database
+        unknown = [
+            attname for name, attname in self._tracked_attnames().items()
+            if name not in saved and attname in self.__dict__
+        ]
+        if unknown:
+            row = type(self)._base_manager.using(self._state.db).filter(pk=self.pk).values(*unknown).first() or {}
+            for name, attname in self._tracked_attnames().items():
+                if attname in row:
+                    saved[name] = row[attname]
+        return saved
+
+    def changed_fields(self):
+        """Tracked field name -> saved value, for the fields changed since."""
+        saved = self.saved_values()
+        return {
+            name: saved[name]
+            for name, attname in self._tracked_attnames().items()
+            if name in saved and saved[name] != getattr(self, attname)
+        }
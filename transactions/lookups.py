@@ -0,0 +1,90 @@
+"""
+Picker lookup utility for Solv-IT application.
+
+The customer and vendor pickers of the sale, purchase, service and
+product pages query these lookups as the user types, instead of the
+pages embedding every customer and vendor. A lookup answers one page of
+``LOOKUP_PAGE_SIZE`` matches as ``{'results': [{'id', 'text'}], 'more'}``
+(the select2 format; the plain suggestion lists read the same keys).
+
+Pages are cached per query; the signals in ``transactions.signals`` bump
+the version in the cache key (a CacheVersion row) when a customer or
+vendor is saved or deleted.
+"""
+
+import hashlib
+import re
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.models import Customer, Vendor
+from store.models import CacheVersion
+
+
+LOOKUP_PAGE_SIZE = 20
+LOOKUP_CACHE_TIMEOUT = 60 * 10
+MIN_QUERY_LENGTH = 1
+
+
+def _customer_rows(query):
+    return (
+        Customer.objects.filter(Q(first_name__icontains=query) | Q(last_name__icontains=query) | Q(phone__icontains=query))
+        .order_by('first_name', 'last_name', 'id')
+        .values_list('id', 'first_name', 'last_name')
+    )
+
+
+def _vendor_rows(query):
+    filters = Q(name__icontains=query) | Q(phone_number__icontains=query)
+    # "+91 98765-43210" also finds the number stored as +919876543210
+    digits = re.sub(r'\D', '', query)
+    if digits and digits != query:
+        filters |= Q(phone_number__icontains=digits)
+    return Vendor.objects.filter(filters).order_by('name', 'id').values_list('id', 'name')
+
+
+LOOKUPS = {
+    'customer': (_customer_rows, lambda pk, first_name, last_name: ' '.join(filter(None, [first_name, last_name]))),
+    'vendor': (_vendor_rows, lambda pk, name: name or ''),
+}
+
+
+def _version_key(kind):
+    return f'transactions:lookup:{kind}:version'
+
+
+def invalidate_lookup(kind):
+    """Drop the cached pages of ``kind`` once the current transaction commits."""
+    transaction.on_commit(lambda: CacheVersion.objects.bump(_version_key(kind)))
+
+
+def lookup_page(kind, query, page=1, page_size=LOOKUP_PAGE_SIZE):
+    """One page of ``kind`` ('customer' or 'vendor') matches for ``query``."""
+    query = (query or '').strip()
+    page = max(page, 1)
+    if len(query) < MIN_QUERY_LENGTH:
+        return {'results': [], 'more': False}
+
+    digest = hashlib.md5(query.lower().encode()).hexdigest()
+    key = f'transactions:lookup:{kind}:{CacheVersion.objects.current(_version_key(kind))}:{digest}:{page_size}:{page}'
+    result = cache.get(key)
+    if result is None:
+        rows_for, label = LOOKUPS[kind]
+        start = (page - 1) * page_size
+        # One extra row tells whether there is a next page without a COUNT
+        rows = list(rows_for(query)[start:start + page_size + 1])
+        result = {
+            'results': [{'id': row[0], 'text': label(*row)} for row in rows[:page_size]],
+            'more': len(rows) > page_size,
+        }
+        cache.set(key, result, LOOKUP_CACHE_TIMEOUT)
+    return result
+
+
+def page_number(request):
+    try:
+        return int(request.GET.get('page', 1))
+    except ValueError:
+        return 1
@@ -0,0 +1,111 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_ledger(apps, schema_editor):
+    """
+    Rebuild the ledger from existing documents and payment records, then
+    post an opening entry per account so that every account's ledger sums
+    to its current balance.
+    """
+    Bankaccount = apps.get_model('transactions', 'Bankaccount')
+    Sale = apps.get_model('transactions', 'Sale')
+    Purchase = apps.get_model('transactions', 'Purchase')
+    ServiceBillItem = apps.get_model('transactions', 'ServiceBillItem')
+    PaymentRecord = apps.get_model('transactions', 'PaymentRecord')
+    LedgerEntry = apps.get_model('transactions', 'LedgerEntry')
+
+    entries = []
+
+    def paid_up_front(document):
+        # Later payments are posted from their PaymentRecord below
+        received = document.payment_records.aggregate(total=Sum('payment_amount'))['total'] or Decimal('0')
+        return max(Decimal(str(document.amount_paid or 0)) - received, Decimal('0'))
+
+    documents = (
+        (Sale.objects.all(), 'Sale', 'sale', 'date_added'),
+        (Purchase.objects.all(), 'Purchase', 'purchase', 'date_added'),
+        (ServiceBillItem.objects.filter(grand_total__isnull=False), 'Service', 'servicebill', 'date_created'),
+    )
+    for queryset, entry_type, field, date_field in documents:
+        for document in queryset.iterator():
+            amount = paid_up_front(document)
+            if not amount:
+                continue
+            entries.append(LedgerEntry(
+                account_id=document.bank_account_id if document.payment_type == 'Bank' else None,
+                date=getattr(document, date_field),
+                amount=amount,
+                entry_type=entry_type,
+                note=f"{entry_type} payment posted ({entry_type} ID: {document.id})",
+                **{field: document},
+            ))
+
+    for record in PaymentRecord.objects.all().iterator():
+        links = {
+            'sale_id': record.sale_id,
+            'purchase_id': record.purchase_id,
+            'servicebill_id': record.servicebill_id,
+            'payment_record': record,
+            'date': record.payment_date,
+        }
+        if record.payment_mode == 'Transfer':
+            entries.append(LedgerEntry(account_id=record.source_bank_account_id, amount=-record.payment_amount,
+                                       entry_type='Transfer', note=record.transaction_id, **links))
+            entries.append(LedgerEntry(account_id=record.receiving_bank_account_id, amount=record.payment_amount,
+                                       entry_type='Transfer', note=record.transaction_id, **links))
+        else:
+            entries.append(LedgerEntry(account_id=record.receiving_bank_account_id, amount=record.payment_amount,
+                                       entry_type=record.payment_source_type, note=record.transaction_id, **links))
+
+    LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+    openings = []
+    for account in Bankaccount.objects.all():
+        posted = account.ledger_entries.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        first = account.ledger_entries.order_by('date').values_list('date', flat=True).first()
+        dates = [d for d in (account.as_of_date, first) if d is not None]
+        openings.append(LedgerEntry(
+            account=account,
+            date=min(dates) if dates else django.utils.timezone.now(),
+            amount=account.opening_balance - posted,
+            entry_type='Opening',
+            note=f"Opening balance of {account.account_name}",
+        ))
+    LedgerEntry.objects.bulk_create(openings)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0046_alter_paymentrecord_receiving_bank_account'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('entry_type', models.CharField(choices=[('Opening', 'Opening Balance'), ('Sale', 'Sale'), ('Purchase', 'Purchase'), ('Service', 'Service'), ('Transfer', 'Transfer')], max_length=20)),
+                ('note', models.CharField(blank=True, max_length=255, null=True)),
+                ('account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='transactions.bankaccount')),
+                ('payment_record', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='transactions.paymentrecord')),
+                ('purchase', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='transactions.purchase')),
+                ('sale', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='transactions.sale')),
+                ('servicebill', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='transactions.servicebillitem')),
+            ],
+            options={
+                'ordering': ['-date', '-id'],
+                'indexes': [models.Index(fields=['account', 'date'], name='ledger_account_date_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
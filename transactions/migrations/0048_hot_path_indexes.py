@@ -0,0 +1,45 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:55
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_customer_person_type'),
+        ('transactions', '0047_ledgerentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='catogaryitempurchased',
+            index=models.Index(fields=['serial_no', 'category'], name='catpur_serial_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catogaryitempurchased',
+            index=models.Index(django.db.models.functions.text.Upper('serial_no'), name='catpur_serial_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itempurchased',
+            index=models.Index(fields=['serialno'], name='itempur_serialno_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itempurchased',
+            index=models.Index(django.db.models.functions.text.Upper('serialno'), name='itempur_serialno_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentrecord',
+            index=models.Index(fields=['payment_date'], name='payment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['date_added'], name='sale_date_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicebillitem',
+            index=models.Index(fields=['date_created'], name='servicebill_date_created_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:20
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_summary(apps, schema_editor):
+    Sale = apps.get_model('transactions', 'Sale')
+    DailySalesSummary = apps.get_model('transactions', 'DailySalesSummary')
+    days = (
+        Sale.objects.annotate(day=TruncDate('date_added'))
+        .values('day')
+        .annotate(count=Count('id'), total=Sum('grand_total'))
+        .order_by('day')
+    )
+    DailySalesSummary.objects.bulk_create([
+        DailySalesSummary(date=day['day'], sale_count=day['count'], total_sales=day['total'] or 0)
+        for day in days if day['day']
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0048_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('sale_count', models.PositiveIntegerField(default=0)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=Decimal('0.0'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily sales summaries',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.RunPython(backfill_summary, migrations.RunPython.noop),
+    ]
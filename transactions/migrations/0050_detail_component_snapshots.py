@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:42
+
+from django.db import migrations, models
+
+from transactions.component_snapshot import backfill_snapshots
+
+
+def convert_descriptions(apps, schema_editor):
+    # Historical lines only have the HTML description; parse it once here
+    for model_name in ('SaleDetail', 'PurchaseDetail'):
+        backfill_snapshots(apps.get_model('transactions', model_name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0049_dailysalessummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchasedetail',
+            name='components',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='saledetail',
+            name='components',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(convert_descriptions, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,6 @@
 
 from decimal import Decimal
-from django.db import models
+from django.db import models, transaction
 from django.forms import model_to_dict
 from django.urls import reverse
 from django_extensions.db.fields import AutoSlugField
@@ -9,6 +9,10 @@ from store.models import Item
 from accounts.models import Vendor, Customer
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.db.models.functions import Upper
+
+from .component_snapshot import component_lines, group_lines
+from .field_tracking import TrackedFieldsMixin
 
 # Import Expense model
 from .models_expense import Expense
@@ -28,8 +32,19 @@ class Bankaccount(models.Model):
     )
 
     def save(self, *args, **kwargs):
+        is_new = self._state.adding
         super().save(*args, **kwargs)
 
+        # The starting balance is the first posting on the account's ledger
+        if is_new and self.opening_balance:
+            LedgerEntry.objects.create(
+                account=self,
+                date=self.as_of_date or timezone.now(),
+                amount=self.opening_balance,
+                entry_type='Opening',
+                note=f"Opening balance of {self.account_name}"
+            )
+
 
     def __str__(self):
         return f"{self.account_name} - opening_balance: {self.opening_balance or 'N/A'}, as_of_date: {self.as_of_date}"
@@ -103,6 +118,9 @@ class PaymentRecord(models.Model):
     
     class Meta:
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['payment_date'], name='payment_date_idx'),
+        ]
 
     def __str__(self):
         source_id = self.sale_id or self.purchase_id or self.servicebill_id
@@ -110,7 +128,73 @@ class PaymentRecord(models.Model):
 
 
 
-class Sale(models.Model):
+class LedgerEntry(models.Model):
+    """
+    One posting of money against a bank account, or against cash in hand
+    when ``account`` is empty.
+
+    Every path that changes a bank balance writes an entry here, so the
+    running balance of an account is the windowed sum of its entries.
+    """
+    ENTRY_TYPE_CHOICES = [
+        ('Opening', 'Opening Balance'),
+        ('Sale', 'Sale'),
+        ('Purchase', 'Purchase'),
+        ('Service', 'Service'),
+        ('Transfer', 'Transfer'),
+    ]
+
+    account = models.ForeignKey(Bankaccount, null=True, blank=True, on_delete=models.CASCADE, related_name='ledger_entries')
+    date = models.DateTimeField(default=timezone.now)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES)
+
+    sale = models.ForeignKey('Sale', null=True, blank=True, on_delete=models.SET_NULL, related_name='ledger_entries')
+    purchase = models.ForeignKey('Purchase', null=True, blank=True, on_delete=models.SET_NULL, related_name='ledger_entries')
+    servicebill = models.ForeignKey('ServiceBillItem', null=True, blank=True, on_delete=models.SET_NULL, related_name='ledger_entries')
+    payment_record = models.ForeignKey(PaymentRecord, null=True, blank=True, on_delete=models.SET_NULL, related_name='ledger_entries')
+    note = models.CharField(max_length=255, null=True, blank=True)
+
+    class Meta:
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['account', 'date'], name='ledger_account_date_idx'),
+        ]
+
+    def __str__(self):
+        account = self.account.account_name if self.account else 'Cash'
+        return f"{self.entry_type} ₹{self.amount} on {account} at {self.date:%Y-%m-%d %H:%M}"
+
+    @property
+    def record(self):
+        """The Sale, Purchase or ServiceBillItem this entry belongs to, if any."""
+        return self.sale or self.purchase or self.servicebill
+
+
+class DailySalesSummary(models.Model):
+    """
+    Number and total of the sales made on one day (in the site time zone).
+
+    Kept current by the Sale signals in transactions.signals, so the
+    dashboard chart reads one row per day instead of grouping every sale.
+    """
+    date = models.DateField(unique=True)
+    sale_count = models.PositiveIntegerField(default=0)
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.0'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date']
+        verbose_name_plural = "Daily sales summaries"
+
+    def __str__(self):
+        return f"{self.date}: {self.sale_count} sales, ₹{self.total_sales}"
+
+
+PAYMENT_FIELDS = ('amount_paid', 'bank_account', 'payment_type')
+
+
+class Sale(TrackedFieldsMixin, models.Model):
     """
     Represents a sale transaction involving a customer.
     """
@@ -196,41 +280,30 @@ class Sale(models.Model):
 
     class Meta:
         db_table = "sales"
+        indexes = [
+            models.Index(fields=['date_added'], name='sale_date_added_idx'),
+        ]
         verbose_name = "Sale"
         verbose_name_plural = "Sales"
 
-    def save(self, *args, **kwargs):
-        is_new = self._state.adding
-        old_instance = None
-
-        if not is_new:
-            old_instance = Sale.objects.get(pk=self.pk)
-
-        super().save(*args, **kwargs)
-
-        if self.payment_type == 'Bank' and self.bank_account:
-            bank = self.bank_account
+    tracked_fields = PAYMENT_FIELDS
 
-            # Revert old balance
-            if old_instance and old_instance.bank_account == bank:
-                bank.opening_balance -= Decimal(str(old_instance.amount_paid))
-
-            # Add new payment
-            bank.opening_balance += Decimal(str(self.amount_paid))
-            bank.save()
+    def save(self, *args, post_payment=True, **kwargs):
+        """
+        Save the sale and post its payment, or the change of its
+        payment, to its bank account (cash in hand unless paid by bank).
 
-            # Remove old transaction
-            if old_instance:
-                BankTransaction.objects.filter(sale=old_instance).delete()
+        Pass ``post_payment=False`` when the caller posted the payment
+        itself (``receive_payment``).
+        """
+        from .balances import post_record_payment
 
-            # Log transaction
-            BankTransaction.objects.create(
-                bank_account=bank,
-                sale=self,
-                transaction_type='credit',
-                amount=Decimal(str(self.amount_paid)),
-                note=f"Sale payment received (Sale ID: {self.id})"
-            )
+        is_new = self._state.adding
+        saved = {} if is_new else self.changed_fields()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if post_payment and (is_new or saved):
+                post_record_payment(self, 'Sale', saved)
 
 
 
@@ -251,19 +324,8 @@ class Sale(models.Model):
         return sum(detail.quantity for detail in self.saledetail_set.all())
     
     def get_item_descriptions_by_type(self):
-        grouped = {"PROCESSOR": [], "RAM": [], "HDD": [], "SSD": []}
-        for detail in self.saledetail_set.all():
-            if detail.description:
-                for part in detail.description.split("<br>"):
-                    if "PROCESSOR:" in part:
-                        grouped["PROCESSOR"].append(part.strip())
-                    elif "RAM:" in part:
-                        grouped["RAM"].append(part.strip())
-                    elif "HDD:" in part:
-                        grouped["HDD"].append(part.strip())
-                    elif "SSD:" in part:
-                        grouped["SSD"].append(part.strip())
-        return grouped
+        """Component lines of every detail, grouped by category (see component_snapshot)."""
+        return group_lines(self.saledetail_set.all())
     
 
     @property
@@ -304,8 +366,10 @@ class SaleDetail(models.Model):
         default=0.0
     )
 
-    # ✅ Add this field
+    # HTML description of lines sold before ``components`` was recorded
     description = models.TextField(blank=True, null=True)
+    # Components of the device at sale time (see component_snapshot)
+    components = models.JSONField(default=list, blank=True)
 
     sell_price = models.DecimalField(
         max_digits=10,
@@ -319,6 +383,10 @@ class SaleDetail(models.Model):
         verbose_name = "Sale Detail"
         verbose_name_plural = "Sale Details"
 
+    @property
+    def component_lines(self):
+        return component_lines(self.components)
+
     def __str__(self):
         """
         Returns a string representation of the SaleDetail instance.
@@ -365,6 +433,10 @@ class catogaryitempurchased(models.Model):
 
     class Meta:
         verbose_name_plural = 'category_itempurchased'
+        indexes = [
+            models.Index(fields=['serial_no', 'category'], name='catpur_serial_category_idx'),
+            models.Index(Upper('serial_no'), name='catpur_serial_upper_idx'),
+        ]
     
 
 
@@ -432,10 +504,14 @@ class Itempurchased(models.Model):
     class Meta:
         ordering = ['name']
         verbose_name_plural = 'Itemspurchased'
+        indexes = [
+            models.Index(fields=['serialno'], name='itempur_serialno_idx'),
+            models.Index(Upper('serialno'), name='itempur_serialno_upper_idx'),
+        ]
         
 
 
-class Purchase(models.Model):
+class Purchase(TrackedFieldsMixin, models.Model):
     """
     Represents a purchase transaction involving a customer.
     """
@@ -514,38 +590,24 @@ class Purchase(models.Model):
         verbose_name = "Purchase"
         verbose_name_plural = "purchases"
 
-    def save(self, *args, **kwargs):
-        is_new = self._state.adding
-        old_instance = None
-
-        if not is_new:
-            old_instance = Purchase.objects.get(pk=self.pk)
-
-        super().save(*args, **kwargs)
-
-        if self.payment_type == 'Bank' and self.bank_account:
-            bank = self.bank_account
+    tracked_fields = PAYMENT_FIELDS
 
-            # Revert old balance
-            if old_instance and old_instance.bank_account == bank:
-                bank.opening_balance -= Decimal(str(old_instance.amount_paid))
-
-            # Add new payment
-            bank.opening_balance += Decimal(str(self.amount_paid))
-            bank.save()
+    def save(self, *args, post_payment=True, **kwargs):
+        """
+        Save the purchase and post its payment, or the change of its
+        payment, to its bank account (cash in hand unless paid by bank).
 
-            # Remove old transaction
-            if old_instance:
-                BankTransaction.objects.filter(purchase=old_instance).delete()
+        Pass ``post_payment=False`` when the caller posted the payment
+        itself (``receive_payment_purchase``).
+        """
+        from .balances import post_record_payment
 
-            # Log transaction
-            BankTransaction.objects.create(
-                bank_account=bank,
-                purchase=self,
-                transaction_type='credit',
-                amount=Decimal(str(self.amount_paid)),
-                note=f"Purchase payment received (Purchase ID: {self.id})"
-            )
+        is_new = self._state.adding
+        saved = {} if is_new else self.changed_fields()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if post_payment and (is_new or saved):
+                post_record_payment(self, 'Purchase', saved)
 
 
 
@@ -566,19 +628,8 @@ class Purchase(models.Model):
         return sum(detail.quantity for detail in self.purchasedetail_set.all())
     
     def get_item_descriptions_by_type(self):
-        grouped = {"PROCESSOR": [], "RAM": [], "HDD": [], "SSD": []}
-        for detail in self.purchasedetail_set.all():
-            if detail.description:
-                for part in detail.description.split("<br>"):
-                    if "PROCESSOR:" in part:
-                        grouped["PROCESSOR"].append(part.strip())
-                    elif "RAM:" in part:
-                        grouped["RAM"].append(part.strip())
-                    elif "HDD:" in part:
-                        grouped["HDD"].append(part.strip())
-                    elif "SSD:" in part:
-                        grouped["SSD"].append(part.strip())
-        return grouped
+        """Component lines of every detail, grouped by category (see component_snapshot)."""
+        return group_lines(self.purchasedetail_set.all())
 
 
 
@@ -794,14 +845,20 @@ class PurchaseDetail(models.Model):
     quantity = models.PositiveIntegerField()
     total_detail = models.DecimalField(max_digits=10, decimal_places=2)
 
-    # ✅ Add this field
+    # HTML description of lines bought before ``components`` was recorded
     description = models.TextField(blank=True, null=True)
+    # Components of the device at purchase time (see component_snapshot)
+    components = models.JSONField(default=list, blank=True)
 
     class Meta:
         db_table = "purchase_details"
         verbose_name = "Purchase Detail"
         verbose_name_plural = "Purchase Details"
 
+    @property
+    def component_lines(self):
+        return component_lines(self.components)
+
     def __str__(self):
         """
         Returns a string representation of the SaleDetail instance.
@@ -848,6 +905,11 @@ class ServiceBillItem(models.Model):
         default=Decimal('0.0')
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date_created'], name='servicebill_date_created_idx'),
+        ]
+
     def __str__(self):
         """
         Returns a string representation of the SaleDetail instance.
@@ -0,0 +1,75 @@
+"""
+Sales rollup utility for Solv-IT application.
+
+This module maintains DailySalesSummary, one row per day with the number
+and total of that day's sales. A change to a sale re-aggregates only its
+own day (a date_added range scan on the sale_date_added_idx index), so
+the dashboard never has to group the whole Sale table.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySalesSummary, Sale
+
+
+def _day_range(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def sale_day(sale):
+    """The day a sale counts towards, in the site time zone."""
+    if sale.date_added is None:
+        return None
+    return timezone.localdate(sale.date_added) if timezone.is_aware(sale.date_added) else sale.date_added.date()
+
+
+def refresh_sales_days(days):
+    """Recompute the summary rows of the given days from the Sale table."""
+    for day in {day for day in days if day}:
+        start, end = _day_range(day)
+        totals = Sale.objects.filter(date_added__gte=start, date_added__lt=end).aggregate(
+            count=Count('id'), total=Sum('grand_total')
+        )
+        if totals['count']:
+            DailySalesSummary.objects.update_or_create(
+                date=day,
+                defaults={'sale_count': totals['count'], 'total_sales': totals['total'] or 0},
+            )
+        else:
+            DailySalesSummary.objects.filter(date=day).delete()
+
+
+def rebuild_sales_summary():
+    """Rebuild every summary row from scratch. Returns the number of days."""
+    days = (
+        Sale.objects.annotate(day=TruncDate('date_added'))
+        .values('day')
+        .annotate(count=Count('id'), total=Sum('grand_total'))
+        .order_by('day')
+    )
+    rows = [
+        DailySalesSummary(date=day['day'], sale_count=day['count'], total_sales=day['total'] or 0)
+        for day in days if day['day']
+    ]
+    DailySalesSummary.objects.all().delete()
+    DailySalesSummary.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def sales_series(days=90):
+    """(labels, values) of the daily sales totals for the last ``days`` days."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = DailySalesSummary.objects.filter(date__gte=since).values_list('date', 'total_sales')
+    return (
+        [date.strftime("%Y-%m-%d") for date, _ in rows],
+        [float(total) for _, total in rows],
+    )
+
+
+def total_sales_count():
+    return DailySalesSummary.objects.aggregate(total=Sum('sale_count'))['total'] or 0
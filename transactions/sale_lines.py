@@ -0,0 +1,114 @@
+"""
+Sale line utility for Solv-IT application.
+
+This module writes the line items of a new sale in a constant number of
+queries, whatever the size of the invoice:
+
+1. The sold Items are fetched and locked in one ``SELECT ... FOR UPDATE``
+   (in id order), so two tills selling the same unit queue up instead of
+   both seeing it in stock.
+2. The components of every sold serial are loaded in one
+   ``serial_no__in`` query for the lines' component snapshots.
+3. The SaleDetail rows are written with one ``bulk_create``.
+4. Stock is decremented with one conditional ``F('quantity') - n``
+   update; if any item would go negative nothing is decremented and
+   ``OutOfStock`` is raised, which rolls the sale back.
+
+Call ``sell_items`` inside the ``transaction.atomic()`` block that
+creates the Sale.
+"""
+
+import operator
+from collections import defaultdict
+from functools import reduce
+
+from django.db.models import Case, F, IntegerField, Q, When
+
+from store.component_utils import COMPONENT_CATEGORIES, ComponentLoader
+from store.models import Item
+from .component_snapshot import snapshot_components
+from .models import SaleDetail
+
+
+LINE_FIELDS = ["id", "price", "quantity", "total_item"]
+
+
+class OutOfStock(ValueError):
+    """An item of the sale has less stock than the sale needs."""
+
+
+def parse_lines(items):
+    """Validate the posted line items; returns them with an int id and quantity."""
+    if not isinstance(items, list):
+        raise ValueError("Items should be a list")
+    lines = []
+    for item in items:
+        if not all(k in item for k in LINE_FIELDS):
+            raise ValueError("Item is missing required fields")
+        line = {**item, "id": int(item["id"]), "quantity": int(item["quantity"])}
+        if line["quantity"] < 1:
+            raise ValueError("Item quantity must be at least 1")
+        lines.append(line)
+    return lines
+
+
+def device_components(loader, serial):
+    return [component for category in COMPONENT_CATEGORIES for component in loader.get(serial, category)]
+
+
+def sell_items(sale, items):
+    """
+    Write the SaleDetail rows of ``sale`` and take the sold quantities out
+    of stock.
+
+    Raises:
+        ValueError: A line item is malformed.
+        Item.DoesNotExist: A line item names an unknown item.
+        OutOfStock: An item has less stock than the sale needs.
+    """
+    lines = parse_lines(items)
+    if not lines:
+        return
+    sold = defaultdict(int)
+    for line in lines:
+        sold[line["id"]] += line["quantity"]
+
+    stock = {
+        item.pk: item
+        for item in Item.objects.select_for_update()
+        .filter(pk__in=sold)
+        .order_by('pk')
+        .only('pk', 'name', 'serialno', 'quantity')
+    }
+    missing = set(sold) - set(stock)
+    if missing:
+        raise Item.DoesNotExist(f"Item does not exist: {', '.join(map(str, sorted(missing)))}")
+    for pk, quantity in sold.items():
+        if (stock[pk].quantity or 0) < quantity:
+            raise OutOfStock(f"Not enough stock for item: {stock[pk].name}")
+
+    loader = ComponentLoader([item.serialno for item in stock.values()])
+    SaleDetail.objects.bulk_create([
+        SaleDetail(
+            sale=sale,
+            item=stock[line["id"]],
+            quantity=line["quantity"],
+            price=float(line["price"]),
+            sell_price=float(line["sell_price"]),
+            total_detail=float(line["total_item"]),
+            discount_amount=float(line.get("discount_amount", 0.0)),
+            gst_amount=float(line.get("gst_amount", 0.0)),
+            components=snapshot_components(device_components(loader, stock[line["id"]].serialno)),
+        )
+        for line in lines
+    ])
+
+    # Checked above on the locked rows; the condition is the guard that
+    # keeps a quantity from ever going negative
+    in_stock = reduce(operator.or_, [Q(pk=pk, quantity__gte=quantity) for pk, quantity in sold.items()])
+    updated = Item.objects.filter(in_stock).update(quantity=Case(
+        *[When(pk=pk, then=F('quantity') - quantity) for pk, quantity in sold.items()],
+        output_field=IntegerField(),
+    ))
+    if updated != len(sold):
+        raise OutOfStock("Stock changed while the sale was being saved, please try again")
@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
 
-from .models import Purchase
+from accounts.models import Customer, Vendor
+from .lookups import invalidate_lookup
+from .models import Purchase, Sale
+from .rollups import refresh_sales_days, sale_day
 
 
 # @receiver(post_save, sender=Purchase)
@@ -12,3 +15,37 @@ from .models import Purchase
 #     if created:
 #         instance.item.quantity += instance.quantity
 #         instance.item.save()
+
+
+@receiver(post_init, sender=Sale)
+def remember_sale_day(sender, instance, **kwargs):
+    if 'date_added' in instance.__dict__:
+        instance._summary_day = sale_day(instance)
+
+
+@receiver(post_save, sender=Sale)
+def update_daily_sales_summary(sender, instance, raw=False, **kwargs):
+    """Re-aggregate the day of a saved sale (and its old day, if it moved)."""
+    if raw:
+        return
+    refresh_sales_days([getattr(instance, '_summary_day', None), sale_day(instance)])
+    instance._summary_day = sale_day(instance)
+
+
+@receiver(post_delete, sender=Sale)
+def remove_from_daily_sales_summary(sender, instance, **kwargs):
+    refresh_sales_days([getattr(instance, '_summary_day', None), sale_day(instance)])
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def refresh_customer_lookup(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_lookup('customer')
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def refresh_vendor_lookup(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_lookup('vendor')
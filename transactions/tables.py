@@ -1,6 +1,7 @@
 import django_tables2 as tables
 from .models import Sale, Purchase, Bankaccount, catogaryitempurchased, Itempurchased
 from store.models import catogaryitem, Item
+from store.component_utils import ComponentLoader, get_table_serials
 
 
 class PurchasedItemTable(tables.Table):
@@ -13,39 +14,44 @@ class PurchasedItemTable(tables.Table):
     ssd = tables.Column(empty_values=(), verbose_name='SSD')
     ssd_qty = tables.Column(empty_values=(), verbose_name='Ssd_Qty')
 
-    def get_cat_items(self, record):
-        return catogaryitem.objects.filter(serial_no=record.serialno)
+    def get_component_loader(self):
+        if getattr(self, '_component_loader', None) is None:
+            self._component_loader = ComponentLoader(get_table_serials(self))
+        return self._component_loader
+
+    def get_cat_items(self, record, category):
+        return self.get_component_loader().get(record.serialno, category)
 
     def render_processor(self, record):
-        items = self.get_cat_items(record).filter(category='processor')
+        items = self.get_cat_items(record, 'processor')
         return ", ".join(f"{item.name}" for item in items) if items else "-"
 
     def render_processor_qty(self, record):
-        items = self.get_cat_items(record).filter(category='processor')
+        items = self.get_cat_items(record, 'processor')
         return ", ".join(str(item.quantity) for item in items) if items else "-"
 
     def render_ram(self, record):
-        items = self.get_cat_items(record).filter(category='ram')
+        items = self.get_cat_items(record, 'ram')
         return ", ".join(f"{item.name}" for item in items) if items else "-"
 
     def render_ram_qty(self, record):
-        items = self.get_cat_items(record).filter(category='ram')
+        items = self.get_cat_items(record, 'ram')
         return ", ".join(str(item.quantity) for item in items) if items else "-"
 
     def render_hdd(self, record):
-        items = self.get_cat_items(record).filter(category='hdd')
+        items = self.get_cat_items(record, 'hdd')
         return ", ".join(f"{item.name}" for item in items) if items else "-"
 
     def render_hdd_qty(self, record):
-        items = self.get_cat_items(record).filter(category='hdd')
+        items = self.get_cat_items(record, 'hdd')
         return ", ".join(str(item.quantity) for item in items) if items else "-"
 
     def render_ssd(self, record):
-        items = self.get_cat_items(record).filter(category='ssd')
+        items = self.get_cat_items(record, 'ssd')
         return ", ".join(f"{item.name}" for item in items) if items else "-"
 
     def render_ssd_qty(self, record):
-        items = self.get_cat_items(record).filter(category='ssd')
+        items = self.get_cat_items(record, 'ssd')
         return ", ".join(str(item.quantity) for item in items) if items else "-"
 
 
@@ -1,3 +1,134 @@
-from django.test import TestCase
+import random
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connections
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+
+from .balances import InsufficientBalance, post_balance, transfer
+from .models import Bankaccount, LedgerEntry
+
+
+def run_threads(count, work):
+    """Run ``work(index)`` in ``count`` threads at once; returns their errors."""
+    errors = []
+    start = threading.Barrier(count)
+
+    def worker(index):
+        try:
+            start.wait()
+            work(index)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def ledger_total(account):
+    # SQLite sums decimals as floats; the amounts are whole cents
+    total = LedgerEntry.objects.filter(account=account).aggregate(total=Sum('amount'))['total']
+    return total.quantize(Decimal('0.01'))
+
+
+class BalancePostingTests(TestCase):
+
+    def setUp(self):
+        self.till = Bankaccount.objects.create(account_name='Till', opening_balance=Decimal('100.00'))
+        self.reserve = Bankaccount.objects.create(account_name='Reserve', opening_balance=Decimal('0.00'))
+
+    def test_post_balance_adds_delta_and_ledger_entry(self):
+        entry = post_balance(self.till, Decimal('25.50'), 'Sale', 'Payment')
+
+        self.till.refresh_from_db()
+        self.assertEqual(self.till.opening_balance, Decimal('125.50'))
+        self.assertEqual(entry.amount, Decimal('25.50'))
+        self.assertEqual(ledger_total(self.till), self.till.opening_balance)
+
+    def test_cash_posting_only_writes_ledger(self):
+        post_balance(None, Decimal('10.00'), 'Service', 'Cash payment')
+
+        self.assertEqual(LedgerEntry.objects.filter(account__isnull=True).count(), 1)
+
+    def test_overdrawing_debit_is_rejected(self):
+        with self.assertRaises(InsufficientBalance):
+            post_balance(self.till, Decimal('-100.01'), 'Transfer', 'Too much', overdraft=False)
+
+        self.till.refresh_from_db()
+        self.assertEqual(self.till.opening_balance, Decimal('100.00'))
+        self.assertEqual(ledger_total(self.till), Decimal('100.00'))
+
+    def test_debit_may_overdraw_when_allowed(self):
+        post_balance(self.till, Decimal('-150.00'), 'Purchase', 'Refund')
+
+        self.till.refresh_from_db()
+        self.assertEqual(self.till.opening_balance, Decimal('-50.00'))
+
+    def test_missing_account_is_reported(self):
+        with self.assertRaises(Bankaccount.DoesNotExist):
+            post_balance(self.reserve.pk + 100, Decimal('1.00'), 'Sale', 'Nowhere')
+
+    def test_transfer_moves_money_and_posts_both_legs(self):
+        transfer(self.till, self.reserve, Decimal('40.00'), 'Move')
+
+        self.till.refresh_from_db()
+        self.reserve.refresh_from_db()
+        self.assertEqual(self.till.opening_balance, Decimal('60.00'))
+        self.assertEqual(self.reserve.opening_balance, Decimal('40.00'))
+        self.assertEqual(LedgerEntry.objects.filter(entry_type='Transfer').count(), 2)
+
+    def test_overdrawing_transfer_changes_nothing(self):
+        with self.assertRaises(InsufficientBalance):
+            transfer(self.till, self.reserve, Decimal('100.01'), 'Too much')
+
+        self.till.refresh_from_db()
+        self.reserve.refresh_from_db()
+        self.assertEqual(self.till.opening_balance, Decimal('100.00'))
+        self.assertEqual(self.reserve.opening_balance, Decimal('0.00'))
+        self.assertFalse(LedgerEntry.objects.filter(entry_type='Transfer').exists())
+
+
+class ConcurrentBalancePostingTests(TransactionTestCase):
+    """Many threads posting to the same accounts must not lose an update."""
+
+    THREADS = 6
+    POSTINGS = 25
+
+    def test_concurrent_postings_lose_no_update(self):
+        till = Bankaccount.objects.create(account_name='Till', opening_balance=Decimal('1000.00'))
+        reserve = Bankaccount.objects.create(account_name='Reserve', opening_balance=Decimal('1000.00'))
+        rng = random.Random(42)
+        amounts = [
+            [Decimal(rng.randint(1, 50000)) / 100 for _ in range(self.POSTINGS)]
+            for _ in range(self.THREADS)
+        ]
+
+        def work(index):
+            thread_rng = random.Random(index)
+            for amount in amounts[index]:
+                post_balance(till, amount, 'Sale', 'Payment')
+                # Opposite transfers of the same two rows, some of them overdrawing
+                source, destination = (till, reserve) if thread_rng.random() < 0.5 else (reserve, till)
+                try:
+                    transfer(source, destination, Decimal(thread_rng.randint(1, 200000)) / 100, 'Transfer')
+                except InsufficientBalance:
+                    pass
+
+        errors = run_threads(self.THREADS, work)
+
+        self.assertEqual(errors, [])
+        till.refresh_from_db()
+        reserve.refresh_from_db()
+        posted = sum(sum(thread) for thread in amounts)
+        self.assertEqual(till.opening_balance + reserve.opening_balance, Decimal('2000.00') + posted)
+        self.assertEqual(ledger_total(till), till.opening_balance)
+        self.assertEqual(ledger_total(reserve), reserve.opening_balance)
+        self.assertGreaterEqual(till.opening_balance, 0)
+        self.assertGreaterEqual(reserve.opening_balance, 0)
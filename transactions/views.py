@@ -1,3 +1,4 @@
+from django.db import transaction
 from django.views.decorators.http import require_POST
 from .models import ServiceBillItem
 
@@ -6,13 +7,15 @@ from .models import ServiceBillItem
 
 # Receive payment for ServiceBillItem
 @require_POST
+@transaction.atomic
 def receive_payment_service(request):
     from .forms import PaymentForm
     from django.shortcuts import get_object_or_404, redirect
     from django.contrib import messages
     form = PaymentForm(request.POST)
     if form.is_valid():
-        servicebill = get_object_or_404(ServiceBillItem, id=form.cleaned_data['servicebill_id'])
+        # Locked until the payment is saved, so two payments of one bill both count
+        servicebill = get_object_or_404(ServiceBillItem.objects.select_for_update(), id=form.cleaned_data['servicebill_id'])
         received = form.cleaned_data['amount_received']
         bank_account_id = request.POST.get('bank_account')
         payment_mode = request.POST.get('payment_mode', 'Cash')
@@ -30,31 +33,28 @@ def receive_payment_service(request):
         
         # Store the existing/source bank account before updating
         source_bank_account = servicebill.bank_account
+        # Account whose balance is credited (None means cash in hand)
+        credited_account = None
         
         # Determine receiving bank account based on payment mode
         if payment_mode == 'Online' and bank_account_id:
             # Online mode: use selected bank account
             try:
-                from decimal import Decimal
                 bank_account = Bankaccount.objects.get(id=int(bank_account_id))
-                bank_account.opening_balance += Decimal(str(received))
-                bank_account.save()
                 servicebill.bank_account = bank_account
                 receiving_bank_account = bank_account
+                credited_account = bank_account
             except (Bankaccount.DoesNotExist, ValueError):
                 messages.warning(request, "Bank account not found or invalid.")
                 receiving_bank_account = source_bank_account
         else:
             # Cash mode: use existing/source account
             receiving_bank_account = source_bank_account
-            if source_bank_account:
-                from decimal import Decimal
-                source_bank_account.opening_balance += Decimal(str(received))
-                source_bank_account.save()
+            credited_account = source_bank_account
         
         # ✅ Record payment history
         
-        PaymentRecord.objects.create(
+        payment_record = PaymentRecord.objects.create(
             servicebill=servicebill,
             source_bank_account=None if payment_mode == 'Cash' else source_bank_account,
             receiving_bank_account= None if payment_mode == 'Cash' else receiving_bank_account,
@@ -63,6 +63,14 @@ def receive_payment_service(request):
             payment_mode=payment_mode,
             transaction_id=transaction_id if transaction_id else None
         )
+        post_balance(
+            credited_account,
+            received,
+            'Service',
+            f"Payment received for service bill #{servicebill.id}",
+            servicebill=servicebill,
+            payment_record=payment_record,
+        )
         
         servicebill.save()
         messages.success(request, f"Payment of ₹{received:.2f} received for service bill #{servicebill.id}.")
@@ -97,6 +105,8 @@ from django.shortcuts import render
 
     
 # Standard library imports
+from collections import defaultdict
+from decimal import Decimal
 from functools import reduce
 import json
 import logging
@@ -108,6 +118,7 @@ from django.urls import reverse, reverse_lazy
 from django.shortcuts import render
 from django.db import transaction
 from django.core.paginator import Paginator
+from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 import django_tables2 as tables
 from django_tables2.export.views import ExportMixin
@@ -124,15 +135,15 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 
 # Third-party packages
 from django_tables2 import SingleTableView
-from openpyxl import Workbook
-from openpyxl.styles import Alignment
 
 # Local app imports
 from store.models import Item
 from accounts.models import Customer, Vendor
 from transactions.tables import PurchasedItemTable
-from .models import PurchaseDetail, Sale, Purchase, SaleDetail, Bankaccount, Itempurchased, catogaryitempurchased, ServiceBillItem
+from .models import PurchaseDetail, Sale, Purchase, SaleDetail, Bankaccount, Itempurchased, catogaryitempurchased, ServiceBillItem, LedgerEntry
 from .forms import BankForm
+from .balances import InsufficientBalance, post_balance, transfer
+from .exports import BankExport, PurchaseExport, SaleExport, export_response
 from store.forms import ItemForm
 from store.models import catogaryitem 
 from django.db.models import Q
@@ -145,180 +156,15 @@ def is_ajax(request):
     return request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest'
 
 def export_bank_to_excel(request):
-    # Create a workbook and select the active worksheet.
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = 'Bank Details'
-
-    # Define the column headers
-    columns = [
-        'ID', 'Account Name', 'Opening Balance', 'As Of Date'
-    ]
-    worksheet.append(columns)
-
-    # Fetch sales data
-    banks = Bankaccount.objects.all()
-
-    for bank in banks:
-        # Convert timezone-aware datetime to naive datetime
-        if bank.as_of_date.tzinfo is not None:
-            as_of_date = bank.as_of_date.replace(tzinfo=None)
-        else:
-            as_of_date = bank.as_of_date
-
-        worksheet.append([
-            bank.id,
-            bank.account_name,
-            bank.opening_balance,
-            as_of_date
-        ])
-
-    # Set up the response to send the file
-    response = HttpResponse(
-        content_type=(
-            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-    )
-    response['Content-Disposition'] = 'attachment; filename=Bank Details.xlsx'
-    workbook.save(response)
-
-    return response
-
+    return export_response(request, BankExport())
 
-from openpyxl import Workbook
-from django.http import HttpResponse
-from .models import Sale  # Adjust if needed
-import datetime
 
 def export_sales_to_excel(request):
-    # Create a workbook and sheet
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = 'Sales'
-
-    # Define headers (added 'Item Descriptions')
-    columns = [
-        'INV no', 'Date', 'Customer', 'Sub Total',
-        'Grand Total', 'Tax Amount', 'Tax Percentage',
-        'Amount Paid', 'Amount Change', 'Item Descriptions'
-    ]
-    worksheet.append(columns)
-
-    # Fetch all sales
-    sales = Sale.objects.all()
-
-    for sale in sales:
-        # Handle datetime conversion
-        date_added = sale.date_added.replace(tzinfo=None) if sale.date_added.tzinfo else sale.date_added
-
-        # Generate item descriptions
-        items = sale.get_item_descriptions_by_type()
-        description_lines = []
-
-        for category in ['PROCESSOR', 'RAM', 'HDD', 'SSD']:
-            category_items = items.get(category, [])
-            for line in category_items:
-                description_lines.append(line.strip())
-
-        description_text = "\n".join(description_lines)  # Line-by-line text
-
-        # Add row data
-        row_data = [
-            'INV'+ str(sale.id),
-            date_added,
-            sale.customer.phone,
-            sale.sub_total,
-            sale.grand_total,
-            sale.tax_amount,
-            sale.tax_percentage,
-            sale.amount_paid,
-            sale.amount_change,
-            description_text
-        ]
-
-        worksheet.append(row_data)
-
-        # Apply wrap text to the "Item Descriptions" column
-        description_cell = worksheet.cell(row=worksheet.max_row, column=10)
-        description_cell.alignment = Alignment(wrap_text=True)
-
-    # Adjust column widths (optional)
-    for col in worksheet.columns:
-        max_length = max((len(str(cell.value)) if cell.value else 0) for cell in col)
-        worksheet.column_dimensions[col[0].column_letter].width = min(max_length + 2, 50)
-
-    # Prepare response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename=sales.xlsx'
-    workbook.save(response)
-    return response
+    return export_response(request, SaleExport())
+
 
 def export_purchases_to_excel(request):
-    # Create a workbook and sheet
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = 'purchases'
-
-    # Define headers (added 'Item Descriptions')
-    columns = [
-        'INV no', 'Date', 'Vendor', 'Sub Total',
-        'Grand Total', 'Tax Amount', 'Tax Percentage',
-        'Amount Paid', 'Amount Change', 'Item Descriptions'
-    ]
-    worksheet.append(columns)
-
-    # Fetch all sales
-    purchses = Purchase.objects.all()
-
-    for purchse in purchses:
-        # Handle datetime conversion
-        date_added = purchse.date_added.replace(tzinfo=None) if purchse.date_added.tzinfo else purchse.date_added
-
-        # Generate item descriptions
-        items = purchse.get_item_descriptions_by_type()
-        description_lines = []
-
-        for category in ['PROCESSOR', 'RAM', 'HDD', 'SSD']:
-            category_items = items.get(category, [])
-            for line in category_items:
-                description_lines.append(line.strip())
-
-        description_text = "\n".join(description_lines)  # Line-by-line text
-
-        # Add row data
-        row_data = [
-            'INV'+ str(purchse.id),
-            date_added,
-            purchse.vendor.name,
-            purchse.sub_total,
-            purchse.grand_total,
-            purchse.tax_amount,
-            purchse.tax_percentage,
-            purchse.amount_paid,
-            purchse.amount_change,
-            description_text
-        ]
-
-        worksheet.append(row_data)
-
-        # Apply wrap text to the "Item Descriptions" column
-        description_cell = worksheet.cell(row=worksheet.max_row, column=10)
-        description_cell.alignment = Alignment(wrap_text=True)
-
-    # Adjust column widths (optional)
-    for col in worksheet.columns:
-        max_length = max((len(str(cell.value)) if cell.value else 0) for cell in col)
-        worksheet.column_dimensions[col[0].column_letter].width = min(max_length + 2, 50)
-
-    # Prepare response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename=purchases.xlsx'
-    workbook.save(response)
-    return response
+    return export_response(request, PurchaseExport())
 
 
 class ServiceCreateView(View):
@@ -329,6 +175,7 @@ class ServiceCreateView(View):
         }
         return render(request, 'transactions/service_create.html', context)
 
+    @method_decorator(transaction.atomic)
     def post(self, request, *args, **kwargs):
         data = request.POST
         customer_id = data.get("customer_id")
@@ -375,11 +222,15 @@ class ServiceCreateView(View):
             )
             servicebill_items.append(sb)
 
-        # Optionally, update bank balance if payment_type is Bank
-        from decimal import Decimal
-        if payment_type == "Bank" and bank_account_obj and amount_paid:
-            bank_account_obj.opening_balance += Decimal(str(amount_paid))
-            bank_account_obj.save()
+        # Bank payments are credited to the bank account, the rest to cash in hand
+        if servicebill_items and amount_paid:
+            post_balance(
+                bank_account_obj if payment_type == "Bank" else None,
+                amount_paid,
+                'Service',
+                f"Service bill payment posted (Service ID: {servicebill_items[0].id})",
+                servicebill=servicebill_items[0],
+            )
 
         if servicebill_items:
             redirect_url = f"/transactions/servicebill/{servicebill_items[0].pk}/invoice/"
@@ -393,18 +244,25 @@ from django.views.generic import ListView
 from .models import Sale, ServiceBillItem
 
 from django.views.generic import ListView
-from django.db.models import Q
+from django.db.models import CharField, F, Q, Value
 from .models import Sale, ServiceBillItem
 
 class SaleListView(ListView):
+    """
+    Combined listing of Sales and ServiceBillItems, newest first.
+
+    The listing is one ``UNION ALL`` of (id, kind, sort_date) keys ordered
+    and paginated in SQL; only the rows on the visible page are then
+    loaded with their customers and sale details.
+    """
     template_name = 'transactions/sales_list.html'
     context_object_name = 'combined_list'
     paginate_by = 10
 
     def get_queryset(self):
         # Get all Sales and ServiceBillItems
-        sales_qs = Sale.objects.select_related('customer').prefetch_related('saledetail_set__item')
-        service_qs = ServiceBillItem.objects.select_related('customer')
+        sales_qs = Sale.objects.all()
+        service_qs = ServiceBillItem.objects.all()
 
         # Get search filters
         status_filter = self.request.GET.get('status', '')
@@ -430,7 +288,10 @@ class SaleListView(ListView):
                 sales_qs = sales_qs.none()
 
         if serial_filter:
-            sales_qs = sales_qs.filter(saledetail_set__item__serialno__icontains=serial_filter)
+            # Subquery instead of a join so a sale matching several details is listed once
+            sales_qs = sales_qs.filter(id__in=SaleDetail.objects.filter(
+                item__serialno__icontains=serial_filter
+            ).values('sale_id'))
 
         if mobileno_filter:
             sales_qs = sales_qs.filter(customer__phone__icontains=mobileno_filter)
@@ -463,25 +324,48 @@ class SaleListView(ListView):
         if end_date:
             service_qs = service_qs.filter(date_created__date__lte=end_date)
 
+        # Both sides select the same (id, kind, sort_date) columns so they can be unioned
+        sales_keys = sales_qs.order_by().annotate(
+            kind=Value('Sale', output_field=CharField()),
+            sort_date=F('date_added'),
+        ).values_list('id', 'kind', 'sort_date')
+        service_keys = service_qs.order_by().annotate(
+            kind=Value('Service', output_field=CharField()),
+            sort_date=F('date_created'),
+        ).values_list('id', 'kind', 'sort_date')
+
         servies1 =  self.request.GET.get('status', '')
         if servies1 == 'Service':
-            combined_list = list(service_qs)
+            combined_keys = service_keys
         elif servies1 == '':
-            combined_list = list(sales_qs) + list(service_qs)
+            combined_keys = sales_keys.union(service_keys, all=True)
         else:
-            combined_list = list(sales_qs)
+            combined_keys = sales_keys
+
+        return combined_keys.order_by('-sort_date', '-id')
 
-        # Sort combined list by date_created (Sales might have date_added)
-        def get_date(obj):
-            if hasattr(obj, 'date_created') and obj.date_created:
-                return obj.date_created
-            elif hasattr(obj, 'date_added') and obj.date_added:
-                return obj.date_added
-            return None
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, keys, is_paginated = super().paginate_queryset(queryset, page_size)
+        page.object_list = self.load_records(keys)
+        return paginator, page, page.object_list, is_paginated
 
-        combined_list.sort(key=get_date, reverse=True)
+    def load_records(self, keys):
+        """Turn one page of (id, kind, sort_date) keys into model instances, in order."""
+        keys = list(keys)
+        sale_ids = [pk for pk, kind, _ in keys if kind == 'Sale']
+        service_ids = [pk for pk, kind, _ in keys if kind == 'Service']
 
-        return combined_list
+        records = {}
+        if sale_ids:
+            sales = Sale.objects.select_related('customer').prefetch_related(
+                'saledetail_set__item'
+            ).in_bulk(sale_ids)
+            records.update((('Sale', pk), sale) for pk, sale in sales.items())
+        if service_ids:
+            services = ServiceBillItem.objects.select_related('customer').in_bulk(service_ids)
+            records.update((('Service', pk), service) for pk, service in services.items())
+
+        return [records[(kind, pk)] for pk, kind, _ in keys if (kind, pk) in records]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -489,14 +373,7 @@ class SaleListView(ListView):
         context['inv_filter'] = self.request.GET.get('inv', '')
         context['serial_filter'] = self.request.GET.get('serial', '')
         context['mobileno_filter'] = self.request.GET.get('mobileno', '')
-        # Manual pagination
-        page = self.request.GET.get('page', 1)
-        paginator = Paginator(self.get_queryset(), self.paginate_by)
-        paged_records = paginator.get_page(page)
-        context['sales'] = paged_records
-        context['is_paginated'] = paged_records.has_other_pages()
-        context['page_obj'] = paged_records
-        context['paginator'] = paginator
+        context['sales'] = context['page_obj']
         return context
 
 
@@ -539,18 +416,14 @@ from django.db import transaction
 import json
 import logging
 from .models import Customer, Item, Sale, SaleDetail
+from .sale_lines import sell_items
+from .lookups import lookup_page, page_number
+from .component_snapshot import snapshot_components
 
 logger = logging.getLogger(__name__)
 
 
 def SaleCreateView(request):
-    context = {
-        "active_icon": "sales",
-        "customers": [c.to_select2() for c in Customer.objects.all()],
-        "items": [d.to_select3() for d in Item.objects.all()],
-        "bank_accounts": Bankaccount.objects.all()
-    }
-
     if request.method == 'POST' and is_ajax(request=request):
         try:
             data = json.loads(request.body)
@@ -607,58 +480,8 @@ def SaleCreateView(request):
                 new_sale = Sale.objects.create(**sale_attributes)
                 logger.info(f"Sale created: {new_sale}")
 
-                # ✅ Process each item
-                items = data["items"]
-                if not isinstance(items, list):
-                    raise ValueError("Items should be a list")
-
-                for item in items:
-                    if not all(k in item for k in ["id", "price", "quantity", "total_item"]):
-                        raise ValueError("Item is missing required fields")
-
-                    item_instance = Item.objects.get(id=int(item["id"]))
-
-                    if item_instance.quantity < int(item["quantity"]):
-                        raise ValueError(f"Not enough stock for item: {item_instance.name}")
-
-                    # ✅ Auto-generate description
-                    components = catogaryitem.objects.filter(serial_no=item_instance.serialno)
-                    grouped = {
-                        'processor': [],
-                        'ram': [],
-                        'hdd': [],
-                        'ssd': []
-                    }
-
-                    for comp in components:
-                        grouped[comp.category].append(f"{comp.name} X({comp.quantity})")
-
-                    description = ""
-                    for cat in ['processor', 'ram', 'hdd', 'ssd']:
-                        if grouped[cat]:
-                            category_display = cat.upper()
-                            values = ", ".join(grouped[cat])
-                            description += f"{category_display}: {values}<br>"
-
-                    # ✅ Create SaleDetail with generated description
-                    SaleDetail.objects.create(
-                        sale=new_sale,
-                        item=item_instance,
-                        quantity=int(item["quantity"]),
-                        price=float(item["price"]),
-                        sell_price=float(item["sell_price"]),
-                        total_detail=float(item["total_item"]),
-                        discount_amount=float(item.get("discount_amount", 0.0)),
-                        gst_amount=float(item.get("gst_amount", 0.0)),
-                        description=description  # Auto-generated HTML
-                    )
-
-                    # ✅ Update stock
-                    item_instance.quantity -= int(item["quantity"])
-                    item_instance.save()
-
-                
-                
+                # ✅ Lock the items, write every line and take them out of stock
+                sell_items(new_sale, data["items"])
 
             return JsonResponse({
                 'status': 'success',
@@ -680,6 +503,11 @@ def SaleCreateView(request):
             logger.error(f"Exception during sale creation: {e}")
             return JsonResponse({'status': 'error', 'message': f'There was an error during the creation: {str(e)}'}, status=500)
 
+    # Customers and items are looked up by the pickers as the user types
+    context = {
+        "active_icon": "sales",
+        "bank_accounts": Bankaccount.objects.all()
+    }
     return render(request, "transactions/sale_create.html", context=context)
 
 
@@ -882,13 +710,6 @@ def PurchaseCreateListView(request):
     # context_object_name = "Itempurchased"
     # paginate_by = 10
 
-    context = {
-        "active_icon": "purchases",
-        "vendors": [c.to_select2() for c in Vendor.objects.all()],
-        "items": [d.to_select3() for d in Itempurchased.objects.all()],
-        "bank_accounts": Bankaccount.objects.all()
-    }
-
     if request.method == 'POST' and is_ajax(request=request):
         
         try:
@@ -950,6 +771,13 @@ def PurchaseCreateListView(request):
                 if not isinstance(items, list):
                     raise ValueError("Items should be a list")
 
+                # Components of every posted item, in one query
+                item_ids = [int(item["id"]) for item in items if "id" in item]
+                serials = Itempurchased.objects.filter(id__in=item_ids).values_list('serialno', flat=True)
+                components_by_serial = defaultdict(list)
+                for comp in catogaryitempurchased.objects.filter(serial_no__in=serials):
+                    components_by_serial[comp.serial_no].append(comp)
+
                 for item in items:
                     if not all(k in item for k in ["id", "price", "quantity", "total_item"]):
                         raise ValueError("Item is missing required fields")
@@ -960,33 +788,14 @@ def PurchaseCreateListView(request):
                     if item_instance.quantity < int(item["quantity"]):
                         raise ValueError(f"Not enough stock for item: {item_instance.name}")
 
-                    # ✅ Auto-generate description
-                    components = catogaryitempurchased.objects.filter(serial_no=item_instance.serialno)
-                    grouped = {
-                        'processor': [],
-                        'ram': [],
-                        'hdd': [],
-                        'ssd': []
-                    }
-
-                    for comp in components:
-                        grouped[comp.category].append(f"{comp.name} X({comp.quantity})")
-
-                    description = ""
-                    for cat in ['processor', 'ram', 'hdd', 'ssd']:
-                        if grouped[cat]:
-                            category_display = cat.upper()
-                            values = ", ".join(grouped[cat])
-                            description += f"{category_display}: {values} ({comp.serial_no})<br>"
-
-                    # ✅ Create SaleDetail with generated description
+                    # ✅ Create PurchaseDetail with the device's components
                     PurchaseDetail.objects.create(
                         purchase=new_sale,
                         item=item_instance,
                         quantity=int(item["quantity"]),
                         price=float(item["price"]),
                         total_detail=float(item["total_item"]),
-                        description=description  # Auto-generated HTML
+                        components=snapshot_components(components_by_serial[item_instance.serialno]),
                     )
 
                     # ✅ Update stock
@@ -1016,6 +825,11 @@ def PurchaseCreateListView(request):
             logger.error(f"Exception during sale creation: {e}")
             return JsonResponse({'status': 'error', 'message': f'There was an error during the creation: {str(e)}'}, status=500)
 
+    # Vendors and items are looked up by the pickers as the user types
+    context = {
+        "active_icon": "purchases",
+        "bank_accounts": Bankaccount.objects.all()
+    }
     return render(request, "transactions/purchased_create.html", context=context)
 
 
@@ -1109,6 +923,7 @@ class PurchaseDetailView(LoginRequiredMixin, DetailView):
 
 
 from operator import and_
+from store.search import search_queryset
 
 class PurchaseItemSearchListView(PurchaseListView):
     """
@@ -1135,13 +950,7 @@ class PurchaseItemSearchListView(PurchaseListView):
         #     return result.none()
         
         if query:
-            print('uyuyu')
-            query_list = query.split()
-            result = result.filter(
-                reduce(
-                    operator.and_, (Q(name__icontains=q) | Q(serialno__icontains=q) | Q(make_and_models__icontains=q) for q in query_list)
-                )
-            )
+            result = search_queryset(result, query)
 
         if customer:
             query_list = customer.split()
@@ -1344,95 +1153,71 @@ class BankDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         """
         return self.request.user.is_superuser
     
-from itertools import chain
-from operator import attrgetter
-
 class cashbankListView(LoginRequiredMixin, ListView):
+    """
+    Bank and cash ledger, paged straight from LedgerEntry.
+
+    The running balance of each account is computed in the database with a
+    window over its entries, so only the requested page is loaded and the
+    linked Sale/Purchase/Service rows are fetched for that page only.
+    """
 
     template_name = "transactions/bank_acc.html"
     paginate_by = 10
     context_object_name = "transactions"
 
     def get_queryset(self):
-        # Not used, but required by ListView
-        return Bankaccount.objects.none()
+        from django.db.models import Sum, Window
+
+        entries = LedgerEntry.objects.select_related(
+            'account', 'sale__customer', 'purchase__vendor', 'servicebill__customer'
+        ).annotate(
+            running_balance=Window(
+                expression=Sum('amount'),
+                partition_by=[F('account')],
+                order_by=[F('date').asc(), F('id').asc()],
+            )
+        ).order_by('-date', '-id')
+
+        account_id = self.request.GET.get('account_id')
+        if account_id:
+            entries = entries.filter(account_id=account_id)
+        return entries
 
     def get_context_data(self, **kwargs):
-        # Import models at the start of the method
-        from django.db.models import Prefetch, Q
-        from .models import Sale, Purchase, ServiceBillItem, Bankaccount, PaymentRecord
-        
+        from django.db.models import Prefetch, prefetch_related_objects
+        from .models import PaymentRecord
+
         context = super().get_context_data(**kwargs)
 
         # Provide all bank accounts for sidebar
         context['all_bankaccounts'] = Bankaccount.objects.all().order_by('id')
 
         account_id = self.request.GET.get('account_id')
-        
-        # Get the selected account object if account_id is provided
-        selected_account = None
         if account_id:
             try:
-                selected_account = Bankaccount.objects.get(id=account_id)
-                context['selected_account'] = selected_account
-            except Bankaccount.DoesNotExist:
+                context['selected_account'] = Bankaccount.objects.get(id=account_id)
+            except (Bankaccount.DoesNotExist, ValueError):
                 pass
 
-        # Fetch related transactions with prefetched payment records
-        sales = Sale.objects.select_related('customer').prefetch_related(
-            Prefetch('payment_records', queryset=PaymentRecord.objects.select_related('source_bank_account', 'receiving_bank_account', 'sale', 'sale__customer'))
-        ).all()
-        purchases = Purchase.objects.select_related('vendor').prefetch_related(
-            Prefetch('payment_records', queryset=PaymentRecord.objects.select_related('source_bank_account', 'receiving_bank_account', 'purchase', 'purchase__vendor'))
-        ).all()
-        services = ServiceBillItem.objects.select_related('customer').prefetch_related(
-            Prefetch('payment_records', queryset=PaymentRecord.objects.select_related('source_bank_account', 'receiving_bank_account', 'servicebill'))
-        ).all()
-
-        if account_id:
-            # Filter transactions by original bank account OR transferred to this account
-            # Using Q objects to combine conditions without .distinct() issues
-            sales = Sale.objects.select_related('customer').prefetch_related(
-                Prefetch('payment_records', queryset=PaymentRecord.objects.select_related('source_bank_account', 'receiving_bank_account', 'sale', 'sale__customer'))
-            ).filter(
-                Q(bank_account_id=account_id) | Q(payment_records__receiving_bank_account_id=account_id)
-            ).distinct()
-            
-            purchases = Purchase.objects.select_related('vendor').prefetch_related(
-                Prefetch('payment_records', queryset=PaymentRecord.objects.select_related('source_bank_account', 'receiving_bank_account', 'purchase', 'purchase__vendor'))
-            ).filter(
-                Q(bank_account_id=account_id) | Q(payment_records__receiving_bank_account_id=account_id)
-            ).distinct()
-            
-            services = ServiceBillItem.objects.select_related('customer').prefetch_related(
-                Prefetch('payment_records', queryset=PaymentRecord.objects.select_related('source_bank_account', 'receiving_bank_account', 'servicebill'))
-            ).filter(
-                Q(bank_account_id=account_id) | Q(payment_records__receiving_bank_account_id=account_id)
-            ).distinct()
-
-        # Add transaction type tag safely
-        for s in sales:
-            setattr(s, 'transaction_type', "Sale")
-        for p in purchases:
-            setattr(p, 'transaction_type', "Purchase")
-        for sv in services:
-            setattr(sv, 'transaction_type', "Service")
-
-        # Only keep objects with a valid date for sorting
-        def get_sort_date(obj):
-            date = getattr(obj, 'date_added', None) or getattr(obj, 'date_created', None)
-            return date if date is not None else ''
-
-        merged_transactions = [t for t in chain(sales, purchases, services) if get_sort_date(t)]
-        merged_transactions.sort(key=get_sort_date, reverse=True)
-
-        
+        # Tag the documents on this page and load their payment history
+        records = {'Sale': [], 'Purchase': [], 'Service': []}
+        for entry in context['page_obj'].object_list:
+            if entry.sale_id:
+                entry.sale.transaction_type = 'Sale'
+            elif entry.purchase_id:
+                entry.purchase.transaction_type = 'Purchase'
+            elif entry.servicebill_id:
+                entry.servicebill.transaction_type = 'Service'
+            else:
+                continue
+            records[entry.record.transaction_type].append(entry.record)
 
+        history = PaymentRecord.objects.select_related('source_bank_account', 'receiving_bank_account')
+        for documents in records.values():
+            prefetch_related_objects(documents, Prefetch('payment_records', queryset=history))
 
-        
-        # No pagination: show all records
         context['selected_account_id'] = account_id
-        context['page_obj'] = merged_transactions
         return context
 
 
@@ -1464,10 +1249,12 @@ from .models import Sale, PaymentRecord
 from .forms import PaymentForm
 
 @require_POST
+@transaction.atomic
 def receive_payment(request):
     form = PaymentForm(request.POST)
     if form.is_valid():
-        sale = get_object_or_404(Sale, id=form.cleaned_data['sale_id'])
+        # Locked until the payment is saved, so two payments of one sale both count
+        sale = get_object_or_404(Sale.objects.select_for_update(), id=form.cleaned_data['sale_id'])
         received = form.cleaned_data['amount_received']
         bank_account_id = request.POST.get('bank_account')
         payment_mode = request.POST.get('payment_mode', 'Cash')
@@ -1490,6 +1277,8 @@ def receive_payment(request):
 
         # Store the existing/source bank account before updating
         source_bank_account = sale.bank_account
+        # Account whose balance is credited (None means cash in hand)
+        credited_account = None
 
         print('payment_mode', payment_mode)
 
@@ -1498,25 +1287,23 @@ def receive_payment(request):
             # Online mode: use selected bank account
             try:
                 bank_account = Bankaccount.objects.get(id=int(bank_account_id))
-                bank_account.opening_balance += Decimal(str(received))
-                bank_account.save()
                 sale.bank_account = bank_account
                 receiving_bank_account = bank_account
+                credited_account = bank_account
             except (Bankaccount.DoesNotExist, ValueError):
                 messages.warning(request, "Bank account not found or invalid.")
                 receiving_bank_account = source_bank_account
         else:
             # Cash mode: use existing/source account
             receiving_bank_account = source_bank_account
-            if source_bank_account:
-                source_bank_account.opening_balance += Decimal(str(received))
-                source_bank_account.save()
+            credited_account = source_bank_account
         
         # ✅ Record payment history
         # For Cash: source and receiving are the SAME (existing account)
         # For Online: source is existing, receiving is selected account
+        payment_record = None
         if receiving_bank_account:
-            PaymentRecord.objects.create(
+            payment_record = PaymentRecord.objects.create(
                 sale=sale,
                 source_bank_account=source_bank_account,
                 receiving_bank_account=receiving_bank_account,
@@ -1525,8 +1312,17 @@ def receive_payment(request):
                 payment_mode=payment_mode,
                 transaction_id=transaction_id if transaction_id else None
             )
+        post_balance(
+            credited_account,
+            received,
+            'Sale',
+            f"Payment received for sale #{sale.id}",
+            sale=sale,
+            payment_record=payment_record,
+        )
 
-        sale.save()
+        # The payment is posted above; the sale only records it
+        sale.save(post_payment=False)
 
         messages.success(request, f"Payment of ₹{received:.2f} received for sale #{sale.id}.")
     else:
@@ -1536,10 +1332,12 @@ def receive_payment(request):
 
 
 @require_POST
+@transaction.atomic
 def receive_payment_purchase(request):
     form = PaymentForm(request.POST)
     if form.is_valid():
-        purchase = get_object_or_404(Purchase, id=form.cleaned_data['purchase_id'])
+        # Locked until the payment is saved, so two payments of one purchase both count
+        purchase = get_object_or_404(Purchase.objects.select_for_update(), id=form.cleaned_data['purchase_id'])
         received = form.cleaned_data['amount_received']
         bank_account_id = request.POST.get('bank_account')
         payment_mode = request.POST.get('payment_mode', 'Cash')
@@ -1561,31 +1359,29 @@ def receive_payment_purchase(request):
         
         # Store the existing/source bank account before updating
         source_bank_account = purchase.bank_account
+        # Account whose balance is credited (None means cash in hand)
+        credited_account = None
         
         # Determine receiving bank account based on payment mode
         if payment_mode == 'Online' and bank_account_id:
             # Online mode: use selected bank account
             try:
-                from decimal import Decimal
                 bank_account = Bankaccount.objects.get(id=int(bank_account_id))
-                bank_account.opening_balance += Decimal(str(received))
-                bank_account.save()
                 purchase.bank_account = bank_account
                 receiving_bank_account = bank_account
+                credited_account = bank_account
             except (Bankaccount.DoesNotExist, ValueError):
                 messages.warning(request, "Bank account not found or invalid.")
                 receiving_bank_account = source_bank_account
         else:
             # Cash mode: use existing/source account
             receiving_bank_account = source_bank_account
-            if source_bank_account:
-                from decimal import Decimal
-                source_bank_account.opening_balance += Decimal(str(received))
-                source_bank_account.save()
+            credited_account = source_bank_account
         
         # ✅ Record payment history
+        payment_record = None
         if receiving_bank_account:
-            PaymentRecord.objects.create(
+            payment_record = PaymentRecord.objects.create(
                 purchase=purchase,
                 source_bank_account=source_bank_account,
                 receiving_bank_account=receiving_bank_account,
@@ -1594,8 +1390,17 @@ def receive_payment_purchase(request):
                 payment_mode=payment_mode,
                 transaction_id=transaction_id if transaction_id else None
             )
+        post_balance(
+            credited_account,
+            received,
+            'Purchase',
+            f"Payment received for purchase #{purchase.id}",
+            purchase=purchase,
+            payment_record=payment_record,
+        )
         
-        purchase.save()
+        # The payment is posted above; the purchase only records it
+        purchase.save(post_payment=False)
         
         messages.success(request, f"Payment of ₹{received:.2f} received for purchase #{purchase.id}.")
     else:
@@ -1635,60 +1440,66 @@ def transfer_payment_between_accounts(request):
             messages.error(request, "Transfer amount must be greater than 0.")
             return redirect('cashbanklist')
         
-        # Check if source account has sufficient balance
-        if source_account.opening_balance < amount_transferred:
-            messages.error(request, f"Insufficient balance in {source_account.account_name}. Available: ₹{source_account.opening_balance:.2f}")
-            return redirect('cashbanklist')
-        
-        # Get the transaction object (Sale, Purchase, or Service)
-        if transaction_type == 'Sale':
-            person_transaction = get_object_or_404(Sale, id=transaction_id)
-        elif transaction_type == 'Purchase':
-            person_transaction = get_object_or_404(Purchase, id=transaction_id)
-        elif transaction_type == 'Service':
-            person_transaction = get_object_or_404(ServiceBillItem, id=transaction_id)
-        else:
+        # Model of the transaction object (Sale, Purchase, or Service) and its ledger link
+        records = {'Sale': (Sale, 'sale'), 'Purchase': (Purchase, 'purchase'), 'Service': (ServiceBillItem, 'servicebill')}
+        if transaction_type not in records:
             messages.error(request, "Invalid transaction type.")
             return redirect('cashbanklist')
+        model, link = records[transaction_type]
         
-        # Update person's account balance only (not shifting items)
-        person_transaction.amount_paid += amount_transferred
-        remaining = person_transaction.grand_total - person_transaction.amount_paid
-        person_transaction.amount_change = max(remaining, Decimal('0.00'))
-        
-        # Update status based on remaining balance
-        if remaining <= 0:
-            person_transaction.status = "Paid"
-        else:
-            person_transaction.status = "Balance"
-        
-        # Update bank account balances
-        source_account.opening_balance -= amount_transferred
-        destination_account.opening_balance += amount_transferred
-        source_account.save()
-        destination_account.save()
-        
-        # Create payment history record for tracking
-        PaymentRecord.objects.create(
-            sale=person_transaction if transaction_type == 'Sale' else None,
-            purchase=person_transaction if transaction_type == 'Purchase' else None,
-            servicebill=person_transaction if transaction_type == 'Service' else None,
-            source_bank_account=source_account,
-            receiving_bank_account=destination_account,
-            payment_amount=amount_transferred,
-            payment_source_type=transaction_type,
-            payment_mode='Transfer',
-            transaction_id=transfer_notes if transfer_notes else f"Transfer from {source_account.account_name} to {destination_account.account_name}"
-        )
-        
-        # Save person's transaction
-        person_transaction.save()
+        with transaction.atomic():
+            # Locked until the transfer is saved, so concurrent payments both count
+            person_transaction = get_object_or_404(model.objects.select_for_update(), id=transaction_id)
+            
+            # Update person's account balance only (not shifting items)
+            person_transaction.amount_paid += amount_transferred
+            remaining = person_transaction.grand_total - person_transaction.amount_paid
+            person_transaction.amount_change = max(remaining, Decimal('0.00'))
+            
+            # Update status based on remaining balance
+            if remaining <= 0:
+                person_transaction.status = "Paid"
+            else:
+                person_transaction.status = "Balance"
+            
+            # Create payment history record for tracking
+            payment_record = PaymentRecord.objects.create(
+                sale=person_transaction if transaction_type == 'Sale' else None,
+                purchase=person_transaction if transaction_type == 'Purchase' else None,
+                servicebill=person_transaction if transaction_type == 'Service' else None,
+                source_bank_account=source_account,
+                receiving_bank_account=destination_account,
+                payment_amount=amount_transferred,
+                payment_source_type=transaction_type,
+                payment_mode='Transfer',
+                transaction_id=transfer_notes if transfer_notes else f"Transfer from {source_account.account_name} to {destination_account.account_name}"
+            )
+
+            # Move the money and post both legs of the transfer to the ledger;
+            # the source balance is checked in the same UPDATE that debits it
+            transfer(
+                source_account,
+                destination_account,
+                amount_transferred,
+                f"Transfer from {source_account.account_name} to {destination_account.account_name}",
+                payment_record=payment_record,
+                **{link: person_transaction}
+            )
+            
+            # Save person's transaction; the transfer above is its only posting
+            if transaction_type == 'Service':
+                person_transaction.save()
+            else:
+                person_transaction.save(post_payment=False)
         
         messages.success(
             request, 
             f"✅ Transfer successful: ₹{amount_transferred:.2f} moved from {source_account.account_name} to {destination_account.account_name}"
         )
     
+    except InsufficientBalance:
+        source_account.refresh_from_db(fields=['opening_balance'])
+        messages.error(request, f"Insufficient balance in {source_account.account_name}. Available: ₹{source_account.opening_balance:.2f}")
     except Exception as e:
         messages.error(request, f"Transfer failed: {str(e)}")
     
@@ -1737,21 +1548,8 @@ def search_suggestions_purchase(request):
 
 
 def customer_search(request):
-    query = request.GET.get('q', '')
-    results = []
-
-    if query:
-        customers = Customer.objects.filter(
-            Q(first_name__icontains=query) | Q(last_name__icontains=query) | Q(phone__icontains=query)
-        )
-        results = [
-            {
-                'id': c.id,
-                'text': f"{c.first_name} {c.last_name}".strip(),
-                'phone': f"{c.phone}".strip()
-            } for c in customers
-        ]
-    return JsonResponse({'results': results})
+    """One page of customers matching ?q= (name or phone), for the pickers."""
+    return JsonResponse(lookup_page('customer', request.GET.get('q', ''), page_number(request)))
 
 
 
@@ -1777,21 +1575,8 @@ def customer_create(request):
 
 
 def vendor_search(request):
-    query = request.GET.get('q', '')
-    results = []
-
-    if query:
-        vendors = Vendor.objects.filter(
-            Q(name__icontains=query) | Q(phone_number__icontains=query)
-        )
-        results = [
-            {
-                'id': c.id,
-                'text': f"{c.name}".strip(),
-                'phone': f"{c.phone_number}".strip()
-            } for c in vendors
-        ]
-    return JsonResponse({'results': results})
+    """One page of vendors matching ?q= (name or phone), for the pickers."""
+    return JsonResponse(lookup_page('vendor', request.GET.get('q', ''), page_number(request)))
 
 
 
@@ -1819,6 +1604,7 @@ from .models import ServiceBillItem, Customer
 from django.http import JsonResponse
 
 class ServiceBillCreateView(View):
+    @method_decorator(transaction.atomic)
     def post(self, request, *args, **kwargs):
         data = request.POST
         customer_id = data.get("customer_id")
@@ -1912,6 +1698,11 @@ class ServiceBillCreateView(View):
                     amount_paid=0,
                     amount_change=0
                 )
+
+            # Book the payment like ServiceCreateView does
+            paid = Decimal(str(data.get("amount_paid", 0)))
+            if paid:
+                post_balance(bank_account, paid, 'Service', f"Service bill payment posted (Service ID: {sb.id})", servicebill=sb)
             redirect_url = f"/transactions/servicebill/{sb.pk}/invoice/"
             return JsonResponse({"success": True, "redirect_url": redirect_url})
         else: